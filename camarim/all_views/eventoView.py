@@ -1,11 +1,23 @@
-from camarim.models import Evento
+from camarim.models import Evento, EstoqueSala
 from camarim.forms  import EventoForm
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.views.generic import ( ListView, CreateView, UpdateView, DeleteView )   
+from django.shortcuts import redirect
+from django.views.generic import ( ListView, CreateView, UpdateView, DeleteView, DetailView )   
 from django.urls import reverse_lazy
+from camarim.services import estatisticas
+from .mixins import PaginacaoCursorMixin
 
-class EventoListView(LoginRequiredMixin, ListView):
+class EventoListView(LoginRequiredMixin, PaginacaoCursorMixin, ListView):
     model=Evento; template_name='camarim/evento_list.html'; context_object_name='eventos'
+    queryset=Evento.objects.with_stats()
+    ordering=('-id',)
+
+    def get_context_data(self, **kwargs):
+        # os totais do topo não dependem da página
+        ctx = super().get_context_data(**kwargs)
+        ctx['estatisticas'] = estatisticas.atual()
+        return ctx
 class EventoCreateView(LoginRequiredMixin, CreateView):
     model=Evento; form_class=EventoForm; template_name='camarim/evento_form.html'
     success_url=reverse_lazy('camarim:evento_list')
@@ -14,4 +26,42 @@ class EventoUpdateView(LoginRequiredMixin, UpdateView):
     success_url=reverse_lazy('camarim:evento_list')
 class EventoDeleteView(LoginRequiredMixin, DeleteView):
     model=Evento; template_name='camarim/evento_confirm_delete.html'
-    success_url=reverse_lazy('camarim:evento_list')
\ No newline at end of file
+    success_url=reverse_lazy('camarim:evento_list')
+
+class EventoEncerrarView(LoginRequiredMixin, DetailView):
+    """
+    Encerra o evento: devolve ao Estoque geral tudo o que está nas salas e
+    arquiva o evento. Cada alocação pode receber a quantidade contada
+    (campo ``contagem_<id>``); a diferença é registrada como perda.
+    """
+    model=Evento; template_name='camarim/evento_encerrar.html'; context_object_name='evento'
+
+    def itens(self):
+        return (
+            EstoqueSala.objects
+                       .filter(sala__evento=self.object)
+                       .select_related('sala', 'produto')
+                       .order_by('sala__nome', 'produto__nome')
+        )
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['itens'] = self.itens()
+        return ctx
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        contagens = {}
+        for chave, valor in request.POST.items():
+            if chave.startswith('contagem_') and valor.strip():
+                try:
+                    contagens[int(chave[len('contagem_'):])] = max(int(valor), 0)
+                except ValueError:
+                    messages.error(request, 'Informe apenas números inteiros nas contagens.')
+                    return self.get(request, *args, **kwargs)
+        resultado = self.object.encerrar(contagens, usuario=request.user)
+        msg = f'Evento encerrado: {resultado.devolvido} unidade(s) devolvida(s) ao estoque.'
+        if resultado.perdas:
+            msg += f' {resultado.perdas} registrada(s) como perda.'
+        messages.success(request, msg)
+        return redirect('camarim:evento_list')
\ No newline at end of file
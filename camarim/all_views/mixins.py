@@ -0,0 +1,39 @@
+from django.contrib import messages
+from django.http import Http404
+
+from camarim.pagination import POR_PAGINA, CursorInvalido, paginar
+
+class ConflitoVersaoMixin:
+    """
+    UpdateView de modelo `Versionado`: quando outra edição foi salva antes
+    (``ConflitoDeVersao``), reabre o formulário com os valores atuais do banco
+    em vez de sobrescrevê-los.
+    """
+    mensagem_conflito = (
+        "Este registro foi alterado por outra pessoa enquanto você editava. "
+        "Os valores abaixo são os atuais; refaça a alteração se ainda for necessária."
+    )
+
+    def conflito(self, **contexto):
+        messages.warning(self.request, self.mensagem_conflito)
+        self.object = self.get_object()
+        form = self.get_form_class()(
+            instance=self.object, initial=self.get_initial(), prefix=self.get_prefix()
+        )
+        return self.render_to_response(self.get_context_data(form=form, **contexto))
+
+
+class PaginacaoCursorMixin:
+    """
+    ListView paginada por cursor (camarim.pagination) em vez de OFFSET. A
+    ordem vem de ``ordering``/``get_ordering()`` e deve terminar no id; os
+    links de próxima/anterior passam ``?cursor=`` (partials/paginacao.html).
+    """
+    paginate_by = POR_PAGINA
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            pagina = paginar(queryset, self.get_ordering(), self.request.GET.get('cursor'), page_size)
+        except CursorInvalido:
+            raise Http404("Cursor de paginação inválido.")
+        return None, pagina, pagina.itens, pagina.tem_anterior or pagina.tem_proxima
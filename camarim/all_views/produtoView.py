@@ -1,33 +1,82 @@
-from camarim.models import Produto, Estoque
+from camarim.models import Produto, Estoque, ConflitoDeVersao
 # from camarim.views import HomeRedirectView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
+from django.views import View
 from django.views.generic import ( ListView, CreateView, UpdateView, DeleteView )
 from django.urls import reverse_lazy
-from django.db.models import Sum, Value
+from django.db import transaction
 from camarim.forms  import ProdutoForm, EstoqueForm
-from django.db.models.functions import Coalesce
+from camarim.services import autocompletar, busca
+from .mixins import ConflitoVersaoMixin, PaginacaoCursorMixin
 
 # class HomeRedirectView(RedirectView):
 #     pattern_name = 'camarim:dashboard'
 
-class ProdutoListView(LoginRequiredMixin, ListView):
+class ProdutoListView(LoginRequiredMixin, PaginacaoCursorMixin, ListView):
     model = Produto
     template_name = 'camarim/produto_list.html'
     context_object_name = 'produtos'
+    ordering = ('nome', 'id')
 
     def get_queryset(self):
-        # Anota 'stock' como soma das quantidades em Estoque, ou 0 se none
-        qs = super().get_queryset().annotate(
-            stock=Coalesce(Sum('estoques__quantidade'), Value(0))
-        )
-        return qs
+        # estoque vem dos contadores do próprio produto, sem somar Estoque/EstoqueSala
+        produtos = Produto.objects.with_stock()
+        return busca.filtrar(produtos, self.request.GET.get('q', ''))
     
-class ProdutoCreateView(LoginRequiredMixin, CreateView):
+class ProdutoBuscaView(LoginRequiredMixin, View):
+    """
+    Autocompletar dos <select> assíncronos (SelecaoAssincrona): os primeiros
+    produtos por prefixo, do índice em memória (services.autocompletar).
+    """
+    limite = autocompletar.LIMITE
+
+    def get(self, request):
+        return JsonResponse({'resultados': autocompletar.sugerir(request.GET.get('q', ''), self.limite)})
+
+class ProdutoPesquisaView(LoginRequiredMixin, View):
+    """Busca textual (services.busca), sem acentos, do mais relevante ao menos."""
+    limite = 20
+    limite_maximo = 100
+
+    def get(self, request):
+        try:
+            limite = min(int(request.GET.get('limite', self.limite)), self.limite_maximo)
+        except ValueError:
+            limite = self.limite
+        produtos = busca.buscar(request.GET.get('q', ''), max(limite, 1))
+        return JsonResponse({'resultados': [
+            {
+                'id': produto.pk,
+                'nome': produto.nome,
+                'categoria': produto.categoria.nome if produto.categoria else None,
+                'preco': str(produto.preco.amount),
+                'relevancia': produto.relevancia,
+            }
+            for produto in produtos
+        ]})
+
+class ProdutoFormMixin:
+    # o ProdutoForm registra quem alterou o estoque no MovimentoEstoque
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['usuario'] = self.request.user
+        return kwargs
+
+class ProdutoCreateView(LoginRequiredMixin, ProdutoFormMixin, CreateView):
     model=Produto; form_class=ProdutoForm; template_name='camarim/produto_form.html'
     success_url=reverse_lazy('camarim:produto_list')
-class ProdutoUpdateView(LoginRequiredMixin, UpdateView):
+class ProdutoUpdateView(LoginRequiredMixin, ConflitoVersaoMixin, ProdutoFormMixin, UpdateView):
     model=Produto; form_class=ProdutoForm; template_name='camarim/produto_form.html'
     success_url=reverse_lazy('camarim:produto_list')
+
+    def form_valid(self, form):
+        # o estoque mudou depois que o formulário abriu: nada é gravado
+        try:
+            with transaction.atomic():
+                return super().form_valid(form)
+        except ConflitoDeVersao:
+            return self.conflito()
 class ProdutoDeleteView(LoginRequiredMixin, DeleteView):
     model=Produto; template_name='camarim/produto_confirm_delete.html'
     success_url=reverse_lazy('camarim:produto_list')
@@ -1,41 +1,87 @@
+from decimal import Decimal, InvalidOperation
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages 
+from django.db import transaction
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views import View
 from django.views.generic import ( ListView, CreateView, UpdateView, DeleteView, DetailView, TemplateView )
 from django.urls import reverse_lazy
-from camarim.models import Proposta
+from camarim.models import DocumentoProposta, Evento, Proposta, ConflitoDeVersao
+from camarim.services import documentos
 from camarim.forms  import PropostaForm, ItemPropostaFormSet
+from .mixins import ConflitoVersaoMixin, PaginacaoCursorMixin
 
-class PropostaListView(LoginRequiredMixin, ListView):
+# HTML só de leitura (quebra da proposta no detalhe, descritivo) fica em cache
+# sob Proposta.revisao, que muda a cada alteração; o prazo só limita
+# renomeações de sala/produto. O formulário dos itens nunca vai para o cache.
+CACHE_TTL = 60 * 60
+
+class PropostaListView(LoginRequiredMixin, PaginacaoCursorMixin, ListView):
     model=Proposta; template_name='camarim/proposta_list.html'; context_object_name='propostas'
+
+    def get_queryset(self):
+        # filtros e ordenação pelo total gravado (coluna indexada)
+        qs = Proposta.objects.select_related('evento')
+        for param, lookup in (('valor_min', 'total__gte'), ('valor_max', 'total__lte')):
+            try:
+                qs = qs.filter(**{lookup: Decimal(self.request.GET[param])})
+            except (KeyError, InvalidOperation):
+                pass
+        return qs
+
+    def get_ordering(self):
+        if self.request.GET.get('ordem') == 'valor':
+            return ('-total', '-id')
+        return ('-created_at', '-id')
 class PropostaCreateView(LoginRequiredMixin, CreateView):
     model=Proposta; form_class=PropostaForm; template_name='camarim/proposta_form.html'
     success_url=reverse_lazy('camarim:proposta_list')
+class PropostaGerarView(LoginRequiredMixin, View):
+    """Gera (POST) a proposta de um evento a partir das alocações das salas."""
+    def post(self, request, pk):
+        evento = get_object_or_404(Evento, pk=pk)
+        proposta = evento.gerar_proposta()
+        if not proposta.subtotal:
+            messages.warning(request, 'O evento não tem produtos alocados nas salas; a proposta foi criada vazia.')
+        else:
+            messages.success(request, f'Proposta gerada: R$ {proposta.total:.2f}.')
+        return redirect('camarim:proposta_detail', pk=proposta.pk)
 class PropostaDetailView(LoginRequiredMixin, DetailView):
     model=Proposta; template_name='camarim/proposta_detail.html'
 class PropostaDeleteView(LoginRequiredMixin, DeleteView):
     model=Proposta; template_name='camarim/proposta_confirm_delete.html'
     success_url=reverse_lazy('camarim:proposta_list')
 
-class PropostaUpdateView(UpdateView):
+class PropostaUpdateView(ConflitoVersaoMixin, UpdateView):
     model = Proposta
     form_class = PropostaForm
     template_name = 'camarim/proposta_detail.html'
 
+    def get_queryset(self):
+        return Proposta.objects.select_related('evento')
+
     def get(self, request, *args, **kwargs):
         self.object = self.get_object()
         form = self.get_form()
         formset = ItemPropostaFormSet(instance=self.object)
-        return self.render_to_response({'form':form,'formset':formset,'proposta':self.object})
+        # o formset é sempre renderizado; só a quebra por sala/categoria vem do cache
+        return self.render_to_response({'form':form,'formset':formset,'proposta':self.object,
+                                        'cache_ttl':CACHE_TTL})
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
         form = self.get_form()
         formset = ItemPropostaFormSet(request.POST, instance=self.object)
         if form.is_valid() and formset.is_valid():
-            form.save()
-            formset.save()
-            return redirect('proposta_detail', pk=self.object.pk)
+            try:
+                with transaction.atomic():
+                    # a versão da proposta sobe a cada gravação, mesmo que só os itens mudem
+                    form.salvar_versionado()
+                    formset.salvar_versionado()
+            except ConflitoDeVersao:
+                return self.conflito(formset=ItemPropostaFormSet(instance=self.get_object()))
+            return redirect('camarim:proposta_detail', pk=self.object.pk)
         return self.render_to_response({'form':form,'formset':formset,'proposta':self.object})
 
 
@@ -43,10 +89,33 @@ class DescritivoView(TemplateView):
     template_name = 'camarim/proposta_descritivo.html'
 
     def get_context_data(self, **kwargs):
-        pk = kwargs['pk']
-        prop = get_object_or_404(Proposta, pk=pk)
-        # agrupa items por sala
-        salas = {}
-        for item in prop.itens.all().order_by('sala__nome'):
-            salas.setdefault(item.sala, []).append(item)
-        return {'proposta': prop, 'salas': salas}
\ No newline at end of file
+        prop = get_object_or_404(Proposta.objects.select_related('evento'), pk=kwargs['pk'])
+        # itens agrupados por sala no template ({% regroup %}); a consulta só
+        # roda quando o trecho não está no cache
+        return {'proposta': prop, 'itens': prop.itens_por_sala(), 'cache_ttl': CACHE_TTL}
+
+
+class PropostaDocumentoView(LoginRequiredMixin, View):
+    """
+    PDF/XLSX da proposta. Pronto: baixa o arquivo. Senão agenda a geração e
+    responde o andamento (JSON para o main.js, que consulta até ficar pronto;
+    sem JavaScript, volta à proposta com um aviso).
+    """
+    def get(self, request, pk, formato):
+        if formato not in dict(DocumentoProposta.FORMATOS):
+            raise Http404
+        proposta = get_object_or_404(Proposta.objects.select_related('evento'), pk=pk)
+        documento = documentos.solicitar(proposta, formato)
+        pronto = documento.status == DocumentoProposta.PRONTO
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({'status': documento.status, 'erro': documento.erro, 'pronto': pronto})
+        if pronto:
+            return FileResponse(
+                documento.arquivo.open('rb'), as_attachment=True,
+                filename=f"proposta-{proposta.pk}.{formato}",
+            )
+        if documento.status == DocumentoProposta.ERRO:
+            messages.error(request, f'Não foi possível gerar o documento: {documento.erro}')
+        else:
+            messages.info(request, 'O documento está sendo gerado; tente de novo em alguns segundos.')
+        return redirect('camarim:proposta_detail', pk=pk)
@@ -5,14 +5,17 @@ from django.views.generic import ( ListView, CreateView, UpdateView, DeleteView,
 from django.urls import reverse_lazy
 from camarim.models import Sala, Evento
 from camarim.forms  import SalaForm, SalaReplicateForm
+from camarim.services.disponibilidade import descrever_faltas, replicar_nas_datas
+from .mixins import PaginacaoCursorMixin
 
-class SalaListView(LoginRequiredMixin, ListView):
+class SalaListView(LoginRequiredMixin, PaginacaoCursorMixin, ListView):
     model = Sala
     template_name = 'camarim/sala_list.html'
     context_object_name = 'salas'
+    ordering = ('nome', 'id')
 
     def get_queryset(self):
-        return Sala.objects.filter(evento_id=self.kwargs['evento_pk'])
+        return Sala.objects.with_stock_totals().filter(evento_id=self.kwargs['evento_pk'])
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -75,10 +78,25 @@ class SalaReplicateView(LoginRequiredMixin, FormView):
         return ctx
 
     def form_valid(self, form):
-        evento_dest = form.cleaned_data['destino']
-        nova_sala = self.sala_origem.replicar(evento_dest)
+        destinos = list(form.cleaned_data['destinos'])
+        if form.cleaned_data['todas_as_salas']:
+            salas = list(self.evento_origem.salas.all())
+        else:
+            salas = [self.sala_origem]
+        # cada destino precisa ter o estoque livre nas suas próprias datas,
+        # contando os outros destinos que acontecem ao mesmo tempo
+        faltando, _ = replicar_nas_datas(salas, destinos, usuario=self.request.user)
+        if faltando:
+            for evento in destinos:
+                if evento.pk in faltando:
+                    form.add_error('destinos', descrever_faltas(evento, faltando[evento.pk]))
+            return self.form_invalid(form)
+        nomes_salas = ", ".join(f"“{s.nome}”" for s in salas)
+        nomes_eventos = ", ".join(f"“{e.nome}”" for e in destinos)
         messages.success(
             self.request,
-            f"Sala “{self.sala_origem.nome}” replicada para o evento “{evento_dest.nome}”."
+            f"Sala(s) {nomes_salas} replicada(s) para o(s) evento(s) {nomes_eventos}."
         )
-        return redirect('camarim:sala_list', evento_pk=evento_dest.pk)
+        if len(destinos) == 1:
+            return redirect('camarim:sala_list', evento_pk=destinos[0].pk)
+        return redirect('camarim:sala_list', evento_pk=self.evento_origem.pk)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CamarimConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'camarim'
+
+    def ready(self):
+        # estatísticas do painel mantidas pelos sinais de save/delete
+        from . import signals  # noqa: F401
@@ -1,7 +1,39 @@
 from django import forms
-from django.forms import DateInput, inlineformset_factory
+from django.core.exceptions import ValidationError
+from django.forms import BaseInlineFormSet, DateInput, inlineformset_factory
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse_lazy
+from django.utils.functional import cached_property
 from djmoney.forms.widgets import MoneyWidget
 from .models import Evento, Sala, Produto, Estoque, EstoqueSala, Proposta, ItemProposta
+from .services import shards
+from .services.estoque import definir_estoque
+from .services.propostas import recalcular_totais
+
+class VersaoFormMixin:
+    """
+    Formulário de edição de um modelo `Versionado`: a versão lida vai num
+    campo oculto e volta no POST, para a gravação condicional
+    (``UPDATE ... WHERE versao = n``).
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['versao'] = forms.IntegerField(
+                widget=forms.HiddenInput, required=False, initial=self.instance.versao
+            )
+
+    def versao_lida(self):
+        """Versão enviada pelo formulário (``None`` se não veio)."""
+        return self.cleaned_data.get('versao') if 'versao' in self.fields else None
+
+    def salvar_versionado(self):
+        """Grava os campos do formulário só se a versão não mudou."""
+        versao = self.versao_lida()
+        self.instance.salvar_se_versao(
+            self.instance.versao if versao is None else versao, self._meta.fields
+        )
+        return self.instance
 
 class EventoForm(forms.ModelForm):
     class Meta:
@@ -19,16 +51,21 @@ class SalaForm(forms.ModelForm):
         widgets={'nome': forms.TextInput(attrs={'class':'form-control'})}
 
 class SalaReplicateForm(forms.Form):
-    destino = forms.ModelChoiceField(
+    destinos = forms.ModelMultipleChoiceField(
         queryset=Evento.objects.none(),      # vamos atribuir dinamicamente
-        label="Evento de destino",
-        widget=forms.Select(attrs={'class': 'form-select'})
+        label="Eventos de destino",
+        widget=forms.SelectMultiple(attrs={'class': 'form-select', 'size': 8})
+    )
+    todas_as_salas = forms.BooleanField(
+        required=False,
+        label="Replicar todas as salas do evento de origem",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
     )
     def __init__(self, *args, eventos_origem=None, **kwargs):
         super().__init__(*args, **kwargs)
         if eventos_origem is not None:
             # só mostramos eventos diferentes do origem
-            self.fields['destino'].queryset = Evento.objects.exclude(pk=eventos_origem)
+            self.fields['destinos'].queryset = Evento.objects.exclude(pk=eventos_origem)
 
 
 class ProdutoForm(forms.ModelForm):
@@ -55,41 +92,240 @@ class ProdutoForm(forms.ModelForm):
             }),
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, usuario=None, **kwargs):
         super().__init__(*args, **kwargs)
-        # Se já existe estoque, popula o inicial
+        self.usuario = usuario
+        self.novo = not self.instance.pk
+        # Se já existe estoque, popula o inicial (produto repartido: somando as parcelas)
         if self.instance.pk:
-            est = Estoque.objects.filter(produto=self.instance).first()
-            self.fields['quantidade'].initial = est.quantidade if est else 0
+            atual = (
+                Estoque.objects.filter(produto=self.instance)
+                       .values_list('quantidade', flat=True).first() or 0
+            ) + shards.somas([self.instance.pk]).get(self.instance.pk, 0)
+            self.fields['quantidade'].initial = atual
+            # o saldo mostrado volta no POST: diz se o usuário mexeu na
+            # quantidade e protege as movimentações feitas enquanto editava
+            self.fields['estoque_lido'] = forms.IntegerField(
+                widget=forms.HiddenInput, required=False, initial=atual
+            )
 
     def save(self, commit=True):
         produto = super().save(commit=commit)
         qtd = self.cleaned_data['quantidade']
-        Estoque.objects.update_or_create(
-            produto=produto,
-            defaults={'quantidade': qtd}
-        )
+        lido = self.cleaned_data.get('estoque_lido')
+        if self.novo:
+            definir_estoque(produto, qtd, usuario=self.usuario)
+        elif lido is not None:
+            if qtd != lido:
+                definir_estoque(produto, qtd, esperado=lido, usuario=self.usuario)
+        elif 'quantidade' in self.changed_data:
+            definir_estoque(produto, qtd, usuario=self.usuario)
         return produto
 
-class EstoqueForm(forms.ModelForm):
+class SelecaoAssincrona(forms.Select):
+    """
+    <select> que só leva a opção escolhida; as outras são buscadas em
+    ``data-busca-url`` pelo main.js conforme o usuário digita.
+    """
+    def __init__(self, url, attrs=None):
+        super().__init__(attrs={**(attrs or {}), 'data-busca-url': url})
+
+    def optgroups(self, name, value, attrs=None):
+        escolhidos = {str(v) for v in value}
+        todas = self.choices
+        if isinstance(todas, ModelChoiceIterator):
+            # direto do queryset do campo: só as escolhidas saem do banco
+            vazia = [('', todas.field.empty_label)] if todas.field.empty_label is not None else []
+            ids = [v for v in escolhidos if v.isdigit()]
+            self.choices = vazia + [todas.choice(obj) for obj in todas.queryset.filter(pk__in=ids)]
+        else:
+            self.choices = [(v, rotulo) for v, rotulo in todas if v == '' or str(v) in escolhidos]
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = todas
+
+class EstoqueForm(VersaoFormMixin, forms.ModelForm):
     class Meta:
         model = Estoque
         fields= ['produto','quantidade']
-        widgets={'quantidade': forms.NumberInput(attrs={'class':'form-control'})}
+        widgets={'produto': SelecaoAssincrona(reverse_lazy('camarim:produto_busca')),
+                 'quantidade': forms.NumberInput(attrs={'class':'form-control'})}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            # produto repartido: mostra o saldo geral somando as parcelas, e o
+            # saldo mostrado volta no POST (as parcelas não sobem a versão)
+            produto_id = self.instance.produto_id
+            atual = self.instance.quantidade + shards.somas([produto_id]).get(produto_id, 0)
+            self.initial['quantidade'] = atual
+            self.fields['estoque_lido'] = forms.IntegerField(
+                widget=forms.HiddenInput, required=False, initial=atual
+            )
+
+    def estoque_lido(self):
+        """Saldo mostrado pelo formulário (``None`` se não veio)."""
+        return self.cleaned_data.get('estoque_lido') if 'estoque_lido' in self.fields else None
 
-class EstoqueSalaForm(forms.ModelForm):
+class EntradaEstoqueForm(EstoqueForm):
+    """
+    Lançamento de entrada: para produto que já tem estoque a quantidade é
+    somada à linha existente, então a unicidade do produto não se aplica.
+    """
+    def validate_unique(self):
+        pass
+
+class EstoqueSalaForm(VersaoFormMixin, forms.ModelForm):
     class Meta:
         model = EstoqueSala
         fields= ['produto','quantidade']
-        widgets={'quantidade': forms.NumberInput(attrs={'class':'form-control'})}
+        widgets={'produto': SelecaoAssincrona(reverse_lazy('camarim:produto_busca')),
+                 'quantidade': forms.NumberInput(attrs={'class':'form-control'})}
+
+class EstoqueSalaLoteItemForm(forms.Form):
+    produto = forms.ModelChoiceField(
+        queryset=Produto.objects.order_by('nome'),
+        widget=SelecaoAssincrona(reverse_lazy('camarim:produto_busca'), attrs={'class': 'form-select'})
+    )
+    quantidade = forms.IntegerField(
+        min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
 
-class PropostaForm(forms.ModelForm):
+class BaseEstoqueSalaLoteFormSet(forms.BaseFormSet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # linhas extras em branco podem ficar vazias
+        for form in self.forms:
+            form.empty_permitted = True
+
+    def pedidos(self):
+        """Soma as linhas preenchidas em ``{produto: quantidade}``."""
+        pedidos = {}
+        for form in self.forms:
+            produto = form.cleaned_data.get('produto')
+            if produto:
+                pedidos[produto] = pedidos.get(produto, 0) + form.cleaned_data['quantidade']
+        return pedidos
+
+EstoqueSalaLoteFormSet = forms.formset_factory(
+    EstoqueSalaLoteItemForm, formset=BaseEstoqueSalaLoteFormSet, extra=10
+)
+
+class PropostaForm(VersaoFormMixin, forms.ModelForm):
     class Meta:
         model = Proposta
-        fields = ['impostos']
+        fields = ['impostos', 'status']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # sem o campo no POST, o status gravado fica como está
+        self.fields['status'].required = False
+
+class EscolhaCacheada(forms.ModelChoiceField):
+    """
+    ModelChoiceField que, dentro de um formset, valida e monta as opções a
+    partir de objetos já carregados (``{pk: objeto}``, um dicionário para o
+    formset inteiro) em vez de consultar o banco em cada linha.
+    """
+    objetos = None
+
+    def usar(self, objetos, escolhas=None):
+        self.objetos = objetos
+        if escolhas is not None:
+            self.choices = escolhas
+
+    def to_python(self, value):
+        if self.objetos is None:
+            return super().to_python(value)
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objetos[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice',
+                params={'value': value},
+            )
+
+class ItemPropostaForm(VersaoFormMixin, forms.ModelForm):
+    class Meta:
+        model = ItemProposta
+        fields = ('sala','produto','quantidade','preco_unitario')
+        field_classes = {'sala': EscolhaCacheada, 'produto': EscolhaCacheada}
+        widgets = {'produto': SelecaoAssincrona(reverse_lazy('camarim:produto_busca'))}
+
+    def _get_validation_exclusions(self):
+        # sala e produto já saíram validados do cache do formset; sem isto o
+        # full_clean do modelo confere cada chave estrangeira com mais uma consulta
+        exclusoes = super()._get_validation_exclusions()
+        for campo in ('sala', 'produto'):
+            if self.fields[campo].objetos is not None:
+                exclusoes.add(campo)
+        return exclusoes
+
+class BaseItemPropostaFormSet(BaseInlineFormSet):
+    """
+    Salas e produtos carregados uma vez para o formset inteiro: salas só do
+    evento da proposta; produtos só os que aparecem nas linhas (lidas ou
+    enviadas), já que o <select> de produto é preenchido pela busca.
+    """
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            self._queryset = super().get_queryset().order_by('sala__nome', 'pk')
+        return self._queryset
+
+    @cached_property
+    def _escolhas(self):
+        salas = {
+            sala.pk: sala
+            for sala in Sala.objects.filter(evento_id=self.instance.evento_id).order_by('nome')
+        }
+        produto_ids = {item.produto_id for item in self.get_queryset()}
+        if self.is_bound:
+            for i in range(self.total_form_count()):
+                valor = self.data.get(f'{self.add_prefix(i)}-produto')
+                if valor and str(valor).isdigit():
+                    produto_ids.add(int(valor))
+        produtos = Produto.objects.only('pk', 'nome').in_bulk(produto_ids)
+        vazio = [('', '---------')]
+        return (
+            {item.pk: item for item in self.get_queryset()},
+            (salas, vazio + [(pk, sala.nome) for pk, sala in salas.items()]),
+            (produtos, vazio + [(pk, str(p)) for pk, p in sorted(produtos.items())]),
+        )
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        itens, (salas, escolhas_salas), (produtos, escolhas_produtos) = self._escolhas
+        # o campo oculto do pk também é um ModelChoiceField: um .get() por linha
+        pk = form.fields[self.model._meta.pk.name]
+        form.fields[self.model._meta.pk.name] = campo = EscolhaCacheada(
+            pk.queryset, initial=pk.initial, required=False, widget=pk.widget,
+        )
+        campo.usar(itens)
+        form.fields['sala'].usar(salas, escolhas_salas)
+        form.fields['produto'].usar(produtos, escolhas_produtos)
+
+    def salvar_versionado(self):
+        """
+        Itens alterados com gravação condicional; itens novos, normal. Os
+        totais da proposta são recalculados uma vez no fim, sem subir de novo
+        a versão que o PropostaForm já subiu.
+        """
+        for form in self.initial_forms:
+            if form.has_changed():
+                form.instance._totais_adiados = True
+                form.salvar_versionado()
+        for form in self.extra_forms:
+            if form.has_changed():
+                form.instance._totais_adiados = True
+                self.save_new(form)
+        recalcular_totais([self.instance.pk], versionar=False)
 
 ItemPropostaFormSet = inlineformset_factory(
-    Proposta, ItemProposta,
+    Proposta, ItemProposta, form=ItemPropostaForm, formset=BaseItemPropostaFormSet,
     fields=('sala','produto','quantidade','preco_unitario'),
     extra=0, can_delete=False
 )
\ No newline at end of file
@@ -0,0 +1,10 @@
+# camarim/management/commands/compactar_movimentos.py
+from django.core.management.base import BaseCommand
+from camarim.services.movimentos import compactar
+
+class Command(BaseCommand):
+    help = "Grava fotos de saldo (SaldoEstoque) dos locais movimentados desde a última compactação"
+
+    def handle(self, *args, **options):
+        total = compactar()
+        self.stdout.write(self.style.SUCCESS(f"{total} fotos de saldo gravadas."))
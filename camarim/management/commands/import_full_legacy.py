@@ -4,7 +4,8 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.core.files import File
 from django.contrib.auth import get_user_model
-from camarim.models import Categoria, Produto, Estoque
+from camarim.models import Categoria, Produto
+from camarim.services.estoque import definir_estoque
 
 LEGACY_FIXTURE = "legacy_data_utf8.json"
 # pasta onde você copiou o 'media' antigo
@@ -57,10 +58,8 @@ class Command(BaseCommand):
                 qtd = f.get("quantidade", 0)
                 try:
                     prod = Produto.objects.get(nome=nome)
-                    Estoque.objects.update_or_create(
-                        produto=prod,
-                        defaults={"quantidade": qtd}
-                    )
+                    # pelo serviço: acerta os contadores do produto e registra o ajuste
+                    definir_estoque(prod, qtd)
                 except Produto.DoesNotExist:
                     self.stdout.write(self.style.WARNING(f"Produto não encontrado: {nome}"))
 
@@ -1,7 +1,8 @@
 # camarim/management/commands/import_stock.py
 
 from django.core.management.base import BaseCommand
-from camarim.models import Produto, Estoque
+from camarim.models import Produto
+from camarim.services.estoque import definir_estoque
 from camarim.legacy_models import OldProduto
 
 class Command(BaseCommand):
@@ -13,9 +14,7 @@ class Command(BaseCommand):
             prod = Produto.objects.filter(pk=op.id).first()
             if not prod:
                 continue
-            Estoque.objects.update_or_create(
-                produto=prod,
-                defaults={'quantidade': op.quantidade}
-            )
+            # pelo serviço: acerta os contadores do produto e registra o ajuste
+            definir_estoque(prod, op.quantidade)
             total += 1
         self.stdout.write(self.style.SUCCESS(f"{total} estoques importados."))
\ No newline at end of file
@@ -0,0 +1,41 @@
+# camarim/management/commands/recalcular_contadores.py
+from django.core.management.base import BaseCommand
+from camarim.services import contadores
+
+class Command(BaseCommand):
+    help = "Confere e reconstrói os contadores de estoque (disponível/alocado/total) dos produtos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help="Só lista os produtos divergentes, sem corrigir",
+        )
+        parser.add_argument(
+            '--todos', action='store_true',
+            help="Reconstrói todos os produtos, não só os divergentes",
+        )
+
+    def handle(self, *args, **options):
+        if options['todos']:
+            total = contadores.reconstruir()
+            self.stdout.write(self.style.SUCCESS(f"{total} produtos recalculados."))
+            return
+
+        divergentes = contadores.divergentes().values_list(
+            'pk', 'nome', 'estoque_disponivel', 'real_disponivel',
+            'estoque_alocado', 'real_alocado',
+        )
+        ids = []
+        for pk, nome, disp, real_disp, aloc, real_aloc in divergentes.iterator():
+            ids.append(pk)
+            self.stdout.write(
+                f"{pk} {nome}: disponível {disp} -> {real_disp}, alocado {aloc} -> {real_aloc}"
+            )
+        if not ids:
+            self.stdout.write(self.style.SUCCESS("Contadores em dia."))
+            return
+        if options['verificar']:
+            self.stdout.write(self.style.WARNING(f"{len(ids)} produtos divergentes."))
+            return
+        contadores.reconstruir(contadores.Produto.objects.filter(pk__in=ids))
+        self.stdout.write(self.style.SUCCESS(f"{len(ids)} produtos corrigidos."))
@@ -0,0 +1,16 @@
+# camarim/management/commands/recalcular_totais_propostas.py
+from django.core.management.base import BaseCommand
+from camarim.services.propostas import LOTE, recalcular_todas
+
+class Command(BaseCommand):
+    help = "Recalcula o subtotal e o total gravados de todas as propostas a partir dos itens"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=LOTE,
+            help=f"Propostas por transação (padrão: {LOTE})",
+        )
+
+    def handle(self, *args, **options):
+        total = recalcular_todas(options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{total} proposta(s) recalculada(s)."))
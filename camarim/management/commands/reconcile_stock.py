@@ -0,0 +1,70 @@
+# camarim/management/commands/reconcile_stock.py
+import csv
+import json
+
+from django.core.management.base import BaseCommand
+from camarim.services import conciliacao
+from camarim.services.estoque import consolidar_shards
+
+class Command(BaseCommand):
+    help = (
+        "Confere o estoque (linhas faltando, salas com saldo negativo, produtos "
+        "sobrealocados nas datas dos eventos, contadores divergentes) e gera um "
+        "relatório em CSV ou NDJSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--formato', choices=['csv', 'ndjson'], default='csv',
+            help="Formato do relatório (padrão: csv)",
+        )
+        parser.add_argument(
+            '--saida', default='-',
+            help="Arquivo do relatório; '-' para a saída padrão",
+        )
+        parser.add_argument(
+            '--aplicar', action='store_true',
+            help="Depois do relatório, cria as linhas faltando e reconstrói os contadores",
+        )
+        parser.add_argument(
+            '--lote', type=int, default=conciliacao.LOTE,
+            help="Produtos por lote nas correções",
+        )
+
+    def handle(self, *args, **options):
+        na_tela = options['saida'] == '-'
+        destino = self.stdout if na_tela else open(options['saida'], 'w', newline='')
+        # com o relatório na saída padrão, o resumo vai para stderr
+        resumo = self.stderr if na_tela else self.stdout
+        if options['aplicar']:
+            # as correções mexem só na linha de Estoque: traz as parcelas para ela.
+            # Sem --aplicar nada é gravado; as verificações somam as parcelas na leitura
+            consolidar_shards()
+        try:
+            total = self.relatorio(destino, options['formato'])
+        finally:
+            if not na_tela:
+                destino.close()
+        resumo.write(f"{total} problema(s) encontrado(s).")
+
+        if not options['aplicar'] or not total:
+            return
+        lote = options['lote']
+        resumo.write(f"Linhas de estoque criadas: {conciliacao.criar_faltantes(lote)}")
+        resumo.write(f"Contadores corrigidos: {conciliacao.corrigir_contadores(lote)}")
+        resumo.write(self.style.SUCCESS("Correções aplicadas."))
+
+    def relatorio(self, destino, formato):
+        campos = conciliacao.Problema._fields
+        if formato == 'csv':
+            escritor = csv.writer(destino)
+            escritor.writerow(campos)
+            escrever = escritor.writerow
+        else:
+            def escrever(problema):
+                destino.write(json.dumps(dict(zip(campos, problema))) + '\n')
+        total = 0
+        for problema in conciliacao.problemas():
+            escrever(problema)
+            total += 1
+        return total
@@ -0,0 +1,17 @@
+# camarim/management/commands/reconstruir_estatisticas.py
+from django.core.management.base import BaseCommand
+from camarim.services import estatisticas
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula as estatísticas do painel e os contadores de produtos por "
+        "categoria a partir das tabelas (corrige desvios de alterações em massa)"
+    )
+
+    def handle(self, *args, **options):
+        stats = estatisticas.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats.total_eventos} eventos, {stats.total_salas} salas, "
+            f"{stats.total_produtos} produtos, {stats.total_propostas} propostas "
+            f"(R$ {stats.valor_total_propostas:.2f})."
+        ))
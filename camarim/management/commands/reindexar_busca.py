@@ -0,0 +1,19 @@
+# camarim/management/commands/reindexar_busca.py
+from django.core.management.base import BaseCommand
+from camarim.services import autocompletar
+from camarim.services.busca import LOTE, reindexar_todos
+
+class Command(BaseCommand):
+    help = "Refaz os índices de busca dos produtos (depois de importações e cargas em massa)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=LOTE,
+            help=f"Produtos por transação (padrão: {LOTE})",
+        )
+
+    def handle(self, *args, **options):
+        total = reindexar_todos(options['lote'])
+        # e o autocompletar de cada processo remonta na próxima busca
+        autocompletar.invalidar()
+        self.stdout.write(self.style.SUCCESS(f"{total} produto(s) indexado(s)."))
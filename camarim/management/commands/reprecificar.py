@@ -0,0 +1,61 @@
+# camarim/management/commands/reprecificar.py
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from camarim.services.precos import TabelaInvalida, ler_tabela, reajustar
+
+class Command(BaseCommand):
+    help = (
+        "Reajusta preços em lote a partir de uma tabela CSV/XLSX ou de um "
+        "percentual por categoria; sem --aplicar só mostra as diferenças"
+    )
+
+    def add_arguments(self, parser):
+        origem = parser.add_mutually_exclusive_group(required=True)
+        origem.add_argument(
+            '--arquivo',
+            help="CSV ou XLSX com as colunas 'id' ou 'nome' e 'preco'",
+        )
+        origem.add_argument(
+            '--percentual', type=Decimal,
+            help="Reajuste em %% (negativo para reduzir) dos produtos das --categoria",
+        )
+        parser.add_argument(
+            '--categoria', type=int, nargs='+', default=[],
+            help="Ids das categorias (com --percentual)",
+        )
+        parser.add_argument(
+            '--propostas', action='store_true',
+            help="Leva o preço novo aos itens das propostas abertas",
+        )
+        parser.add_argument(
+            '--aplicar', action='store_true',
+            help="Grava o reajuste (sem isto é só uma simulação)",
+        )
+
+    def handle(self, *args, **options):
+        precos = None
+        if options['arquivo']:
+            try:
+                precos, ignorados = ler_tabela(options['arquivo'])
+            except (OSError, TabelaInvalida) as erro:
+                raise CommandError(str(erro))
+            for chave in ignorados:
+                self.stderr.write(self.style.WARNING(f"Produto não encontrado: {chave}"))
+        elif not options['categoria']:
+            raise CommandError("Informe as categorias do reajuste (--categoria).")
+
+        resultado = reajustar(
+            precos, categorias=options['categoria'], percentual=options['percentual'],
+            propostas=options['propostas'], simular=not options['aplicar'],
+        )
+        for pk, nome, antes, depois in resultado.diferencas:
+            self.stdout.write(f"{pk} {nome}: {antes} -> {depois}")
+
+        resumo = f"{len(resultado.diferencas)} produto(s) com preço novo"
+        if options['propostas']:
+            resumo += f", {resultado.itens} item(ns) em {resultado.propostas} proposta(s) aberta(s)"
+        if options['aplicar']:
+            self.stdout.write(self.style.SUCCESS(resumo + "."))
+        else:
+            self.stdout.write(self.style.WARNING(resumo + " (simulação; use --aplicar para gravar)."))
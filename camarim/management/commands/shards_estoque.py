@@ -0,0 +1,71 @@
+# camarim/management/commands/shards_estoque.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from camarim.models import Produto
+from camarim.services.estoque import ativar_shards, consolidar_shards, desativar_shards
+
+class Command(BaseCommand):
+    help = (
+        "Liga/desliga a repartição do estoque geral em parcelas (produtos muito "
+        "disputados) e consolida as parcelas de volta na linha de Estoque"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('produtos', nargs='*', type=int, help="Ids dos produtos")
+        grupo = parser.add_mutually_exclusive_group(required=True)
+        grupo.add_argument(
+            '--ativar', type=int, metavar='N',
+            help="Reparte o estoque dos produtos em N parcelas",
+        )
+        grupo.add_argument(
+            '--desativar', action='store_true',
+            help="Volta os produtos para uma única linha de Estoque",
+        )
+        grupo.add_argument(
+            '--compactar', action='store_true',
+            help="Consolida as parcelas (dos produtos informados ou de todos)",
+        )
+        grupo.add_argument(
+            '--listar', action='store_true',
+            help="Lista os produtos repartidos",
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=0,
+            help="Com --compactar, repete a cada INTERVALO segundos (processo em segundo plano)",
+        )
+
+    def handle(self, *args, **options):
+        produtos = options['produtos']
+        if options['listar']:
+            for pk, nome, n in Produto.objects.filter(shards__gt=0).values_list('pk', 'nome', 'shards'):
+                self.stdout.write(f"{pk} {nome}: {n} parcelas")
+            return
+
+        if options['compactar']:
+            while True:
+                total = consolidar_shards(produtos or None)
+                self.stdout.write(f"{total} produto(s) consolidado(s).")
+                if not options['intervalo']:
+                    return
+                time.sleep(options['intervalo'])
+
+        if not produtos:
+            raise CommandError("Informe os ids dos produtos.")
+        encontrados = set(Produto.objects.filter(pk__in=produtos).values_list('pk', flat=True))
+        faltando = sorted(set(produtos) - encontrados)
+        if faltando:
+            raise CommandError(f"Produtos não encontrados: {', '.join(map(str, faltando))}")
+
+        if options['desativar']:
+            for pk in sorted(encontrados):
+                desativar_shards(pk)
+            self.stdout.write(self.style.SUCCESS(f"{len(encontrados)} produto(s) sem parcelas."))
+            return
+        if not 1 <= options['ativar'] <= 64:
+            raise CommandError("O número de parcelas deve estar entre 1 e 64.")
+        for pk in sorted(encontrados):
+            ativar_shards(pk, options['ativar'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(encontrados)} produto(s) repartido(s) em {options['ativar']} parcelas."
+        ))
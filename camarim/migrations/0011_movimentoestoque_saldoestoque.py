@@ -0,0 +1,68 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def semear_saldos(apps, schema_editor):
+    """O histórico começa aqui: grava o saldo atual de cada local como foto inicial."""
+    Estoque = apps.get_model('camarim', 'Estoque')
+    EstoqueSala = apps.get_model('camarim', 'EstoqueSala')
+    SaldoEstoque = apps.get_model('camarim', 'SaldoEstoque')
+    agora = django.utils.timezone.now()
+    fotos = [
+        SaldoEstoque(produto_id=linha['produto_id'], sala_id=None,
+                     quantidade=linha['total'], data=agora)
+        for linha in Estoque.objects.values('produto_id').annotate(total=Sum('quantidade'))
+    ]
+    fotos += [
+        SaldoEstoque(produto_id=item.produto_id, sala_id=item.sala_id,
+                     quantidade=item.quantidade, data=agora)
+        for item in EstoqueSala.objects.all().iterator()
+    ]
+    SaldoEstoque.objects.bulk_create(fotos, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0010_rename_data_criacao_proposta_created_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimentoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('ajuste', 'Ajuste'), ('alocacao', 'Alocação'), ('devolucao', 'Devolução'), ('baixa', 'Baixa')], max_length=10)),
+                ('delta', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('destino', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movimentos_entrada', to='camarim.sala')),
+                ('origem', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movimentos_saida', to='camarim.sala')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimentos', to='camarim.produto')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['produto', 'created_at'], name='camarim_mov_produto_6f0248_idx'), models.Index(fields=['destino', 'created_at'], name='camarim_mov_destino_4a1b33_idx'), models.Index(fields=['origem', 'created_at'], name='camarim_mov_origem__5e0f86_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SaldoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.BigIntegerField()),
+                ('ultimo_movimento', models.BigIntegerField(default=0)),
+                ('data', models.DateTimeField(default=django.utils.timezone.now)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos', to='camarim.produto')),
+                ('sala', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='camarim.sala')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['produto', 'sala', 'data'], name='camarim_sal_produto_c50941_idx')],
+            },
+        ),
+        migrations.RunPython(semear_saldos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:31
+
+from django.db import migrations, models
+from django.db.models import BigIntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_contadores(apps, schema_editor):
+    Produto = apps.get_model('camarim', 'Produto')
+    Estoque = apps.get_model('camarim', 'Estoque')
+    EstoqueSala = apps.get_model('camarim', 'EstoqueSala')
+    geral = Coalesce(Subquery(
+        Estoque.objects.filter(produto=OuterRef('pk')).order_by()
+               .values('produto').annotate(t=Sum('quantidade')).values('t')
+    ), Value(0), output_field=BigIntegerField())
+    salas = Coalesce(Subquery(
+        EstoqueSala.objects.filter(produto=OuterRef('pk')).order_by()
+                   .values('produto').annotate(t=Sum('quantidade')).values('t')
+    ), Value(0), output_field=BigIntegerField())
+    Produto.objects.update(
+        estoque_disponivel=geral, estoque_alocado=salas, estoque_total=geral + salas
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0011_movimentoestoque_saldoestoque'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='estoque_alocado',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='estoque_disponivel',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='estoque_total',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0012_produto_contadores_estoque'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['data_inicial', 'data_final'], name='camarim_eve_data_in_ed53a2_idx'),
+        ),
+    ]
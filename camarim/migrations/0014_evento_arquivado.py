@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0013_evento_periodo_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='arquivado',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='encerrado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
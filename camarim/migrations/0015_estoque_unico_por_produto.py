@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def mesclar_duplicados(apps, schema_editor):
+    """Soma as linhas repetidas de cada produto na de menor id e apaga as outras."""
+    Estoque = apps.get_model('camarim', 'Estoque')
+    grupos = (
+        Estoque.objects.values('produto_id')
+               .annotate(linhas=Count('pk'), total=Sum('quantidade'), manter=Min('pk'))
+               .filter(linhas__gt=1)
+               .order_by()
+    )
+    for grupo in list(grupos):
+        Estoque.objects.filter(pk=grupo['manter']).update(quantidade=grupo['total'])
+        Estoque.objects.filter(produto_id=grupo['produto_id']) \
+               .exclude(pk=grupo['manter']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0014_evento_arquivado'),
+    ]
+
+    operations = [
+        migrations.RunPython(mesclar_duplicados, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='estoque',
+            name='produto',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='estoque', to='camarim.produto'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0015_estoque_unico_por_produto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='shards',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='EstoqueShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveSmallIntegerField()),
+                ('quantidade', models.BigIntegerField(default=0)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estoque_shards', to='camarim.produto')),
+            ],
+            options={
+                'unique_together': {('produto', 'indice')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0016_estoque_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estoque',
+            name='versao',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='estoquesala',
+            name='versao',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='itemproposta',
+            name='versao',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='proposta',
+            name='versao',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
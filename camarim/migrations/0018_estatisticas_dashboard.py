@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0017_versao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticasDashboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_eventos', models.PositiveIntegerField(default=0)),
+                ('total_produtos', models.PositiveIntegerField(default=0)),
+                ('total_salas', models.PositiveIntegerField(default=0)),
+                ('total_propostas', models.PositiveIntegerField(default=0)),
+                ('total_categorias', models.PositiveIntegerField(default=0)),
+                ('valor_total_propostas', models.DecimalField(decimal_places=4, default=0, max_digits=18)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'estatísticas do painel',
+                'verbose_name_plural': 'estatísticas do painel',
+            },
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='total_produtos',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:52
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+
+def preencher_totais(apps, schema_editor):
+    """Grava os totais das propostas existentes (mesma conta de PropostaQuerySet.gravar_totais)."""
+    Proposta = apps.get_model('camarim', 'Proposta')
+    ItemProposta = apps.get_model('camarim', 'ItemProposta')
+    valor = DecimalField(max_digits=18, decimal_places=2)
+    itens = (
+        ItemProposta.objects.filter(proposta=OuterRef('pk')).order_by()
+                    .values('proposta')
+                    .annotate(s=Sum(F('preco_unitario') * F('quantidade'), output_field=valor))
+                    .values('s')
+    )
+    subtotal = Coalesce(Subquery(itens), Value(Decimal(0)), output_field=valor)
+    Proposta.objects.update(
+        subtotal=subtotal,
+        total=subtotal + Round(subtotal * F('impostos') * Value(Decimal('0.01')), 2, output_field=valor),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0018_estatisticas_dashboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposta',
+            name='subtotal',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='proposta',
+            name='total',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='estatisticasdashboard',
+            name='valor_total_propostas',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=18),
+        ),
+        migrations.RunPython(preencher_totais, migrations.RunPython.noop),
+    ]
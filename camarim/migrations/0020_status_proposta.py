@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0019_totais_proposta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposta',
+            name='status',
+            field=models.CharField(choices=[('aberta', 'Aberta'), ('aprovada', 'Aprovada'), ('recusada', 'Recusada')], db_index=True, default='aberta', max_length=10),
+        ),
+    ]
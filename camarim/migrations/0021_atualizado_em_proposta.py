@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0020_status_proposta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proposta',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
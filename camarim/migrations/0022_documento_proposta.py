@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:02
+
+import camarim.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0021_atualizado_em_proposta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoProposta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('formato', models.CharField(choices=[('pdf', 'PDF'), ('xlsx', 'Planilha XLSX')], max_length=4)),
+                ('revisao', models.CharField(max_length=40)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('gerando', 'Gerando'), ('pronto', 'Pronto'), ('erro', 'Erro')], default='pendente', max_length=10)),
+                ('arquivo', models.FileField(blank=True, upload_to=camarim.models._caminho_documento)),
+                ('erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('proposta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documentos', to='camarim.proposta')),
+            ],
+            options={
+                'unique_together': {('proposta', 'formato', 'revisao')},
+            },
+        ),
+    ]
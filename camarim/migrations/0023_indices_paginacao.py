@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0022_documento_proposta'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['nome', 'id'], name='camarim_pro_nome_5a3085_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proposta',
+            index=models.Index(fields=['created_at', 'id'], name='camarim_pro_created_07493b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sala',
+            index=models.Index(fields=['evento', 'nome', 'id'], name='camarim_sal_evento__47b2de_idx'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:09
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS = 'camarim_buscaproduto_fts'
+
+SQLITE = [
+    # tabela FTS5 de conteúdo externo: lê o texto de camarim_buscaproduto e
+    # é mantida pelos gatilhos abaixo
+    f"""CREATE VIRTUAL TABLE {FTS} USING fts5(
+        nome, texto, content='camarim_buscaproduto', content_rowid='produto_id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER {FTS}_ai AFTER INSERT ON camarim_buscaproduto BEGIN
+        INSERT INTO {FTS}(rowid, nome, texto) VALUES (new.produto_id, new.nome, new.texto);
+    END""",
+    f"""CREATE TRIGGER {FTS}_ad AFTER DELETE ON camarim_buscaproduto BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, nome, texto) VALUES ('delete', old.produto_id, old.nome, old.texto);
+    END""",
+    f"""CREATE TRIGGER {FTS}_au AFTER UPDATE ON camarim_buscaproduto BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, nome, texto) VALUES ('delete', old.produto_id, old.nome, old.texto);
+        INSERT INTO {FTS}(rowid, nome, texto) VALUES (new.produto_id, new.nome, new.texto);
+    END""",
+]
+SQLITE_REVERSO = [
+    f"DROP TRIGGER IF EXISTS {FTS}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS}_au",
+    f"DROP TABLE IF EXISTS {FTS}",
+]
+# o InnoDB cria um índice FULLTEXT por ALTER
+MYSQL = [
+    "ALTER TABLE camarim_buscaproduto ADD FULLTEXT INDEX camarim_buscaproduto_nome_ft (nome)",
+    "ALTER TABLE camarim_buscaproduto ADD FULLTEXT INDEX camarim_buscaproduto_texto_ft (texto)",
+]
+MYSQL_REVERSO = [
+    "ALTER TABLE camarim_buscaproduto DROP INDEX camarim_buscaproduto_texto_ft",
+    "ALTER TABLE camarim_buscaproduto DROP INDEX camarim_buscaproduto_nome_ft",
+]
+
+
+def _executar(schema_editor, comandos):
+    for sql in comandos.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def criar_indice_textual(apps, schema_editor):
+    _executar(schema_editor, {'sqlite': SQLITE, 'mysql': MYSQL})
+
+
+def remover_indice_textual(apps, schema_editor):
+    _executar(schema_editor, {'sqlite': SQLITE_REVERSO, 'mysql': MYSQL_REVERSO})
+
+
+def _normalizar(texto):
+    """Mesma conta de services.busca.normalizar."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acento = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', sem_acento.casefold()))
+
+
+def indexar_produtos(apps, schema_editor):
+    Produto = apps.get_model('camarim', 'Produto')
+    BuscaProduto = apps.get_model('camarim', 'BuscaProduto')
+    linhas = Produto.objects.order_by('pk').values_list('pk', 'nome', 'descricao', 'categoria__nome')
+    BuscaProduto.objects.bulk_create(
+        (
+            BuscaProduto(
+                produto_id=pk,
+                nome=_normalizar(nome)[:200],
+                texto=_normalizar(' '.join(filter(None, [nome, categoria, descricao]))),
+            )
+            for pk, nome, descricao, categoria in linhas.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0023_indices_paginacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuscaProduto',
+            fields=[
+                ('produto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='busca', serialize=False, to='camarim.produto')),
+                ('nome', models.CharField(max_length=200)),
+                ('texto', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(criar_indice_textual, remover_indice_textual),
+        migrations.RunPython(indexar_produtos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camarim', '0024_busca_produto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoProdutos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('versao', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'versão dos produtos',
+                'verbose_name_plural': 'versão dos produtos',
+            },
+        ),
+    ]
@@ -1,13 +1,95 @@
-from django.db import models, transaction
+from django.conf import settings
+from django.db import models
 from djmoney.models.fields import MoneyField
 from django.utils import timezone
-from decimal import Decimal
-from django.db.models import Sum
+from decimal import Decimal, ROUND_HALF_UP
+from django.db.models import BigIntegerField, Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Now, Round
+from django.db.models.signals import post_save, pre_save
+
+class ConflitoDeVersao(Exception):
+    """A linha foi alterada por outra edição desde que foi lida."""
+
+    def __init__(self, objeto):
+        self.objeto = objeto
+        super().__init__(f"{objeto._meta.verbose_name} foi alterado(a) por outra edição.")
+
+
+class Versionado(models.Model):
+    """
+    Controle de concorrência otimista: ``versao`` sobe a cada alteração e a
+    edição só é gravada com ``UPDATE ... WHERE versao = <versão lida>``.
+    """
+    versao = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def salvar_se_versao(self, versao, campos):
+        """
+        Grava ``campos`` se a linha ainda está na ``versao`` lida pelo
+        formulário; senão não grava nada e levanta ``ConflitoDeVersao``.
+
+        Envia ``pre_save``/``post_save`` como um ``save(update_fields=...)``,
+        para que os receptores (estatísticas do painel) vejam a alteração.
+        """
+        modelo, using = type(self), self._state.db or 'default'
+        # campos auto_now andam junto, como num save()
+        campos = list(campos) + [
+            f.name for f in self._meta.concrete_fields
+            if getattr(f, 'auto_now', False) and f.name not in campos
+        ]
+        for nome in campos:
+            campo = self._meta.get_field(nome)
+            if getattr(campo, 'auto_now', False):
+                campo.pre_save(self, add=False)
+        update_fields = frozenset(campos)
+        pre_save.send(sender=modelo, instance=self, raw=False, using=using,
+                      update_fields=update_fields)
+        valores = {
+            f.attname: getattr(self, f.attname)
+            for f in (self._meta.get_field(nome) for nome in campos)
+        }
+        alterados = modelo._default_manager.filter(pk=self.pk, versao=versao).update(
+            versao=models.F('versao') + 1, **valores
+        )
+        if not alterados:
+            raise ConflitoDeVersao(self)
+        self.versao = versao + 1
+        post_save.send(sender=modelo, instance=self, created=False, raw=False, using=using,
+                       update_fields=update_fields)
+
+
+def _agregado(queryset, campo, agregado):
+    """
+    Subconsulta com ``agregado`` das linhas de ``queryset`` cujo ``campo``
+    aponta para a linha externa (0 se não houver). Somar por subconsulta
+    em vez de JOIN evita que duas anotações multipliquem as linhas uma da
+    outra.
+    """
+    linhas = queryset.filter(**{campo: OuterRef('pk')}).order_by().values(campo) \
+                     .annotate(a=agregado).values('a')
+    return Coalesce(Subquery(linhas), Value(0), output_field=BigIntegerField())
+
 
 class Categoria(models.Model):
     nome = models.CharField(max_length=100)
+    # mantido pelos sinais de Produto (camarim.signals)
+    total_produtos = models.PositiveIntegerField(default=0, db_index=True)
     def __str__(self): return self.nome
 
+class ProdutoQuerySet(models.QuerySet):
+    def with_stock(self):
+        """
+        Forma das listas de produtos: categoria no mesmo SELECT e
+        ``num_salas`` (salas com o produto alocado). O estoque em si já vem
+        dos contadores do produto (services.contadores).
+        """
+        return self.select_related('categoria').annotate(
+            num_salas=_agregado(EstoqueSala.objects.filter(quantidade__gt=0), 'produto', Count('pk')),
+        )
+
+
 class Produto(models.Model):
     def caminho_imagem(instance, filename):
         return f'{timezone.now().year}/{timezone.now().month}/{filename}'
@@ -16,19 +98,74 @@ class Produto(models.Model):
     categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, related_name='produtos')
     imagem    = models.ImageField(upload_to='produtos/%Y/%m', blank=True, null=True)
     descricao = models.TextField(blank=True, null=True)
+    # contadores mantidos pelo services.estoque na mesma transação das
+    # escritas em Estoque/EstoqueSala (conferir com `recalcular_contadores`)
+    estoque_disponivel = models.BigIntegerField(default=0, db_index=True)  # no geral
+    estoque_alocado    = models.BigIntegerField(default=0)                 # nas salas
+    estoque_total      = models.BigIntegerField(default=0)                 # geral + salas
+    # > 0: o estoque geral fica repartido em N parcelas EstoqueShard (produto
+    # muito disputado); ligar/desligar com o comando `shards_estoque`
+    shards             = models.PositiveSmallIntegerField(default=0)
+
+    objects = ProdutoQuerySet.as_manager()
+
+    class Meta:
+        # ordem das listas paginadas por cursor (camarim.pagination)
+        indexes = [models.Index(fields=['nome', 'id'])]
+
     def __str__(self): return self.nome
 
 
-class Estoque(models.Model):
-    # produto    = models.ForeignKey(Produto, on_delete=models.CASCADE)
-    produto    = models.ForeignKey(
+class BuscaProduto(models.Model):
+    """
+    Índice de busca textual do produto (services.busca): nome, categoria e
+    descrição sem acentos, em minúsculas e separados em palavras. Coberto
+    por FULLTEXT no MySQL e por uma tabela FTS5 no SQLite (migração 0024);
+    mantido pelos sinais de Produto e Categoria.
+    """
+    produto = models.OneToOneField(Produto, on_delete=models.CASCADE, primary_key=True, related_name='busca')
+    nome    = models.CharField(max_length=200)
+    texto   = models.TextField()
+
+    def __str__(self): return self.texto
+
+
+class Estoque(Versionado):
+    # uma única linha de estoque geral por produto (produto.estoque no reverse)
+    produto    = models.OneToOneField(
         Produto,
         on_delete=models.CASCADE,
-        related_name='estoques'      # agora você pode usar .estoques no reverse
+        related_name='estoque'
     )
     quantidade = models.BigIntegerField()
     def __str__(self): return f"{self.produto.nome}: {self.quantidade}"
 
+class EstoqueShard(models.Model):
+    """
+    Parcela do Estoque geral de um produto com `shards` > 0. O saldo geral é
+    a linha de Estoque mais a soma das parcelas; cada escrita cai numa
+    parcela sorteada, para que alocações simultâneas não disputem a mesma
+    linha. `shards_estoque --compactar` devolve as parcelas para o Estoque.
+    """
+    produto    = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='estoque_shards')
+    indice     = models.PositiveSmallIntegerField()
+    quantidade = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('produto', 'indice')
+
+    def __str__(self): return f"{self.produto.nome} [{self.indice}]: {self.quantidade}"
+
+class EventoQuerySet(models.QuerySet):
+    def with_stats(self):
+        """Anota ``num_salas``, ``num_propostas`` e ``unidades_alocadas`` (nas salas)."""
+        return self.annotate(
+            num_salas=_agregado(Sala.objects.all(), 'evento', Count('pk')),
+            num_propostas=_agregado(Proposta.objects.all(), 'evento', Count('pk')),
+            unidades_alocadas=_agregado(EstoqueSala.objects.all(), 'sala__evento', Sum('quantidade')),
+        )
+
+
 class Evento(models.Model):
     nome         = models.CharField(max_length=200)
     local        = models.CharField(max_length=200, blank=True)
@@ -36,8 +173,45 @@ class Evento(models.Model):
     data_final   = models.DateField(null=True, blank=True)
     descricao    = models.TextField(blank=True)
     imagem       = models.ImageField(upload_to='evento/%Y/%m', blank=True, null=True)
+    arquivado    = models.BooleanField(default=False)
+    encerrado_em = models.DateTimeField(null=True, blank=True)
+
+    objects = EventoQuerySet.as_manager()
+
+    class Meta:
+        # usado pela disponibilidade por período (eventos que cruzam uma janela)
+        indexes = [models.Index(fields=['data_inicial', 'data_final'])]
+
     def __str__(self): return self.nome
 
+    def encerrar(self, contagens=None, usuario=None):
+        """
+        Devolve ao Estoque geral tudo o que está nas salas do evento e o
+        arquiva. `contagens` ({id do EstoqueSala: quantidade contada}) registra
+        como baixa o que não voltou.
+        """
+        from .services.estoque import encerrar_evento
+
+        return encerrar_evento(self, contagens, usuario=usuario)
+
+    def gerar_proposta(self, impostos=0):
+        """Cria uma `Proposta` com um item por produto alocado em cada sala."""
+        from .services.propostas import gerar_proposta
+
+        return gerar_proposta(self, impostos=impostos)
+
+class SalaQuerySet(models.QuerySet):
+    def with_stock_totals(self):
+        """
+        Evento no mesmo SELECT (``str(sala)`` usa o nome dele) e, do
+        EstoqueSala, ``num_produtos`` alocados e o total de ``unidades``.
+        """
+        return self.select_related('evento').annotate(
+            num_produtos=Count('estoque_salas', filter=Q(estoque_salas__quantidade__gt=0)),
+            unidades=Coalesce(Sum('estoque_salas__quantidade'), Value(0), output_field=BigIntegerField()),
+        )
+
+
 class Sala(models.Model):
     nome   = models.CharField(max_length=100)
     evento = models.ForeignKey(
@@ -45,6 +219,12 @@ class Sala(models.Model):
         on_delete=models.CASCADE,
         related_name='salas'
     )
+
+    objects = SalaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['evento', 'nome', 'id'])]
+
     def __str__(self):
         return f"{self.nome} ({self.evento.nome})"
     
@@ -53,31 +233,11 @@ class Sala(models.Model):
         Clona esta sala para `novo_evento`, copiando todo o EstoqueSala
         associado e debitando do Estoque geral.
         """
-        from .models import EstoqueSala, Estoque
+        from .services.estoque import replicar_salas
 
-        with transaction.atomic():
-            # 1) Cria a nova sala
-            sala_nova = Sala.objects.create(
-                nome=self.nome,
-                evento=novo_evento
-            )
-            # 2) Para cada item de estoque na sala original
-            itens = EstoqueSala.objects.filter(sala=self)
-            for item in itens:
-                # 2a) Cria no estoque da nova sala
-                EstoqueSala.objects.create(
-                    sala=sala_nova,
-                    produto=item.produto,
-                    quantidade=item.quantidade
-                )
-                # 2b) Debita do estoque geral
-                est_geral = Estoque.objects.get(produto=item.produto)
-                est_geral.quantidade -= item.quantidade
-                est_geral.save()
-
-            return sala_nova
-
-class EstoqueSala(models.Model):
+        return replicar_salas([self], [novo_evento])[0]
+
+class EstoqueSala(Versionado):
     sala       = models.ForeignKey(
         Sala,
         on_delete=models.CASCADE,
@@ -96,25 +256,221 @@ class EstoqueSala(models.Model):
     def __str__(self):
         return f"{self.sala.nome}—{self.produto.nome}: {self.quantidade}"
     
-class Proposta(models.Model):
+class MovimentoEstoque(models.Model):
+    """
+    Livro-razão (somente inserção) de tudo que entra e sai do estoque.
+
+    Sala vazia em `origem`/`destino` significa o Estoque geral. As salas são
+    guardadas sem chave estrangeira real para o histórico sobreviver à
+    exclusão da sala.
+    """
+    AJUSTE    = 'ajuste'     # entrada/saída externa no geral (delta com sinal)
+    ALOCACAO  = 'alocacao'   # geral -> destino
+    DEVOLUCAO = 'devolucao'  # origem -> geral
+    BAIXA     = 'baixa'      # origem -> fora do estoque (perda)
+    TIPOS = [
+        (AJUSTE, 'Ajuste'),
+        (ALOCACAO, 'Alocação'),
+        (DEVOLUCAO, 'Devolução'),
+        (BAIXA, 'Baixa'),
+    ]
+
+    produto    = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='movimentos')
+    origem     = models.ForeignKey(
+        Sala, on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='movimentos_saida'
+    )
+    destino    = models.ForeignKey(
+        Sala, on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='movimentos_entrada'
+    )
+    tipo       = models.CharField(max_length=10, choices=TIPOS)
+    delta      = models.BigIntegerField()
+    usuario    = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['produto', 'created_at']),
+            models.Index(fields=['destino', 'created_at']),
+            models.Index(fields=['origem', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.produto_id}: {self.delta}"
+
+
+class SaldoEstoque(models.Model):
+    """
+    Foto do saldo de um produto num local (sala vazia = geral) depois do
+    movimento `ultimo_movimento`. Gerada por `compactar_movimentos`.
+    """
+    produto          = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='saldos')
+    sala             = models.ForeignKey(
+        Sala, on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='+'
+    )
+    quantidade       = models.BigIntegerField()
+    ultimo_movimento = models.BigIntegerField(default=0)
+    data             = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['produto', 'sala', 'data']),
+        ]
+
+    def __str__(self):
+        return f"{self.produto_id}@{self.sala_id or 'geral'}: {self.quantidade}"
+
+
+CENTAVO = Decimal('0.01')
+VALOR = DecimalField(max_digits=18, decimal_places=2)
+
+
+def _soma_itens():
+    itens = (
+        ItemProposta.objects.filter(proposta=OuterRef('pk')).order_by()
+                    .values('proposta')
+                    .annotate(s=Sum(F('preco_unitario') * F('quantidade'), output_field=VALOR))
+                    .values('s')
+    )
+    return Coalesce(Subquery(itens), Value(Decimal(0)), output_field=VALOR)
+
+
+def _impostos_sobre(subtotal):
+    # multiplica por 0.01 em vez de dividir por 100: no SQLite a divisão
+    # de dois inteiros trunca
+    return Round(subtotal * F('impostos') * Value(CENTAVO), 2, output_field=VALOR)
+
+
+class PropostaQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Anota ``valor_subtotal``, ``valor_impostos`` e ``valor_total`` calculados
+        a partir dos itens no banco (impostos arredondados ao centavo, metade
+        para cima). É a referência para os totais gravados em `Proposta`.
+        """
+        return self.annotate(
+            valor_subtotal=_soma_itens(),
+        ).annotate(
+            valor_impostos=_impostos_sobre(F('valor_subtotal')),
+        ).annotate(
+            valor_total=F('valor_subtotal') + F('valor_impostos'),
+        )
+
+    def gravar_totais(self, versionar=True):
+        """Regrava ``subtotal`` e ``total`` a partir dos itens, num UPDATE só."""
+        campos = {
+            'subtotal': _soma_itens(),
+            'total': _soma_itens() + _impostos_sobre(_soma_itens()),
+            # os itens mudaram: invalida o que foi renderizado (Proposta.revisao)
+            'atualizado_em': Now(),
+        }
+        if versionar:
+            campos['versao'] = F('versao') + 1
+        return self.update(**campos)
+
+
+class Proposta(Versionado):
+    ABERTA   = 'aberta'     # ainda acompanha os reajustes de preço (services.precos)
+    APROVADA = 'aprovada'
+    RECUSADA = 'recusada'
+    STATUS = [
+        (ABERTA, 'Aberta'),
+        (APROVADA, 'Aprovada'),
+        (RECUSADA, 'Recusada'),
+    ]
+
     evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='propostas')
+    status = models.CharField(max_length=10, choices=STATUS, default=ABERTA, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
     impostos = models.DecimalField('Impostos (%)', max_digits=5, decimal_places=2, default=0)
+    # gravados por services.propostas.recalcular_totais quando itens ou impostos mudam
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, db_index=True)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, db_index=True)
 
-    @property
-    def subtotal(self):
-        return sum(item.total for item in self.itens.all())
+    objects = PropostaQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['created_at', 'id'])]
+
+    def save(self, *args, **kwargs):
+        # os totais em memória podem estar velhos: numa alteração, só
+        # gravar_totais escreve subtotal/total
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ('subtotal', 'total')
+            ]
+        super().save(*args, **kwargs)
+
+    def subtotais(self, por='sala'):
+        """
+        Quebra da proposta por ``'sala'`` ou ``'categoria'`` (do produto) numa
+        consulta GROUP BY: uma linha por grupo com ``grupo_id``, ``nome``,
+        ``itens``, ``unidades``, ``subtotal``, ``percentual`` do subtotal e
+        ``impostos`` (parte do imposto da proposta; os centavos de
+        arredondamento ficam no maior grupo, para a soma bater).
+        """
+        campo = {'sala': 'sala', 'categoria': 'produto__categoria'}[por]
+        linhas = list(
+            self.itens.order_by()
+                      .values(grupo_id=F(campo), nome=F(f'{campo}__nome'))
+                      .annotate(
+                          itens=Count('pk'),
+                          unidades=Sum('quantidade'),
+                          subtotal=Sum(F('preco_unitario') * F('quantidade'), output_field=VALOR),
+                      )
+                      .order_by('nome', 'grupo_id')
+        )
+        subtotal = sum((linha['subtotal'] for linha in linhas), Decimal(0))
+        for linha in linhas:
+            linha['subtotal'] = linha['subtotal'].quantize(CENTAVO)
+            linha['percentual'] = (
+                (linha['subtotal'] * 100 / subtotal).quantize(CENTAVO) if subtotal else Decimal(0)
+            )
+            linha['impostos'] = self._impostos_sobre(linha['subtotal'])
+        if linhas:
+            maior = max(linhas, key=lambda linha: linha['subtotal'])
+            maior['impostos'] += self._impostos_sobre(subtotal) - sum(l['impostos'] for l in linhas)
+        return linhas
+
+    # para os templates, que não passam argumentos
+    def subtotais_por_sala(self):
+        return self.subtotais('sala')
+
+    def subtotais_por_categoria(self):
+        return self.subtotais('categoria')
+
+    def _impostos_sobre(self, subtotal):
+        return (subtotal * self.impostos / 100).quantize(CENTAVO, ROUND_HALF_UP)
+
+    def itens_por_sala(self):
+        """Itens com sala e produto, na ordem de agrupamento por sala."""
+        return (
+            self.itens.select_related('sala', 'produto')
+                      .order_by('sala__nome', 'sala_id', 'produto__nome', 'pk')
+        )
 
     @property
-    def total_impostos(self):
-        return (self.subtotal * self.impostos / Decimal(100)).quantize(Decimal('0.01'))
+    def revisao(self):
+        """
+        Muda a cada alteração da proposta ou dos itens; compõe as chaves do
+        HTML guardado em cache (detalhe e descritivo).
+        """
+        return f"{self.versao}.{self.atualizado_em.timestamp():f}"
 
     @property
-    def total(self):
-        return (self.subtotal + self.total_impostos).quantize(Decimal('0.01'))
+    def total_impostos(self):
+        if hasattr(self, 'valor_impostos'):
+            return self.valor_impostos
+        return self.total - self.subtotal
 
 
-class ItemProposta(models.Model):
+class ItemProposta(Versionado):
     proposta = models.ForeignKey(Proposta, on_delete=models.CASCADE, related_name='itens')
     sala = models.ForeignKey(Sala, on_delete=models.CASCADE)
     produto = models.ForeignKey(Produto, on_delete=models.PROTECT)
@@ -126,7 +482,84 @@ class ItemProposta(models.Model):
         return (self.preco_unitario * self.quantidade).quantize(Decimal('0.01'))
 
     def save(self, *args, **kwargs):
-        # na criação, carrega preço padrão do produto
+        # na criação, carrega preço padrão do produto (só o valor, sem
+        # instanciar o Produto; `preco` é Money e aqui a coluna é decimal)
         if not self.pk and (self.preco_unitario is None or self.preco_unitario == 0):
-            self.preco_unitario = self.produto.preco
-        super().save(*args, **kwargs)
\ No newline at end of file
+            self.preco_unitario = (
+                Produto.objects.filter(pk=self.produto_id).values_list('preco', flat=True).first()
+            )
+        super().save(*args, **kwargs)
+
+
+def _caminho_documento(documento, nome):
+    revisao = documento.revisao.replace('.', '-')
+    return f"propostas/{documento.proposta_id}/{revisao}.{documento.formato}"
+
+
+class DocumentoProposta(models.Model):
+    """
+    PDF/XLSX de uma revisão da proposta, gerado em segundo plano
+    (services.documentos) e servido direto do MEDIA_ROOT enquanto a
+    proposta não mudar.
+    """
+    PDF  = 'pdf'
+    XLSX = 'xlsx'
+    FORMATOS = [(PDF, 'PDF'), (XLSX, 'Planilha XLSX')]
+
+    PENDENTE = 'pendente'
+    GERANDO  = 'gerando'
+    PRONTO   = 'pronto'
+    ERRO     = 'erro'
+    STATUS = [
+        (PENDENTE, 'Pendente'),
+        (GERANDO, 'Gerando'),
+        (PRONTO, 'Pronto'),
+        (ERRO, 'Erro'),
+    ]
+
+    proposta      = models.ForeignKey(Proposta, on_delete=models.CASCADE, related_name='documentos')
+    formato       = models.CharField(max_length=4, choices=FORMATOS)
+    revisao       = models.CharField(max_length=40)
+    status        = models.CharField(max_length=10, choices=STATUS, default=PENDENTE)
+    arquivo       = models.FileField(upload_to=_caminho_documento, blank=True)
+    erro          = models.TextField(blank=True)
+    criado_em     = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('proposta', 'formato', 'revisao')
+
+    def __str__(self):
+        return f"Proposta #{self.proposta_id} ({self.formato}, {self.get_status_display()})"
+
+
+class EstatisticasDashboard(models.Model):
+    """
+    Números do painel numa única linha (pk=1), mantidos por deltas nos sinais
+    de save/delete (camarim.signals). Operações em massa que não disparam
+    sinais são corrigidas com `reconstruir_estatisticas`.
+    """
+    total_eventos    = models.PositiveIntegerField(default=0)
+    total_produtos   = models.PositiveIntegerField(default=0)
+    total_salas      = models.PositiveIntegerField(default=0)
+    total_propostas  = models.PositiveIntegerField(default=0)
+    total_categorias = models.PositiveIntegerField(default=0)
+    valor_total_propostas = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    atualizado_em    = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'estatísticas do painel'
+        verbose_name_plural = 'estatísticas do painel'
+
+
+class VersaoProdutos(models.Model):
+    """
+    Versão dos nomes de produtos numa única linha (pk=1), que sobe a cada
+    produto criado, renomeado ou excluído (services.autocompletar). Fica fora
+    de `EstatisticasDashboard` para não disputar a linha do painel.
+    """
+    versao = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'versão dos produtos'
+        verbose_name_plural = 'versão dos produtos'
@@ -0,0 +1,152 @@
+# camarim/pagination.py
+"""
+Paginação por cursor (keyset) das listas do painel e dos endpoints JSON.
+
+Em vez de OFFSET, cada página continua a partir dos valores de ordenação do
+último (ou do primeiro) registro da página anterior, algo como
+``WHERE nome > :nome OR (nome = :nome AND id > :id)``; o banco desce pelo
+índice direto até o ponto, e a página 1000 custa o mesmo que a primeira.
+
+A ordenação precisa terminar numa coluna única (o ``id``) para o cursor ser
+estável, e as colunas não podem ser nulas. O cursor é opaco para o cliente:
+base64 de um JSON com o sentido (``p`` próxima, ``a`` anterior) e os valores.
+"""
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.db.models import Q
+
+POR_PAGINA = 50
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def _json(valor):
+    # isoformat completo: o DjangoJSONEncoder corta os microssegundos e o
+    # cursor deixaria de apontar para o registro exato
+    if isinstance(valor, (datetime.datetime, datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f"Valor de ordenação não serializável: {valor!r}")
+
+
+def codificar(sentido, valores):
+    dados = json.dumps([sentido, list(valores)], default=_json, separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip('=')
+
+
+def decodificar(cursor, colunas):
+    try:
+        dados = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sentido, valores = json.loads(dados)
+    except (binascii.Error, ValueError, TypeError):
+        raise CursorInvalido(cursor)
+    if sentido not in ('p', 'a') or not isinstance(valores, list) or len(valores) != colunas:
+        raise CursorInvalido(cursor)
+    return sentido, valores
+
+
+def _campo(chave):
+    return chave.lstrip('-')
+
+
+def _inverter(chave):
+    return _campo(chave) if chave.startswith('-') else f'-{chave}'
+
+
+def _valor(item, campo):
+    if isinstance(item, dict):
+        return item[campo]
+    for parte in campo.split('__'):
+        item = getattr(item, parte)
+    return item
+
+
+def _depois_de(ordem, valores):
+    """Registros que vêm depois de ``valores`` na ``ordem`` dada."""
+    seguintes = Q()
+    for i, chave in enumerate(ordem):
+        passo = 'lt' if chave.startswith('-') else 'gt'
+        condicao = Q(**{f'{_campo(chave)}__{passo}': valores[i]})
+        for anterior, valor in zip(ordem[:i], valores):
+            condicao &= Q(**{_campo(anterior): valor})
+        seguintes |= condicao
+    # redundante, mas dá ao otimizador um intervalo na primeira coluna do índice
+    primeira = 'lte' if ordem[0].startswith('-') else 'gte'
+    return Q(**{f'{_campo(ordem[0])}__{primeira}': valores[0]}) & seguintes
+
+
+class Pagina:
+    """Uma página de ``itens``; ``proxima``/``anterior`` são os cursores dos vizinhos."""
+
+    def __init__(self, itens, ordem, tem_proxima, tem_anterior):
+        self.itens = itens
+        self.ordem = ordem
+        self.tem_proxima = tem_proxima
+        self.tem_anterior = tem_anterior
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+    def _cursor(self, sentido, item):
+        return codificar(sentido, [_valor(item, _campo(chave)) for chave in self.ordem])
+
+    @property
+    def proxima(self):
+        if self.tem_proxima and self.itens:
+            return self._cursor('p', self.itens[-1])
+
+    @property
+    def anterior(self):
+        if self.tem_anterior and self.itens:
+            return self._cursor('a', self.itens[0])
+
+
+def paginar(queryset, ordem, cursor=None, por_pagina=POR_PAGINA):
+    """
+    Página de ``queryset`` na ``ordem`` (nomes como em ``order_by``, o
+    último único) a partir do ``cursor``; sem cursor, a primeira página.
+    Levanta `CursorInvalido` se o cursor não corresponde à ordem.
+    """
+    ordem = list(ordem)
+    voltando = False
+    if cursor:
+        sentido, valores = decodificar(cursor, len(ordem))
+        voltando = sentido == 'a'
+        # para trás: a mesma consulta na ordem invertida, desvirada no fim
+        consulta = [_inverter(chave) for chave in ordem] if voltando else ordem
+        queryset = queryset.order_by(*consulta).filter(_depois_de(consulta, valores))
+    else:
+        queryset = queryset.order_by(*ordem)
+    itens = list(queryset[:por_pagina + 1])
+    mais = len(itens) > por_pagina
+    itens = itens[:por_pagina]
+    if voltando:
+        itens.reverse()
+        return Pagina(itens, ordem, tem_proxima=True, tem_anterior=mais)
+    return Pagina(itens, ordem, tem_proxima=mais, tem_anterior=bool(cursor))
+
+
+def percorrer(queryset, ordem, por_pagina=POR_PAGINA):
+    """
+    Todas as páginas de ``queryset``, uma consulta por página. Para varrer
+    tabelas inteiras com memória constante: o driver do MySQL traz o
+    resultado inteiro para o cliente mesmo com ``iterator()``.
+    """
+    cursor = None
+    while True:
+        pagina = paginar(queryset, ordem, cursor, por_pagina)
+        if pagina.itens:
+            yield pagina.itens
+        if not pagina.tem_proxima:
+            return
+        cursor = pagina.proxima
@@ -1,14 +1,19 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.db.models import Count, Sum, Avg
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.db.models import Count, Sum, Avg, F, DecimalField
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
 import json
 from datetime import datetime, timedelta
-from .models import Evento, Produto, Estoque, Proposta, Categoria
-from .utils import generate_report_summary, suggest_automation_text
+from .models import Evento, Produto, Proposta, Categoria
+from .services import exportacao
+try:
+    from .utils import generate_report_summary, suggest_automation_text
+except ImportError:
+    # resumos por IA (utils) ainda desativados; a exportação não depende deles
+    generate_report_summary = suggest_automation_text = None
 
 @method_decorator(login_required, name='dispatch')
 class ReportsView(View):
@@ -125,31 +130,32 @@ class ReportsView(View):
     
     def generate_inventory_report(self, data):
         """Relatório de estoque"""
-        # Produtos com baixo estoque
+        # Produtos com baixo estoque (contadores indexados do produto)
         produtos_baixo_estoque = Produto.objects.filter(
-            estoques__quantidade__lt=10
-        ).distinct().count()
+            estoque_disponivel__lt=10
+        ).count()
         
         # Estoque total
-        estoque_total = Estoque.objects.aggregate(
-            total=Sum('quantidade')
-        )['total'] or 0
+        totais = Produto.objects.aggregate(
+            disponivel=Sum('estoque_disponivel'),
+            alocado=Sum('estoque_alocado'),
+        )
+        estoque_total = totais['disponivel'] or 0
         
         # Produtos sem estoque
         produtos_sem_estoque = Produto.objects.filter(
-            estoques__quantidade=0
-        ).distinct().count()
+            estoque_disponivel=0
+        ).count()
         
         # Top produtos por quantidade
-        top_produtos_estoque = Estoque.objects.select_related('produto').values(
-            'produto__nome'
-        ).annotate(
-            total_quantidade=Sum('quantidade')
-        ).order_by('-total_quantidade')[:5]
+        top_produtos_estoque = Produto.objects.values(
+            'nome', 'estoque_disponivel', 'estoque_alocado'
+        ).order_by('-estoque_disponivel')[:5]
         
         report_data = {
             'produtos_baixo_estoque': produtos_baixo_estoque,
             'estoque_total': estoque_total,
+            'estoque_alocado': totais['alocado'] or 0,
             'produtos_sem_estoque': produtos_sem_estoque,
             'top_produtos_estoque': list(top_produtos_estoque),
             'alerta_critico': produtos_sem_estoque > 0
@@ -221,12 +227,9 @@ class ReportsView(View):
         )['media'] or 0
         
         # Valor total do inventário (produtos * preço)
-        valor_inventario = 0
-        for produto in Produto.objects.all():
-            quantidade_total = produto.estoques.aggregate(
-                total=Sum('quantidade')
-            )['total'] or 0
-            valor_inventario += float(produto.preco) * quantidade_total
+        valor_inventario = float(Produto.objects.aggregate(
+            total=Sum(F('preco') * F('estoque_total'), output_field=DecimalField())
+        )['total'] or 0)
         
         # Propostas recentes (últimos 30 dias)
         propostas_recentes = Proposta.objects.filter(
@@ -265,8 +268,8 @@ class ReportsView(View):
                 total=Sum('valor_total')
             )['total'] or 0),
             'produtos_baixo_estoque': Produto.objects.filter(
-                estoques__quantidade__lt=10
-            ).distinct().count(),
+                estoque_disponivel__lt=10
+            ).count(),
             'eventos_recentes': Evento.objects.filter(
                 data_inicial__gte=datetime.now() - timedelta(days=30)
             ).count()
@@ -307,16 +310,40 @@ def generate_automation_text(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
 @login_required
 def export_report(request):
-    """Exporta relatório em diferentes formatos"""
-    report_type = request.GET.get('type', 'geral')
-    format_type = request.GET.get('format', 'json')
-    
-    # Aqui você pode implementar exportação para PDF, Excel, etc.
-    # Por enquanto, retorna JSON
-    
-    return JsonResponse({
-        'message': f'Exportação de relatório {report_type} em formato {format_type} será implementada em breve'
-    })
+    """
+    Exporta produtos, alocações nas salas (``evento``/``sala``) ou propostas
+    com itens (``evento``) em CSV, enviado enquanto é gerado, ou XLSX
+    (services.exportacao).
+    """
+    report_type = request.GET.get('type', 'produtos')
+    format_type = request.GET.get('format', 'csv')
+    if report_type not in exportacao.TIPOS or format_type not in ('csv', 'xlsx'):
+        return JsonResponse({'error': 'Tipo ou formato de exportação inválido'}, status=400)
+
+    filtros = {'produtos': ['q'], 'alocacoes': ['evento', 'sala'], 'propostas': ['evento']}[report_type]
+    try:
+        argumentos = {
+            nome: request.GET[nome] if nome == 'q' else int(request.GET[nome])
+            for nome in filtros if request.GET.get(nome)
+        }
+    except ValueError:
+        return JsonResponse({'error': 'Filtro inválido'}, status=400)
+    nome, cabecalho, linhas = exportacao.TIPOS[report_type](**argumentos)
+    arquivo = f"{nome}-{datetime.now():%Y%m%d-%H%M}.{format_type}"
+
+    if format_type == 'csv':
+        resposta = StreamingHttpResponse(
+            exportacao.csv_em_fluxo(cabecalho, linhas), content_type='text/csv; charset=utf-8',
+        )
+        resposta['Content-Disposition'] = f'attachment; filename="{arquivo}"'
+        return resposta
+    try:
+        planilha = exportacao.xlsx_em_arquivo(nome, cabecalho, linhas)
+    except exportacao.ExportacaoIndisponivel as erro:
+        return JsonResponse({'error': str(erro)}, status=501)
+    return FileResponse(planilha, as_attachment=True, filename=arquivo, content_type=XLSX)
 
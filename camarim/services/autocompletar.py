@@ -0,0 +1,110 @@
+# camarim/services/autocompletar.py
+"""
+Autocompletar de produtos por prefixo, a partir de um índice em memória.
+
+Cada processo monta, na primeira busca, uma lista ordenada com uma chave
+por palavra do nome normalizado (services.busca.normalizar), de modo que
+"vid" encontra "Copo de Vidro". Uma busca é um ``bisect`` até a primeira
+chave com o prefixo, seguido de uma varredura só desse trecho, sem consultar
+o banco.
+
+O índice vale para uma versão (`VersaoProdutos`), que os sinais sobem
+quando um produto é criado, renomeado ou excluído; cada busca lê a versão e,
+se mudou, remonta. O estoque mostrado vem do banco, só
+para os produtos devolvidos.
+"""
+import threading
+from bisect import bisect_left
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from camarim.models import Produto, VersaoProdutos
+from camarim.services.busca import normalizar
+
+LIMITE = 20
+PK = 1
+
+
+class IndicePrefixos:
+    def __init__(self, produtos, versao=None):
+        """``produtos``: pares (id, nome)."""
+        self.versao = versao
+        self.nomes = {}
+        self.palavras = {}
+        entradas = []
+        for pk, nome in produtos:
+            palavras = normalizar(nome).split()
+            self.nomes[pk] = nome
+            self.palavras[pk] = palavras
+            # uma entrada a partir de cada palavra; no_meio=False para a do início do nome
+            entradas.extend((' '.join(palavras[i:]), i > 0, pk) for i in range(len(palavras)))
+        entradas.sort()
+        self.entradas = entradas
+        self.chaves = [chave for chave, _, _ in entradas]
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def buscar(self, termo, limite=LIMITE):
+        """
+        Ids dos produtos cujo nome tem uma palavra começando pela primeira
+        palavra de ``termo`` e as demais como prefixo de alguma palavra.
+        Quem começa pelo termo vem antes; depois, em ordem alfabética.
+        """
+        termos = normalizar(termo).split()
+        primeiro, resto = (termos[0], termos[1:]) if termos else ('', [])
+        no_inicio, no_meio, vistos = [], [], set()
+        for chave, meio, pk in islice(self.entradas, bisect_left(self.chaves, primeiro), None):
+            if not chave.startswith(primeiro) or len(no_inicio) >= limite:
+                break
+            if pk in vistos or (not termos and meio):
+                continue
+            if not all(any(p.startswith(r) for p in self.palavras[pk]) for r in resto):
+                continue
+            vistos.add(pk)
+            (no_meio if meio else no_inicio).append(pk)
+        return (no_inicio + no_meio)[:limite]
+
+
+_indice = None
+_trava = threading.Lock()
+
+
+def _versao_atual():
+    return VersaoProdutos.objects.filter(pk=PK).values_list('versao', flat=True).first() or 0
+
+
+def indice():
+    """O índice do processo, remontado se a versão dos produtos mudou."""
+    global _indice
+    versao = _versao_atual()
+    with _trava:
+        if _indice is None or _indice.versao != versao:
+            _indice = IndicePrefixos(Produto.objects.values_list('pk', 'nome').iterator(), versao)
+        return _indice
+
+
+def invalidar():
+    """Força a remontagem em todos os processos (depois de cargas em massa)."""
+    if VersaoProdutos.objects.filter(pk=PK).update(versao=F('versao') + 1):
+        return
+    try:
+        with transaction.atomic():
+            VersaoProdutos.objects.create(pk=PK, versao=1)
+    except IntegrityError:
+        # outro processo criou a linha ao mesmo tempo
+        VersaoProdutos.objects.filter(pk=PK).update(versao=F('versao') + 1)
+
+
+def sugerir(termo, limite=LIMITE):
+    """[{id, nome, estoque}] dos ``limite`` melhores produtos para ``termo``."""
+    atual = indice()
+    ids = atual.buscar(termo, limite)
+    estoque = dict(Produto.objects.filter(pk__in=ids).values_list('pk', 'estoque_disponivel'))
+    # um produto excluído depois da montagem some da resposta
+    return [
+        {'id': pk, 'nome': atual.nomes[pk], 'estoque': estoque[pk]}
+        for pk in ids if pk in estoque
+    ]
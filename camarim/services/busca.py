@@ -0,0 +1,135 @@
+# camarim/services/busca.py
+"""
+Busca textual de produtos sem diferença de acentos ou maiúsculas.
+
+Os nomes vieram do dump legado com acentuação misturada ("XÍCARA",
+"Xicara", "LOUÇAS"). ``normalizar`` reduz tudo a uma forma única, que é a
+gravada em `BuscaProduto` e também a usada na consulta. Quem casa e ordena
+é o banco: FULLTEXT em modo booleano no MySQL e FTS5 (bm25) no SQLite; nos
+demais, um LIKE por palavra, sem relevância.
+
+Os sinais de Produto e Categoria chamam ``indexar``. Cargas em massa
+(importação do legado, ``bulk_create``, ``update``) não passam por eles:
+depois delas, rodar o comando `reindexar_busca`.
+"""
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from camarim.models import BuscaProduto, Produto
+
+LOTE = 500
+# tabela FTS5 (SQLite) sobre camarim_buscaproduto, criada na migração 0024
+TABELA_FTS = 'camarim_buscaproduto_fts'
+# campos do produto que entram no índice
+CAMPOS = {'nome', 'descricao', 'categoria'}
+
+_PALAVRA = re.compile(r'\w+')
+
+
+def normalizar(texto):
+    """'XÍCARA de Chá' -> 'xicara de cha'."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acento = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(_PALAVRA.findall(sem_acento.casefold()))
+
+
+def _entrada(pk, nome, descricao, categoria):
+    return BuscaProduto(
+        produto_id=pk,
+        nome=normalizar(nome)[:200],
+        texto=normalizar(' '.join(filter(None, [nome, categoria, descricao]))),
+    )
+
+
+@transaction.atomic
+def indexar(produto_ids):
+    """(Re)grava o índice dos produtos; ids que não existem mais são ignorados."""
+    ids = sorted(set(produto_ids))
+    for inicio in range(0, len(ids), LOTE):
+        lote = ids[inicio:inicio + LOTE]
+        entradas = [
+            _entrada(*linha)
+            for linha in Produto.objects.filter(pk__in=lote)
+                                .values_list('pk', 'nome', 'descricao', 'categoria__nome')
+        ]
+        existentes = set(BuscaProduto.objects.filter(produto_id__in=lote).values_list('produto_id', flat=True))
+        BuscaProduto.objects.bulk_update(
+            [e for e in entradas if e.produto_id in existentes], ['nome', 'texto'],
+        )
+        BuscaProduto.objects.bulk_create([e for e in entradas if e.produto_id not in existentes])
+    return len(ids)
+
+
+def reindexar_todos(lote=LOTE):
+    """Refaz o índice inteiro (comando `reindexar_busca`)."""
+    ids = list(Produto.objects.order_by('pk').values_list('pk', flat=True))
+    for inicio in range(0, len(ids), lote):
+        indexar(ids[inicio:inicio + lote])
+    return len(ids)
+
+
+def _textual():
+    return connection.vendor in ('mysql', 'sqlite')
+
+
+def _consulta(palavras):
+    # todas as palavras obrigatórias, casando também como prefixo
+    if connection.vendor == 'mysql':
+        return ' '.join(f'+{p}*' for p in palavras)
+    return ' '.join(f'"{p}"*' for p in palavras)
+
+
+def _encontrados(palavras):
+    """Subconsulta com os ids dos produtos que casam com as palavras."""
+    tabela = BuscaProduto._meta.db_table
+    if connection.vendor == 'mysql':
+        return RawSQL(
+            f"SELECT produto_id FROM {tabela} WHERE MATCH(texto) AGAINST (%s IN BOOLEAN MODE)",
+            [_consulta(palavras)],
+        )
+    return RawSQL(f"SELECT rowid FROM {TABELA_FTS} WHERE {TABELA_FTS} MATCH %s", [_consulta(palavras)])
+
+
+def _relevancia(palavras):
+    """Relevância de cada produto (maior é melhor); casar no nome vale o dobro."""
+    tabela, produto = BuscaProduto._meta.db_table, Produto._meta.db_table
+    consulta = _consulta(palavras)
+    if connection.vendor == 'mysql':
+        return RawSQL(
+            f"SELECT 2 * MATCH(nome) AGAINST (%s IN BOOLEAN MODE) + MATCH(texto) AGAINST (%s IN BOOLEAN MODE) "
+            f"FROM {tabela} WHERE produto_id = {produto}.id",
+            [consulta, consulta], output_field=FloatField(),
+        )
+    # bm25 é menor para os melhores
+    return RawSQL(
+        f"SELECT -bm25({TABELA_FTS}, 2.0, 1.0) FROM {TABELA_FTS} "
+        f"WHERE {TABELA_FTS} MATCH %s AND rowid = {produto}.id",
+        [consulta], output_field=FloatField(),
+    )
+
+
+def filtrar(produtos, termo):
+    """Restringe ``produtos`` aos que têm todas as palavras de ``termo``."""
+    palavras = normalizar(termo).split()
+    if not palavras:
+        return produtos
+    if _textual():
+        return produtos.filter(pk__in=_encontrados(palavras))
+    condicao = Q()
+    for palavra in palavras:
+        condicao &= Q(busca__texto__contains=palavra)
+    return produtos.filter(condicao)
+
+
+def buscar(termo, limite=20):
+    """Os ``limite`` produtos mais relevantes para ``termo``, com ``relevancia`` anotada."""
+    palavras = normalizar(termo).split()
+    if not palavras:
+        return Produto.objects.none()
+    produtos = filtrar(Produto.objects.select_related('categoria'), termo)
+    relevancia = _relevancia(palavras) if _textual() else Value(0.0, output_field=FloatField())
+    return produtos.annotate(relevancia=relevancia).order_by('-relevancia', 'nome', 'id')[:limite]
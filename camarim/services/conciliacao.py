@@ -0,0 +1,104 @@
+# camarim/services/conciliacao.py
+"""
+Conferência do estoque contra as regras que o resto do código assume
+(a linha única de Estoque geral por produto é garantida pelo banco).
+
+Saldo geral negativo não é problema: as alocações são conferidas contra a
+disponibilidade nas datas (services.disponibilidade), e eventos que não se
+cruzam reutilizam as mesmas unidades, deixando o geral abaixo de zero. O
+que conta é o pico de uso simultâneo passar do total (``SOBREALOCADO``).
+
+Cada verificação é uma consulta agrupada lida com ``iterator()``, para
+varrer catálogos grandes sem carregar todos os produtos na memória. As
+correções trabalham em lotes (cada um na sua transação), repetindo a
+consulta até não sobrar nada para corrigir.
+"""
+from collections import namedtuple
+from itertools import chain
+
+from django.db.models import Exists, F, OuterRef, Q
+
+from camarim.models import Estoque, EstoqueSala, EstoqueShard, Produto
+from camarim.services import contadores
+from camarim.services.disponibilidade import picos_de_uso
+
+LOTE = 500
+
+SEM_ESTOQUE = 'sem_estoque'
+SALA_NEGATIVA = 'sala_negativa'
+SOBREALOCADO = 'sobrealocado'
+CONTADOR = 'contador_divergente'
+
+Problema = namedtuple('Problema', ['tipo', 'produto_id', 'sala_id', 'esperado', 'encontrado'])
+
+
+def sem_estoque():
+    """Produtos sem nenhuma linha de Estoque geral."""
+    return Produto.objects.filter(
+        ~Exists(Estoque.objects.filter(produto=OuterRef('pk')))
+    ).order_by('pk')
+
+
+def _contadores_divergentes():
+    # com parcelas ainda não consolidadas, disponível/alocado ficam atrasados
+    # de propósito (services.shards); desses produtos só o total precisa bater
+    pendentes = EstoqueShard.objects.filter(produto=OuterRef('pk')).exclude(quantidade=0)
+    return contadores.divergentes().filter(
+        ~Q(estoque_total=F('real_disponivel') + F('real_alocado')) | ~Exists(pendentes)
+    )
+
+
+def _sobrealocados():
+    # pico de uso simultâneo (considerando as datas dos eventos) maior que o total
+    picos = picos_de_uso()
+    # o alocado de produtos repartidos só é acertado na consolidação
+    totais = Produto.objects.filter(Q(estoque_alocado__gt=0) | Q(shards__gt=0)).order_by('pk') \
+                    .values_list('pk', 'estoque_total')
+    for produto_id, total in totais.iterator():
+        pico = picos.get(produto_id, 0)
+        if pico > total:
+            yield Problema(SOBREALOCADO, produto_id, None, total, pico)
+
+
+def problemas():
+    """Todas as inconsistências encontradas, uma ``Problema`` por vez."""
+    return chain(
+        (Problema(SEM_ESTOQUE, pk, None, 1, 0)
+         for pk in sem_estoque().values_list('pk', flat=True).iterator()),
+        (Problema(SALA_NEGATIVA, produto_id, sala_id, 0, quantidade)
+         for produto_id, sala_id, quantidade in
+         EstoqueSala.objects.filter(quantidade__lt=0).order_by('produto_id', 'sala_id')
+                    .values_list('produto_id', 'sala_id', 'quantidade').iterator()),
+        _sobrealocados(),
+        (Problema(CONTADOR, pk, None, real_disp + real_aloc, total)
+         for pk, total, real_disp, real_aloc in
+         _contadores_divergentes().order_by('pk')
+                   .values_list('pk', 'estoque_total', 'real_disponivel', 'real_alocado')
+                   .iterator()),
+    )
+
+
+# — Correções —
+
+def criar_faltantes(lote=LOTE):
+    """Cria a linha de Estoque (zerada) dos produtos que não têm nenhuma."""
+    corrigidos = 0
+    while True:
+        ids = list(sem_estoque().values_list('pk', flat=True)[:lote])
+        if not ids:
+            return corrigidos
+        Estoque.objects.bulk_create(
+            [Estoque(produto_id=pk, quantidade=0) for pk in ids], ignore_conflicts=True
+        )
+        corrigidos += len(ids)
+
+
+def corrigir_contadores(lote=LOTE):
+    """Reconstrói os contadores dos produtos divergentes, um lote por UPDATE."""
+    corrigidos = 0
+    while True:
+        ids = list(contadores.divergentes().order_by('pk').values_list('pk', flat=True)[:lote])
+        if not ids:
+            return corrigidos
+        contadores.reconstruir(Produto.objects.filter(pk__in=ids))
+        corrigidos += len(ids)
@@ -0,0 +1,84 @@
+# camarim/services/contadores.py
+"""
+Contadores desnormalizados de estoque por produto.
+
+`Produto.estoque_disponivel` (geral), `estoque_alocado` (salas) e
+`estoque_total` são atualizados por deltas pelo services.estoque; aqui
+ficam o UPDATE agrupado desses deltas e a conferência/reconstrução a partir
+das tabelas Estoque (mais as parcelas EstoqueShard) e EstoqueSala.
+"""
+from django.db.models import BigIntegerField, Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from camarim.models import Estoque, EstoqueSala, Produto
+from camarim.services import shards
+
+LOTE = 500
+
+
+def atualizar(deltas):
+    """
+    Aplica ``{produto_id: (delta_disponivel, delta_alocado)}`` aos contadores
+    com um UPDATE ... CASE por lote de produtos.
+
+    Produtos repartidos (``shards`` > 0) existem justamente para não travar
+    uma linha quente a cada alocação: movimentos que não mudam o total deles
+    ficam de fora e são acertados na consolidação das parcelas.
+    """
+    produto_ids = sorted(pid for pid, (disp, aloc) in deltas.items() if disp or aloc)
+    for inicio in range(0, len(produto_ids), LOTE):
+        lote = produto_ids[inicio:inicio + LOTE]
+        mudam_total = [pid for pid in lote if sum(deltas[pid])]
+        filtro = Q(pk__in=lote)
+        if len(mudam_total) < len(lote):
+            filtro &= Q(shards=0) | Q(pk__in=mudam_total)
+        if len(lote) == 1:
+            disp, aloc = (Value(v) for v in deltas[lote[0]])
+        else:
+            disp, aloc = (
+                Case(
+                    *[When(pk=pid, then=Value(deltas[pid][i])) for pid in lote],
+                    default=Value(0), output_field=BigIntegerField(),
+                )
+                for i in (0, 1)
+            )
+        Produto.objects.filter(filtro).update(
+            estoque_disponivel=F('estoque_disponivel') + disp,
+            estoque_alocado=F('estoque_alocado') + aloc,
+            estoque_total=F('estoque_total') + disp + aloc,
+        )
+
+
+def _somas_reais():
+    geral = Estoque.objects.filter(produto=OuterRef('pk')).values('quantidade')[:1]
+    salas = EstoqueSala.objects.filter(produto=OuterRef('pk')).order_by() \
+                       .values('produto').annotate(t=Sum('quantidade')).values('t')
+    return (
+        Coalesce(Subquery(geral), Value(0), output_field=BigIntegerField()) + shards.soma(),
+        Coalesce(Subquery(salas), Value(0), output_field=BigIntegerField()),
+    )
+
+
+def divergentes():
+    """Produtos cujos contadores não batem com Estoque/EstoqueSala."""
+    geral, salas = _somas_reais()
+    return (
+        Produto.objects
+               .annotate(real_disponivel=geral, real_alocado=salas)
+               .filter(
+                   ~Q(estoque_disponivel=F('real_disponivel'))
+                   | ~Q(estoque_alocado=F('real_alocado'))
+                   | ~Q(estoque_total=F('real_disponivel') + F('real_alocado'))
+               )
+    )
+
+
+def reconstruir(produtos=None):
+    """Recalcula os contadores com um único UPDATE por subconsultas."""
+    geral, salas = _somas_reais()
+    qs = Produto.objects.all() if produtos is None else produtos
+    return qs.update(
+        estoque_disponivel=geral,
+        estoque_alocado=salas,
+        estoque_total=geral + salas,
+    )
@@ -0,0 +1,219 @@
+# camarim/services/disponibilidade.py
+"""
+Disponibilidade de produtos por período, levando em conta as datas dos eventos.
+
+O estoque de um produto (`Produto.estoque_total`: geral + salas) só fica
+ocupado enquanto o evento para onde foi alocado acontece. Para uma janela
+[inicio, fim], o banco devolve numa consulta as alocações (somadas por
+produto e evento) dos eventos que cruzam a janela; depois uma varredura
+(sweep line) por produto acha o pico de uso simultâneo dentro da janela.
+
+Eventos sem data ocupam o estoque o tempo todo; evento só com data inicial
+ocupa um dia.
+"""
+from datetime import date
+from itertools import chain
+
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+
+from camarim.models import Estoque, EstoqueSala, Produto
+from camarim.services.estoque import alocar_em_lote, com_retentativa, replicar_salas
+
+INICIO_DOS_TEMPOS = date.min
+FIM_DOS_TEMPOS = date.max
+
+
+def _eventos_na_janela(inicio, fim):
+    filtro = Q()
+    if fim is not None:
+        filtro &= Q(sala__evento__data_inicial__lte=fim) | Q(sala__evento__data_inicial__isnull=True)
+    if inicio is not None:
+        filtro &= Q(fim_evento__gte=inicio) | Q(fim_evento__isnull=True)
+    return filtro
+
+
+def picos_de_uso(inicio=None, fim=None, produtos=None, extras=()):
+    """
+    Maior quantidade de cada produto alocada ao mesmo tempo dentro da
+    janela: ``{produto_id: pico}``. ``None`` nas pontas = sem limite.
+
+    ``extras``: alocações ainda não gravadas, como ``(inicio, fim,
+    {produto_id: quantidade})``, que entram na conta junto com as do banco.
+    """
+    qs = (
+        EstoqueSala.objects
+                   .annotate(fim_evento=Coalesce('sala__evento__data_final',
+                                                 'sala__evento__data_inicial'))
+                   .filter(_eventos_na_janela(inicio, fim))
+    )
+    if produtos is not None:
+        qs = qs.filter(produto_id__in=[getattr(p, 'pk', p) for p in produtos])
+    linhas = (
+        qs.values('produto_id', 'sala__evento_id', 'sala__evento__data_inicial', 'fim_evento')
+          .annotate(total=Sum('quantidade'))
+          .order_by()
+    )
+
+    janela_ini = inicio or INICIO_DOS_TEMPOS
+    janela_fim = fim or FIM_DOS_TEMPOS
+    alocacoes = (
+        (linha['sala__evento__data_inicial'], linha['fim_evento'], linha['produto_id'], linha['total'])
+        for linha in linhas.iterator()
+    )
+    novas = (
+        (ini, fim_ev, produto_id, quantidade)
+        for ini, fim_ev, pedidos in extras
+        for produto_id, quantidade in pedidos.items()
+    )
+    pontos = {}
+    for ini, fim_ev, produto_id, total in chain(alocacoes, novas):
+        ini = max(ini or INICIO_DOS_TEMPOS, janela_ini)
+        fim_ev = min(fim_ev or FIM_DOS_TEMPOS, janela_fim)
+        if ini > fim_ev:
+            continue
+        lista = pontos.setdefault(produto_id, [])
+        lista.append((ini.toordinal(), total))
+        # o evento libera o estoque no dia seguinte ao seu fim
+        lista.append((fim_ev.toordinal() + 1, -total))
+
+    picos = {}
+    for produto_id, lista in pontos.items():
+        # em empate de data, saídas (negativas) antes das entradas
+        lista.sort(key=lambda p: (p[0], p[1]))
+        atual = pico = 0
+        for _, delta in lista:
+            atual += delta
+            pico = max(pico, atual)
+        picos[produto_id] = pico
+    return picos
+
+
+def disponibilidade(inicio=None, fim=None, produtos=None):
+    """
+    Quanto de cada produto está livre durante toda a janela:
+    ``{produto_id: estoque_total - pico de uso}``. Sem ``produtos``, o
+    catálogo inteiro.
+    """
+    picos = picos_de_uso(inicio, fim, produtos)
+    totais = Produto.objects.all()
+    if produtos is not None:
+        totais = totais.filter(pk__in=[getattr(p, 'pk', p) for p in produtos])
+    return {
+        produto_id: total - picos.get(produto_id, 0)
+        for produto_id, total in totais.values_list('pk', 'estoque_total').iterator()
+    }
+
+
+def janela_do_evento(evento):
+    """Período em que o evento ocupa o estoque (``None`` = sem limite)."""
+    if evento.data_inicial is None:
+        return None, None
+    return evento.data_inicial, evento.data_final or evento.data_inicial
+
+
+def _travar(produto_ids):
+    """
+    Trava as linhas de Estoque geral dos produtos, na ordem de sempre de
+    services.estoque (por produto_id). Duas alocações do mesmo produto
+    passam uma de cada vez pela conferência e pela gravação.
+    """
+    list(
+        Estoque.objects.select_for_update().filter(produto_id__in=produto_ids)
+               .order_by('produto_id').values_list('pk')
+    )
+
+
+def faltas_em_lote(pedidos_por_evento, *, travar=False):
+    """
+    Confere alocações novas em vários eventos de uma vez: ``pedidos_por_evento``
+    é uma lista de ``(evento, {produto_id: quantidade})``. Os pedidos de
+    eventos que se cruzam no tempo somam, então o pico de cada janela
+    conta também os outros destinos. Devolve ``{evento_id: {produto_id:
+    (pedido, disponivel)}}`` só dos eventos com falta.
+
+    Com ``travar``, trava antes o Estoque geral dos produtos; a conferência
+    só vale se a gravação vier na mesma transação.
+    """
+    pedidos_por_evento = [
+        (evento, {getattr(p, 'pk', p): q for p, q in pedidos.items() if q > 0})
+        for evento, pedidos in pedidos_por_evento
+    ]
+    produtos = sorted({pid for _, pedidos in pedidos_por_evento for pid in pedidos})
+    if not produtos:
+        return {}
+    if travar:
+        _travar(produtos)
+    extras = [(*janela_do_evento(evento), pedidos) for evento, pedidos in pedidos_por_evento]
+    totais = dict(Produto.objects.filter(pk__in=produtos).values_list('pk', 'estoque_total'))
+    resultado = {}
+    for evento, pedidos in pedidos_por_evento:
+        if not pedidos:
+            continue
+        inicio, fim = janela_do_evento(evento)
+        picos = picos_de_uso(inicio, fim, pedidos, extras)
+        # o pico já inclui o próprio pedido
+        livres = {pid: totais.get(pid, 0) - picos.get(pid, 0) + pedido for pid, pedido in pedidos.items()}
+        faltando = {
+            produto_id: (pedido, livres[produto_id])
+            for produto_id, pedido in pedidos.items()
+            if pedido > livres[produto_id]
+        }
+        if faltando:
+            resultado[evento.pk] = faltando
+    return resultado
+
+
+def faltas(evento, pedidos, *, travar=False):
+    """
+    Confere ``pedidos`` (``{produto_id: quantidade}`` a mais no ``evento``)
+    contra o que está livre nas datas dele. Devolve só os que não cabem:
+    ``{produto_id: (pedido, disponivel)}``.
+    """
+    return faltas_em_lote([(evento, pedidos)], travar=travar).get(evento.pk, {})
+
+
+@com_retentativa
+def alocar_nas_datas(evento, sala, pedidos, *, usuario=None):
+    """
+    Confere ``pedidos`` nas datas do ``evento`` e aloca na sala, na mesma
+    transação (repetida inteira em caso de deadlock). Devolve ``(faltando,
+    saldos)``; se algo não couber, nada é gravado.
+    """
+    faltando = faltas(evento, pedidos, travar=True)
+    if faltando:
+        return faltando, {}
+    return {}, alocar_em_lote(sala, pedidos, usuario=usuario)
+
+
+@com_retentativa
+def replicar_nas_datas(salas, eventos, *, usuario=None):
+    """
+    Replica ``salas`` em ``eventos`` se cada destino tiver o estoque livre nas
+    suas datas, contando os outros destinos que acontecem ao mesmo tempo.
+    Devolve ``(faltando, salas_novas)``, com ``faltando`` como em
+    ``faltas_em_lote``; se algum destino não couber, nada é gravado.
+    """
+    pedidos = dict(
+        EstoqueSala.objects.filter(sala__in=salas)
+                   .values('produto_id').annotate(total=Sum('quantidade'))
+                   .order_by().values_list('produto_id', 'total')
+    )
+    faltando = faltas_em_lote([(evento, pedidos) for evento in eventos], travar=True)
+    if faltando:
+        return faltando, []
+    return {}, replicar_salas(salas, eventos, usuario=usuario)
+
+
+def descrever_faltas(evento, faltando):
+    """Mensagem legível para erros de formulário."""
+    nomes = dict(Produto.objects.filter(pk__in=faltando).values_list('pk', 'nome'))
+    inicio, fim = janela_do_evento(evento)
+    periodo = (
+        f"entre {inicio:%d/%m/%Y} e {fim:%d/%m/%Y}" if inicio else "sem data definida"
+    )
+    partes = [
+        f"{nomes.get(pid, pid)}: pedido {pedido}, disponível {livre}"
+        for pid, (pedido, livre) in sorted(faltando.items())
+    ]
+    return f"Estoque insuficiente para “{evento.nome}” ({periodo}) — " + "; ".join(partes)
@@ -0,0 +1,164 @@
+# camarim/services/documentos.py
+"""
+Documentos (PDF/XLSX) das propostas, gerados fora da requisição.
+
+``solicitar`` devolve o `DocumentoProposta` da revisão atual da proposta:
+se já existe (pronto ou em andamento) é reaproveitado; senão é criado e a
+geração vai para um pool de threads depois do commit. Com erro, ou parado
+em andamento além de ``PRAZO`` (reinício do processo, thread morta), é
+agendado de novo. O arquivo fica em MEDIA_ROOT/propostas/<id>/<revisão>.<formato>
+e as revisões antigas são apagadas quando a nova fica pronta.
+
+PDF usa xhtml2pdf (sobre o template proposta_documento.html) e XLSX usa
+openpyxl; os dois são importados só na geração.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from itertools import groupby
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from camarim.models import DocumentoProposta
+
+logger = logging.getLogger(__name__)
+
+# pendente ou gerando por mais tempo que isto: a execução morreu e o
+# documento é reagendado no próximo pedido
+PRAZO = timedelta(seconds=getattr(settings, 'CAMARIM_DOCUMENTOS_PRAZO', 10 * 60))
+
+_pool = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'CAMARIM_DOCUMENTOS_WORKERS', 2),
+    thread_name_prefix='documentos',
+)
+
+
+class DependenciaAusente(RuntimeError):
+    pass
+
+
+def _salas(proposta):
+    """[(sala, [itens], subtotal)] na ordem do descritivo."""
+    subtotais = {linha['grupo_id']: linha['subtotal'] for linha in proposta.subtotais('sala')}
+    return [
+        (sala, list(itens), subtotais[sala.pk])
+        for sala, itens in groupby(proposta.itens_por_sala(), key=lambda item: item.sala)
+    ]
+
+
+def gerar_pdf(proposta):
+    try:
+        from xhtml2pdf import pisa
+    except ImportError:
+        raise DependenciaAusente("Gerar PDF requer o pacote xhtml2pdf.")
+    html = render_to_string('camarim/proposta_documento.html', {
+        'proposta': proposta, 'salas': _salas(proposta),
+        'por_categoria': proposta.subtotais('categoria'),
+    })
+    saida = io.BytesIO()
+    resultado = pisa.CreatePDF(html, dest=saida, encoding='utf-8')
+    if resultado.err:
+        raise RuntimeError(f"xhtml2pdf falhou ({resultado.err} erro(s)).")
+    return saida.getvalue()
+
+
+def gerar_xlsx(proposta):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise DependenciaAusente("Gerar XLSX requer o pacote openpyxl.")
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet(f"Proposta {proposta.pk}")
+    planilha.append([f"Evento: {proposta.evento.nome}"])
+    planilha.append(['Sala', 'Produto', 'Quantidade', 'Preço Unitário', 'Total'])
+    for sala, itens, subtotal in _salas(proposta):
+        for item in itens:
+            planilha.append([sala.nome, item.produto.nome, item.quantidade, item.preco_unitario, item.total])
+        planilha.append([f"Subtotal {sala.nome}", None, None, None, subtotal])
+    planilha.append([])
+    planilha.append(['Categoria', 'Itens', 'Quantidade', '% do subtotal', 'Subtotal'])
+    for linha in proposta.subtotais('categoria'):
+        planilha.append([linha['nome'] or 'Sem categoria', linha['itens'], linha['unidades'],
+                         linha['percentual'], linha['subtotal']])
+    planilha.append([])
+    planilha.append(['Subtotal', None, None, None, proposta.subtotal])
+    planilha.append([f"Impostos ({proposta.impostos}%)", None, None, None, proposta.total_impostos])
+    planilha.append(['Total', None, None, None, proposta.total])
+    saida = io.BytesIO()
+    livro.save(saida)
+    return saida.getvalue()
+
+
+GERADORES = {
+    DocumentoProposta.PDF: gerar_pdf,
+    DocumentoProposta.XLSX: gerar_xlsx,
+}
+
+
+def _parado(documento):
+    """Com erro, ou pendente/gerando há mais de ``PRAZO`` (o processo caiu)."""
+    if documento.status == DocumentoProposta.ERRO:
+        return True
+    return (
+        documento.status in (DocumentoProposta.PENDENTE, DocumentoProposta.GERANDO)
+        and documento.atualizado_em < timezone.now() - PRAZO
+    )
+
+
+def solicitar(proposta, formato):
+    """Documento da revisão atual; agenda a geração se ainda não foi feita."""
+    documento, criado = DocumentoProposta.objects.get_or_create(
+        proposta=proposta, formato=formato, revisao=proposta.revisao,
+    )
+    if not criado and _parado(documento):
+        # nova tentativa; o filtro garante que só uma requisição reagenda
+        agora = timezone.now()
+        criado = DocumentoProposta.objects.filter(
+            pk=documento.pk, status=documento.status, atualizado_em=documento.atualizado_em,
+        ).update(status=DocumentoProposta.PENDENTE, erro='', atualizado_em=agora)
+        documento.status, documento.erro, documento.atualizado_em = DocumentoProposta.PENDENTE, '', agora
+    if criado:
+        # depois do commit: a thread usa outra conexão e precisa enxergar a linha
+        transaction.on_commit(partial(_pool.submit, _em_segundo_plano, documento.pk))
+    return documento
+
+
+def _em_segundo_plano(pk):
+    try:
+        gerar(pk)
+    finally:
+        connections.close_all()
+
+
+def gerar(pk):
+    """Gera o arquivo do documento ``pk`` (chamado pelo pool)."""
+    # só uma execução pega o documento pendente
+    if not DocumentoProposta.objects.filter(pk=pk, status=DocumentoProposta.PENDENTE) \
+                                    .update(status=DocumentoProposta.GERANDO, atualizado_em=timezone.now()):
+        return
+    documento = DocumentoProposta.objects.select_related('proposta__evento').get(pk=pk)
+    try:
+        conteudo = GERADORES[documento.formato](documento.proposta)
+    except Exception as erro:
+        logger.exception("Falha ao gerar %s", documento)
+        documento.status, documento.erro = DocumentoProposta.ERRO, str(erro)
+        documento.save(update_fields=['status', 'erro', 'atualizado_em'])
+        return
+    documento.arquivo.save('', ContentFile(conteudo), save=False)
+    documento.status = DocumentoProposta.PRONTO
+    documento.save(update_fields=['arquivo', 'status', 'atualizado_em'])
+
+    antigos = DocumentoProposta.objects.filter(
+        proposta_id=documento.proposta_id, formato=documento.formato,
+        criado_em__lt=documento.criado_em,
+    )
+    for antigo in antigos:
+        if antigo.arquivo:
+            antigo.arquivo.delete(save=False)
+        antigo.delete()
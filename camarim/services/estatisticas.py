@@ -0,0 +1,56 @@
+# camarim/services/estatisticas.py
+"""
+Modelo de leitura do painel (`EstatisticasDashboard`, uma linha só).
+
+Os sinais em camarim.signals chamam ``somar`` com os deltas de cada save ou
+delete; ``reconstruir`` recalcula tudo a partir das tabelas (comando
+`reconstruir_estatisticas`).
+"""
+from decimal import Decimal
+
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from camarim.models import Categoria, EstatisticasDashboard, Evento, Produto, Proposta, Sala
+
+PK = 1
+
+
+def atual():
+    """A linha de estatísticas; monta a partir das tabelas se ainda não existe."""
+    estatisticas = EstatisticasDashboard.objects.filter(pk=PK).first()
+    return estatisticas or reconstruir()
+
+
+def somar(**deltas):
+    """Aplica deltas aos campos da linha de estatísticas com um UPDATE."""
+    deltas = {campo: valor for campo, valor in deltas.items() if valor}
+    if not deltas:
+        return
+    alterados = EstatisticasDashboard.objects.filter(pk=PK).update(
+        **{campo: F(campo) + valor for campo, valor in deltas.items()}
+    )
+    if not alterados:
+        # primeira vez: a reconstrução já enxerga a alteração que gerou o delta
+        reconstruir()
+
+
+def _valor_total_propostas():
+    soma = Proposta.objects.with_totals().aggregate(t=Sum('valor_total'))['t']
+    return Decimal(soma or 0)
+
+
+def reconstruir():
+    """Recalcula a linha de estatísticas e os contadores de produtos por categoria."""
+    por_categoria = Produto.objects.filter(categoria=OuterRef('pk')).order_by() \
+                           .values('categoria').annotate(n=Count('pk')).values('n')
+    Categoria.objects.update(total_produtos=Coalesce(Subquery(por_categoria), Value(0)))
+    estatisticas, _ = EstatisticasDashboard.objects.update_or_create(pk=PK, defaults={
+        'total_eventos': Evento.objects.count(),
+        'total_produtos': Produto.objects.count(),
+        'total_salas': Sala.objects.count(),
+        'total_propostas': Proposta.objects.count(),
+        'total_categorias': Categoria.objects.count(),
+        'valor_total_propostas': _valor_total_propostas(),
+    })
+    return estatisticas
@@ -0,0 +1,608 @@
+# camarim/services/estoque.py
+"""
+Movimentação de estoque entre o Estoque geral e as salas.
+
+Todas as escritas usam UPDATEs condicionais (``quantidade = quantidade ± n``)
+em vez de ler, somar em Python e salvar, para que duas alocações simultâneas
+do mesmo produto não percam atualizações. As linhas são sempre travadas na
+mesma ordem (Estoque geral antes de EstoqueSala) e a operação é repetida
+automaticamente quando o banco acusa deadlock.
+
+Cada operação também grava seus `MovimentoEstoque` e atualiza os contadores
+de `Produto` (por último, depois de Estoque e EstoqueSala) na mesma transação.
+Toda mudança de saldo sobe a ``versao`` da linha, para que as telas de
+edição percebam que o valor que mostravam ficou velho.
+
+Produtos com ``shards`` > 0 têm o geral repartido em parcelas (ver
+services.shards): as escritas vão para uma parcela sorteada em vez da linha
+de Estoque, e os contadores disponível/alocado deles só são acertados na
+consolidação das parcelas.
+"""
+import time
+from collections import namedtuple
+from functools import wraps
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import BigIntegerField, Case, F, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+
+from camarim.models import (
+    ConflitoDeVersao, Estoque, EstoqueSala, Evento, MovimentoEstoque, Produto, Sala,
+)
+from camarim.services import contadores, estatisticas, shards
+from camarim.services.movimentos import novo_movimento, registrar
+
+# Códigos MySQL: 1213 = deadlock, 1205 = lock wait timeout
+CODIGOS_DEADLOCK = (1213, 1205)
+MAX_TENTATIVAS = 3
+ESPERA_BASE = 0.05  # segundos; dobra a cada nova tentativa
+LOTE = 500  # produtos por UPDATE agrupado / linhas por INSERT em massa
+
+Saldos = namedtuple('Saldos', ['geral', 'sala'])
+
+
+class EstoqueInsuficiente(Exception):
+    """Transferência recusada porque deixaria a origem com saldo negativo."""
+
+    def __init__(self, produto_id, solicitado):
+        self.produto_id = produto_id
+        self.solicitado = solicitado
+        super().__init__(
+            f"Estoque insuficiente para o produto {produto_id} "
+            f"(solicitado: {solicitado})."
+        )
+
+
+def _pk(obj):
+    return getattr(obj, 'pk', obj)
+
+
+def _eh_deadlock(exc):
+    codigo = exc.args[0] if exc.args else None
+    if codigo in CODIGOS_DEADLOCK:
+        return True
+    # SQLite não tem deadlock de verdade, só "database is locked"
+    return 'locked' in str(exc).lower()
+
+
+def com_retentativa(func):
+    """
+    Executa ``func`` numa transação e repete em caso de deadlock.
+
+    Dentro de um ``atomic`` externo não há como repetir só o trecho que
+    falhou (a transação inteira já foi desfeita), então o erro sobe.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        aninhada = transaction.get_connection().in_atomic_block
+        tentativa = 1
+        while True:
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as exc:
+                if aninhada or tentativa >= MAX_TENTATIVAS or not _eh_deadlock(exc):
+                    raise
+                time.sleep(ESPERA_BASE * 2 ** (tentativa - 1))
+                tentativa += 1
+    return wrapper
+
+
+def _debitar_geral(produto_id, quantidade, bloquear_negativo):
+    """UPDATE condicional no Estoque geral (quantidade negativa credita)."""
+    parcelas = shards.de([produto_id]).get(produto_id)
+    if parcelas:
+        if bloquear_negativo and quantidade > 0:
+            # a soma das parcelas só pode ser conferida travando todas elas
+            geral = _travar_geral([produto_id]).get(produto_id)
+            if geral is None:
+                raise Estoque.DoesNotExist(f"Produto {produto_id} não possui Estoque geral.")
+            if geral < quantidade:
+                raise EstoqueInsuficiente(produto_id, quantidade)
+        if shards.debitar(produto_id, parcelas, quantidade):
+            return
+    qs = Estoque.objects.filter(produto_id=produto_id)
+    if bloquear_negativo and quantidade > 0:
+        qs = qs.filter(quantidade__gte=quantidade)
+    if qs.update(quantidade=F('quantidade') - quantidade, versao=F('versao') + 1):
+        return
+    if not Estoque.objects.filter(produto_id=produto_id).exists():
+        raise Estoque.DoesNotExist(
+            f"Produto {produto_id} não possui Estoque geral."
+        )
+    raise EstoqueInsuficiente(produto_id, quantidade)
+
+
+def _creditar_sala(sala_id, produto_id, quantidade, bloquear_negativo):
+    """UPDATE condicional no EstoqueSala, criando a linha se preciso."""
+    qs = EstoqueSala.objects.filter(sala_id=sala_id, produto_id=produto_id)
+    if bloquear_negativo and quantidade < 0:
+        qs = qs.filter(quantidade__gte=-quantidade)
+    if qs.update(quantidade=F('quantidade') + quantidade, versao=F('versao') + 1):
+        return
+    if quantidade < 0:
+        # nada a devolver: a sala não tem o produto (ou não tem o bastante)
+        raise EstoqueInsuficiente(produto_id, -quantidade)
+    try:
+        # savepoint: se outro operador criou a linha ao mesmo tempo, o
+        # unique_together estoura e caímos no UPDATE de novo
+        with transaction.atomic():
+            EstoqueSala.objects.create(
+                sala_id=sala_id, produto_id=produto_id, quantidade=quantidade
+            )
+    except IntegrityError:
+        EstoqueSala.objects.filter(sala_id=sala_id, produto_id=produto_id).update(
+            quantidade=F('quantidade') + quantidade, versao=F('versao') + 1
+        )
+
+
+def _debitar_geral_em_lote(totais):
+    """
+    Debita vários produtos do Estoque geral com um único UPDATE ... CASE
+    (mais um nas parcelas, se algum produto for repartido).
+
+    ``totais`` é um dict ``{produto_id: quantidade}``; valores negativos
+    creditam. Os produtos vão em ordem de id para manter a ordem de
+    travamento das demais operações.
+    """
+    repartidos = shards.de(totais)
+    if repartidos:
+        feitos = shards.debitar_em_lote(
+            {pid: q for pid, q in totais.items() if pid in repartidos}, repartidos
+        )
+        totais = {pid: q for pid, q in totais.items() if pid not in feitos}
+    _atualizar_estoque_em_lote(totais)
+
+
+def _atualizar_estoque_em_lote(totais, versionar=True):
+    """
+    UPDATE ... CASE direto nas linhas de Estoque, sem passar pelas parcelas.
+    ``versionar=False`` quando o saldo não muda (consolidação das parcelas).
+    """
+    produto_ids = sorted(pid for pid, qtd in totais.items() if qtd)
+    for inicio in range(0, len(produto_ids), LOTE):
+        lote = produto_ids[inicio:inicio + LOTE]
+        delta = Case(
+            *[When(produto_id=pid, then=Value(totais[pid])) for pid in lote],
+            default=Value(0),
+            output_field=BigIntegerField(),
+        )
+        campos = {'versao': F('versao') + 1} if versionar else {}
+        Estoque.objects.filter(produto_id__in=lote).update(
+            quantidade=F('quantidade') - delta, **campos
+        )
+
+
+def _garantir_estoque(produto_ids):
+    """
+    Cria, zeradas, as linhas de Estoque geral que faltam. A linha é única por
+    produto, então uma criação concorrente é simplesmente ignorada.
+    """
+    existentes = set(
+        Estoque.objects.filter(produto_id__in=produto_ids).values_list('produto_id', flat=True)
+    )
+    faltando = sorted(set(produto_ids) - existentes)
+    if faltando:
+        Estoque.objects.bulk_create(
+            [Estoque(produto_id=pid, quantidade=0) for pid in faltando],
+            batch_size=LOTE, ignore_conflicts=True,
+        )
+
+
+def _travar_geral(produto_ids):
+    """
+    Trava as linhas de Estoque e as parcelas dos produtos (nessa ordem) e
+    devolve o saldo geral de cada um: ``{produto_id: quantidade}``.
+    """
+    geral = dict(
+        Estoque.objects.select_for_update()
+               .filter(produto_id__in=produto_ids)
+               .order_by('produto_id')
+               .values_list('produto_id', 'quantidade')
+    )
+    for produto_id, parcelas in shards.somas(list(geral), travar=True).items():
+        geral[produto_id] += parcelas
+    return geral
+
+
+def _criar_salas(salas):
+    """INSERT em massa quando o banco devolve os ids; senão, um a um."""
+    if connection.features.can_return_rows_from_bulk_insert:
+        # bulk_create não dispara os sinais que contam as salas do painel
+        estatisticas.somar(total_salas=len(salas))
+        return Sala.objects.bulk_create(salas)
+    for sala in salas:
+        sala.save(force_insert=True)
+    return salas
+
+
+def saldos(produto, sala):
+    """Lê, numa única consulta, o saldo geral e o da sala para o produto."""
+    produto_id, sala_id = _pk(produto), _pk(sala)
+    na_sala = EstoqueSala.objects.filter(
+        sala_id=sala_id, produto_id=OuterRef('produto_id')
+    ).values('quantidade')[:1]
+    linha = (
+        Estoque.objects
+               .filter(produto_id=produto_id)
+               .annotate(na_sala=Subquery(na_sala),
+                         geral=F('quantidade') + shards.soma('produto_id'))
+               .values_list('geral', 'na_sala')
+               .first()
+    )
+    if linha is None:
+        na_sala = EstoqueSala.objects.filter(
+            sala_id=sala_id, produto_id=produto_id
+        ).values_list('quantidade', flat=True).first()
+        return Saldos(None, na_sala or 0)
+    return Saldos(linha[0], linha[1] or 0)
+
+
+@com_retentativa
+def transferir(produto, sala, quantidade, *, bloquear_negativo=False, usuario=None):
+    """
+    Move ``quantidade`` do Estoque geral para a sala (valores negativos
+    devolvem da sala para o geral) e retorna os novos ``Saldos``.
+
+    Com ``bloquear_negativo=True`` a operação é recusada com
+    ``EstoqueInsuficiente`` se a origem ficar negativa; sem ele, o geral
+    pode ficar negativo como sempre foi permitido nas telas.
+    """
+    produto_id, sala_id = _pk(produto), _pk(sala)
+    if quantidade:
+        # ordem fixa de travamento: Estoque geral primeiro, depois a sala
+        _debitar_geral(produto_id, quantidade, bloquear_negativo)
+        _creditar_sala(sala_id, produto_id, quantidade, bloquear_negativo)
+        contadores.atualizar({produto_id: (-quantidade, quantidade)})
+        if quantidade > 0:
+            registrar(novo_movimento(MovimentoEstoque.ALOCACAO, produto_id, quantidade,
+                                     destino_id=sala_id, usuario=usuario))
+        else:
+            registrar(novo_movimento(MovimentoEstoque.DEVOLUCAO, produto_id, -quantidade,
+                                     origem_id=sala_id, usuario=usuario))
+    return saldos(produto_id, sala_id)
+
+
+def devolver(produto, sala, quantidade, **kwargs):
+    """Atalho para devolver ``quantidade`` da sala ao Estoque geral."""
+    return transferir(produto, sala, -quantidade, **kwargs)
+
+
+@com_retentativa
+def ajustar_alocacao(sala, produto_antigo, quantidade_antiga, produto, quantidade,
+                     *, bloquear_negativo=False, versao=None, usuario=None):
+    """
+    Reflete a edição de um EstoqueSala: ajusta a diferença quando o produto
+    é o mesmo, ou devolve o antigo e aloca o novo quando o produto muda.
+
+    Com ``versao`` (a lida pelo formulário), levanta ``ConflitoDeVersao`` se
+    a alocação mudou desde então.
+    """
+    sala_id = _pk(sala)
+    antigo_id, novo_id = _pk(produto_antigo), _pk(produto)
+    if versao is not None:
+        # trava o geral antes da sala, na ordem de sempre, e só então confere
+        list(Estoque.objects.select_for_update().filter(produto_id__in={antigo_id, novo_id})
+                    .order_by('produto_id').values_list('pk'))
+        if not EstoqueSala.objects.filter(sala_id=sala_id, produto_id=antigo_id, versao=versao) \
+                                  .update(versao=F('versao') + 1):
+            raise ConflitoDeVersao(EstoqueSala(sala_id=sala_id, produto_id=antigo_id))
+    if antigo_id == novo_id:
+        return transferir(novo_id, sala_id, quantidade - quantidade_antiga,
+                          bloquear_negativo=bloquear_negativo, usuario=usuario)
+    # mantém a ordem de travamento por produto_id entre os dois produtos
+    movimentos = sorted([(antigo_id, -quantidade_antiga), (novo_id, quantidade)])
+    for produto_id, delta in movimentos:
+        transferir(produto_id, sala_id, delta,
+                   bloquear_negativo=bloquear_negativo, usuario=usuario)
+    EstoqueSala.objects.filter(sala_id=sala_id, produto_id=antigo_id, quantidade=0).delete()
+    return saldos(novo_id, sala_id)
+
+
+@com_retentativa
+def desalocar(item, *, usuario=None):
+    """Devolve ao Estoque geral tudo o que o EstoqueSala ``item`` tem e o apaga."""
+    saldo = devolver(item.produto_id, item.sala_id, item.quantidade, usuario=usuario)
+    EstoqueSala.objects.filter(pk=item.pk).delete()
+    return Saldos(saldo.geral, 0)
+
+
+@com_retentativa
+def replicar_salas(salas, eventos, *, usuario=None):
+    """
+    Clona cada sala de ``salas`` em cada evento de ``eventos``, copiando o
+    EstoqueSala e debitando o total do Estoque geral.
+
+    O número de consultas não depende da quantidade de itens: uma leitura
+    dos itens, os INSERTs das salas novas, INSERTs em massa do EstoqueSala
+    e um UPDATE agrupado no geral. Retorna as salas criadas, na ordem
+    evento a evento.
+    """
+    salas, eventos = list(salas), list(eventos)
+    itens = list(
+        EstoqueSala.objects
+                   .filter(sala__in=salas)
+                   .values_list('sala_id', 'produto_id', 'quantidade')
+    )
+    novas = _criar_salas([
+        Sala(nome=sala.nome, evento=evento)
+        for evento in eventos
+        for sala in salas
+    ])
+
+    por_sala = {}
+    for sala_id, produto_id, quantidade in itens:
+        por_sala.setdefault(sala_id, []).append((produto_id, quantidade))
+
+    copias, movimentos, totais = [], [], {}
+    for indice, nova in enumerate(novas):
+        origem = salas[indice % len(salas)]
+        for produto_id, quantidade in por_sala.get(origem.pk, []):
+            copias.append(EstoqueSala(sala=nova, produto_id=produto_id, quantidade=quantidade))
+            movimentos.append(novo_movimento(MovimentoEstoque.ALOCACAO, produto_id, quantidade,
+                                             destino_id=nova.pk, usuario=usuario))
+            totais[produto_id] = totais.get(produto_id, 0) + quantidade
+
+    # debita primeiro o geral, como em transferir(), para manter a ordem de travamento
+    _debitar_geral_em_lote(totais)
+    EstoqueSala.objects.bulk_create(copias, batch_size=LOTE)
+    contadores.atualizar({pid: (-total, total) for pid, total in totais.items()})
+    registrar(*movimentos)
+    return novas
+
+
+@com_retentativa
+def alocar_em_lote(sala, pedidos, *, bloquear_negativo=False, usuario=None):
+    """
+    Aloca vários produtos na sala de uma vez: ``pedidos`` é
+    ``{produto: quantidade}``. Uma leitura do geral (com trava, se for para
+    bloquear negativos) valida tudo, um UPDATE agrupado debita, e o
+    EstoqueSala é atualizado/criado em massa. Retorna ``{produto_id: Saldos}``.
+    """
+    sala_id = _pk(sala)
+    pedidos = {_pk(p): q for p, q in pedidos.items() if q}
+    if not pedidos:
+        return {}
+
+    if bloquear_negativo:
+        geral = _travar_geral(pedidos)
+    else:
+        geral = dict(
+            Estoque.objects.filter(produto_id__in=pedidos)
+                   .annotate(geral=F('quantidade') + shards.soma('produto_id'))
+                   .values_list('produto_id', 'geral')
+        )
+    sem_estoque = sorted(set(pedidos) - set(geral))
+    if sem_estoque:
+        raise Estoque.DoesNotExist(
+            f"Produtos sem Estoque geral: {', '.join(map(str, sem_estoque))}."
+        )
+    if bloquear_negativo:
+        for produto_id, quantidade in sorted(pedidos.items()):
+            if geral[produto_id] < quantidade:
+                raise EstoqueInsuficiente(produto_id, quantidade)
+    _debitar_geral_em_lote(pedidos)
+
+    existentes = {
+        item.produto_id: item
+        for item in EstoqueSala.objects.select_for_update()
+                               .filter(sala_id=sala_id, produto_id__in=pedidos)
+                               .order_by('produto_id')
+    }
+    novos = []
+    for produto_id, quantidade in pedidos.items():
+        if produto_id in existentes:
+            existentes[produto_id].quantidade += quantidade
+            existentes[produto_id].versao += 1
+        else:
+            novos.append(EstoqueSala(sala_id=sala_id, produto_id=produto_id, quantidade=quantidade))
+    EstoqueSala.objects.bulk_update(existentes.values(), ['quantidade', 'versao'], batch_size=LOTE)
+    EstoqueSala.objects.bulk_create(novos, batch_size=LOTE)
+
+    contadores.atualizar({pid: (-q, q) for pid, q in pedidos.items()})
+    registrar(*[
+        novo_movimento(MovimentoEstoque.ALOCACAO, pid, q, destino_id=sala_id, usuario=usuario)
+        for pid, q in sorted(pedidos.items())
+    ])
+    na_sala = {item.produto_id: item.quantidade for item in existentes.values()}
+    na_sala.update((item.produto_id, item.quantidade) for item in novos)
+    return {
+        pid: Saldos(geral[pid] - q, na_sala[pid])
+        for pid, q in pedidos.items()
+    }
+
+
+Encerramento = namedtuple('Encerramento', ['itens', 'devolvido', 'perdas'])
+
+
+@com_retentativa
+def encerrar_evento(evento, contagens=None, *, usuario=None):
+    """
+    Devolve ao Estoque geral todas as alocações das salas do ``evento`` e o
+    marca como arquivado, com um número fixo de consultas qualquer que seja
+    o número de salas e itens.
+
+    ``contagens`` (``{estoque_sala_id: quantidade contada}``) registra a
+    diferença como baixa (perda) ou, se sobrou, como ajuste de entrada.
+    """
+    contagens = contagens or {}
+    salas = EstoqueSala.objects.filter(sala__evento=evento)
+    # ordem fixa de travamento: Estoque geral primeiro, depois as salas
+    produto_ids = sorted(set(salas.values_list('produto_id', flat=True)))
+    if produto_ids:
+        _garantir_estoque(produto_ids)
+        _travar_geral(produto_ids)
+    itens = list(
+        salas.select_for_update()
+             .order_by('produto_id', 'pk')
+             .values_list('pk', 'sala_id', 'produto_id', 'quantidade')
+    )
+    Mov = MovimentoEstoque
+    creditos, deltas, movimentos = {}, {}, []
+    devolvido_total = perdas_total = 0
+    for pk, sala_id, produto_id, quantidade in itens:
+        contado = max(contagens.get(pk, quantidade), 0)
+        devolvido = min(contado, quantidade)
+        if devolvido:
+            movimentos.append(novo_movimento(Mov.DEVOLUCAO, produto_id, devolvido,
+                                             origem_id=sala_id, usuario=usuario))
+        if contado < quantidade:
+            movimentos.append(novo_movimento(Mov.BAIXA, produto_id, quantidade - contado,
+                                             origem_id=sala_id, usuario=usuario))
+            perdas_total += quantidade - contado
+        elif contado > quantidade:
+            movimentos.append(novo_movimento(Mov.AJUSTE, produto_id, contado - quantidade,
+                                             usuario=usuario))
+        creditos[produto_id] = creditos.get(produto_id, 0) + contado
+        disp, aloc = deltas.get(produto_id, (0, 0))
+        deltas[produto_id] = (disp + contado, aloc - quantidade)
+        devolvido_total += contado
+
+    if creditos:
+        alocados_depois = set(creditos) - set(produto_ids)
+        if alocados_depois:
+            # alocado no evento entre a leitura dos ids e a trava das salas
+            _garantir_estoque(alocados_depois)
+        _debitar_geral_em_lote({pid: -q for pid, q in creditos.items()})
+        EstoqueSala.objects.filter(pk__in=[item[0] for item in itens]).delete()
+        contadores.atualizar(deltas)
+        registrar(*movimentos)
+
+    Evento.objects.filter(pk=_pk(evento)).update(arquivado=True, encerrado_em=timezone.now())
+    return Encerramento(len(itens), devolvido_total, perdas_total)
+
+
+# — Estoque geral —
+
+@com_retentativa
+def entrada_estoque(produto, quantidade, *, usuario=None):
+    """Soma ``quantidade`` ao Estoque geral do produto (cria a linha se faltar)."""
+    produto_id = _pk(produto)
+    somar = Estoque.objects.filter(produto_id=produto_id)
+    if not somar.update(quantidade=F('quantidade') + quantidade, versao=F('versao') + 1):
+        _garantir_estoque([produto_id])
+        somar.update(quantidade=F('quantidade') + quantidade, versao=F('versao') + 1)
+    contadores.atualizar({produto_id: (quantidade, 0)})
+    registrar(novo_movimento(MovimentoEstoque.AJUSTE, produto_id, quantidade, usuario=usuario))
+
+
+@com_retentativa
+def definir_estoque(produto, quantidade, *, esperado=None, usuario=None):
+    """
+    Fixa o Estoque geral do produto em ``quantidade`` e registra a diferença.
+    Com ``esperado`` (o saldo que o formulário mostrou), levanta
+    ``ConflitoDeVersao`` se o saldo mudou desde então, em vez de desfazer
+    as movimentações feitas nesse meio-tempo.
+    """
+    produto_id = _pk(produto)
+    _consolidar([produto_id])
+    atual = (
+        Estoque.objects.select_for_update()
+               .filter(produto_id=produto_id)
+               .values_list('quantidade', flat=True)
+               .get()
+    )
+    if esperado is not None and atual != esperado:
+        raise ConflitoDeVersao(Estoque(produto_id=produto_id))
+    Estoque.objects.filter(produto_id=produto_id).update(quantidade=quantidade, versao=F('versao') + 1)
+    contadores.atualizar({produto_id: (quantidade - atual, 0)})
+    registrar(novo_movimento(MovimentoEstoque.AJUSTE, produto_id, quantidade - atual,
+                             usuario=usuario))
+
+
+@com_retentativa
+def editar_estoque(estoque, produto, quantidade, *, versao=None, esperado=None, usuario=None):
+    """
+    Salva a edição de uma linha de Estoque e registra o ajuste de cada produto.
+    Com ``versao`` (a lida pelo formulário), levanta ``ConflitoDeVersao`` se a
+    linha mudou desde então. As escritas nas parcelas não sobem a versão:
+    ``esperado`` (o saldo, somando as parcelas, que o formulário mostrou)
+    pega também essas.
+    """
+    produto_id = _pk(produto)
+    produto_antigo = Estoque.objects.values_list('produto_id', flat=True).get(pk=_pk(estoque))
+    _consolidar(sorted({produto_antigo, produto_id}))
+    antes = Estoque.objects.select_for_update().get(pk=_pk(estoque))
+    if esperado is not None and antes.quantidade != esperado:
+        raise ConflitoDeVersao(antes)
+    depois = Estoque(pk=antes.pk, produto_id=produto_id, quantidade=quantidade)
+    depois.salvar_se_versao(antes.versao if versao is None else versao, ['produto', 'quantidade'])
+    deltas = {antes.produto_id: (-antes.quantidade, 0)}
+    deltas[produto_id] = (deltas.get(produto_id, (0, 0))[0] + quantidade, 0)
+    contadores.atualizar(deltas)
+    if antes.produto_id == produto_id:
+        registrar(novo_movimento(MovimentoEstoque.AJUSTE, produto_id,
+                                 quantidade - antes.quantidade, usuario=usuario))
+    else:
+        registrar(
+            novo_movimento(MovimentoEstoque.AJUSTE, antes.produto_id, -antes.quantidade,
+                           usuario=usuario),
+            novo_movimento(MovimentoEstoque.AJUSTE, produto_id, quantidade, usuario=usuario),
+        )
+
+
+@com_retentativa
+def remover_estoque(estoque, *, usuario=None):
+    """Apaga uma linha de Estoque registrando a saída do que ela tinha."""
+    _consolidar([Estoque.objects.values_list('produto_id', flat=True).get(pk=_pk(estoque))])
+    antes = Estoque.objects.select_for_update().get(pk=_pk(estoque))
+    antes.delete()
+    contadores.atualizar({antes.produto_id: (-antes.quantidade, 0)})
+    registrar(novo_movimento(MovimentoEstoque.AJUSTE, antes.produto_id, -antes.quantidade,
+                             usuario=usuario))
+
+
+# — Parcelas (produtos repartidos) —
+
+def _consolidar(produto_ids):
+    """
+    Passa para a linha de Estoque o que está nas parcelas dos produtos e
+    acerta os contadores deles. Precisa rodar dentro de uma transação.
+    """
+    _garantir_estoque(produto_ids)
+    # mesma ordem de _travar_geral: linhas de Estoque, depois as parcelas
+    list(Estoque.objects.select_for_update().filter(produto_id__in=produto_ids)
+                .order_by('produto_id').values_list('pk'))
+    parcelas = shards.somas(produto_ids, travar=True)
+    _atualizar_estoque_em_lote({pid: -q for pid, q in parcelas.items()}, versionar=False)
+    shards.zerar(produto_ids)
+    contadores.reconstruir(
+        Produto.objects.filter(Q(pk__in=parcelas) | Q(pk__in=produto_ids, shards__gt=0))
+    )
+
+
+@com_retentativa
+def _consolidar_lote(produto_ids):
+    _consolidar(produto_ids)
+
+
+def consolidar_shards(produtos=None):
+    """
+    Consolida as parcelas com saldo (de ``produtos`` ou de todos), um lote
+    por transação para não segurar as travas por muito tempo. Retorna
+    quantos produtos foram consolidados.
+    """
+    produto_ids = list(shards.com_saldo(produtos))
+    for inicio in range(0, len(produto_ids), LOTE):
+        _consolidar_lote(produto_ids[inicio:inicio + LOTE])
+    return len(produto_ids)
+
+
+@com_retentativa
+def ativar_shards(produto, quantidade):
+    """Reparte o Estoque geral do produto em ``quantidade`` parcelas."""
+    produto_id = _pk(produto)
+    _consolidar([produto_id])
+    shards.recriar(produto_id, quantidade)
+    Produto.objects.filter(pk=produto_id).update(shards=quantidade)
+
+
+@com_retentativa
+def desativar_shards(produto):
+    """Volta o produto para uma única linha de Estoque geral."""
+    produto_id = _pk(produto)
+    _consolidar([produto_id])
+    Produto.objects.filter(pk=produto_id).update(shards=0)
+    # na mesma transação das travas da consolidação: quem estava esperando
+    # para escrever numa parcela não acha mais a linha e cai no Estoque
+    shards.recriar(produto_id, 0)
@@ -0,0 +1,139 @@
+# camarim/services/exportacao.py
+"""
+Exportação do inventário, das alocações nas salas e das propostas.
+
+Cada tipo em ``TIPOS`` devolve ``(nome do arquivo, cabeçalho, linhas)``,
+com ``linhas`` um gerador lido em páginas por cursor
+(camarim.pagination.percorrer). Assim nem o banco nem o processo
+carregam a tabela inteira. ``csv_em_fluxo`` produz o texto aos poucos,
+para um StreamingHttpResponse. ``xlsx_em_arquivo`` grava a planilha no
+modo write_only do openpyxl, em arquivo temporário e sem guardar as linhas
+em memória. O XLSX é um zip com o índice no fim, então só pode ser
+enviado depois de pronto.
+"""
+import csv
+import tempfile
+from decimal import Decimal
+
+from django.utils import timezone
+
+from camarim.models import EstoqueSala, ItemProposta, Produto, Proposta
+from camarim.pagination import percorrer
+from camarim.services import busca
+
+LOTE = 2000
+
+
+class ExportacaoIndisponivel(RuntimeError):
+    pass
+
+
+def _linhas(queryset, ordem, colunas):
+    for pagina in percorrer(queryset, ordem, LOTE):
+        for registro in pagina:
+            yield [registro[coluna] for coluna in colunas]
+
+
+def produtos(q=''):
+    colunas = ['id', 'nome', 'categoria__nome', 'preco', 'estoque_disponivel', 'estoque_alocado', 'estoque_total']
+    produtos = busca.filtrar(Produto.objects.values(*colunas), q)
+    return (
+        'produtos',
+        ['ID', 'Produto', 'Categoria', 'Preço', 'Disponível', 'Alocado', 'Total'],
+        _linhas(produtos, ('nome', 'id'), colunas),
+    )
+
+
+def alocacoes(evento=None, sala=None):
+    """EstoqueSala sala a sala (todas, de um evento ou de uma sala)."""
+    colunas = ['sala__evento__nome', 'sala__nome', 'produto_id', 'produto__nome', 'quantidade']
+    itens = EstoqueSala.objects.values('id', 'sala_id', *colunas)
+    if evento:
+        itens = itens.filter(sala__evento=evento)
+    if sala:
+        itens = itens.filter(sala=sala)
+    return (
+        'alocacoes',
+        ['Evento', 'Sala', 'ID Produto', 'Produto', 'Quantidade'],
+        _linhas(itens, ('sala_id', 'id'), colunas),
+    )
+
+
+def _propostas_com_itens(propostas):
+    for pagina in percorrer(propostas, ('id',), LOTE):
+        # os itens da página numa consulta só
+        itens = {}
+        for linha in (
+            ItemProposta.objects.filter(proposta_id__in=[p['id'] for p in pagina])
+                        .order_by('proposta_id', 'sala__nome', 'id')
+                        .values_list('proposta_id', 'sala__nome', 'produto__nome', 'quantidade', 'preco_unitario')
+        ):
+            itens.setdefault(linha[0], []).append(linha[1:])
+        for proposta in pagina:
+            # sem fuso: o XLSX não aceita datas com fuso horário
+            criada = timezone.localtime(proposta['created_at']).replace(tzinfo=None)
+            cabeca = [proposta['id'], proposta['evento__nome'], proposta['status'], criada]
+            totais = [proposta['subtotal'], proposta['impostos'], proposta['total']]
+            # proposta sem itens sai numa linha só
+            for sala, produto, quantidade, preco in itens.get(proposta['id'], [(None,) * 4]):
+                total = (preco * quantidade).quantize(Decimal('0.01')) if preco is not None else None
+                yield cabeca + [sala, produto, quantidade, preco, total] + totais
+
+
+def propostas(evento=None):
+    """Uma linha por item, com os dados e os totais gravados da proposta."""
+    lista = Proposta.objects.values(
+        'id', 'evento__nome', 'status', 'created_at', 'subtotal', 'impostos', 'total',
+    )
+    if evento:
+        lista = lista.filter(evento=evento)
+    return (
+        'propostas',
+        ['Proposta', 'Evento', 'Status', 'Criada em', 'Sala', 'Produto', 'Quantidade',
+         'Preço Unitário', 'Total do Item', 'Subtotal', 'Impostos (%)', 'Total'],
+        _propostas_com_itens(lista),
+    )
+
+
+TIPOS = {
+    'produtos': produtos,
+    'alocacoes': alocacoes,
+    'propostas': propostas,
+}
+
+
+class _Eco:
+    """Arquivo de mentira para o csv.writer: devolve a linha em vez de gravar."""
+    def write(self, texto):
+        return texto
+
+
+def csv_em_fluxo(cabecalho, linhas):
+    """Pedaços de texto CSV (com BOM, para o Excel abrir em UTF-8), ``LOTE`` linhas por vez."""
+    escritor = csv.writer(_Eco())
+    # o cabeçalho sai antes da primeira consulta
+    yield '\ufeff' + escritor.writerow(cabecalho)
+    pedaco = []
+    for linha in linhas:
+        pedaco.append(escritor.writerow(linha))
+        if len(pedaco) >= LOTE:
+            yield ''.join(pedaco)
+            pedaco = []
+    yield ''.join(pedaco)
+
+
+def xlsx_em_arquivo(titulo, cabecalho, linhas):
+    """Arquivo temporário (já no início) com a planilha."""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportacaoIndisponivel("Exportar XLSX requer o pacote openpyxl.")
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet(titulo)
+    planilha.append(cabecalho)
+    for linha in linhas:
+        planilha.append(linha)
+    arquivo = tempfile.TemporaryFile()
+    livro.save(arquivo)
+    arquivo.seek(0)
+    return arquivo
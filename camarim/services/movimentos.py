@@ -0,0 +1,168 @@
+# camarim/services/movimentos.py
+"""
+Leitura e compactação do livro-razão `MovimentoEstoque`.
+
+O saldo de um local (Estoque geral ou uma sala) em qualquer data é a última
+foto `SaldoEstoque` até aquela data mais a "cauda" de movimentos gravados
+depois dela, em vez de somar o histórico inteiro.
+"""
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from camarim.models import MovimentoEstoque, SaldoEstoque
+
+Mov = MovimentoEstoque
+
+
+def _usuario(usuario):
+    if usuario is not None and getattr(usuario, 'is_authenticated', False):
+        return usuario
+    return None
+
+
+def novo_movimento(tipo, produto_id, delta, *, origem_id=None, destino_id=None, usuario=None):
+    """Monta (sem salvar) um movimento; use ``registrar`` ou ``bulk_create``."""
+    return Mov(
+        tipo=tipo, produto_id=produto_id, delta=delta,
+        origem_id=origem_id, destino_id=destino_id, usuario=_usuario(usuario),
+    )
+
+
+def registrar(*movimentos):
+    """Grava os movimentos num único INSERT, ignorando os de delta zero."""
+    movimentos = [m for m in movimentos if m.delta]
+    if movimentos:
+        Mov.objects.bulk_create(movimentos, batch_size=500)
+    return movimentos
+
+
+# efeito de cada tipo de movimento sobre o saldo do local
+EFEITO_GERAL = Case(
+    When(tipo__in=[Mov.AJUSTE, Mov.DEVOLUCAO], then=F('delta')),
+    When(tipo=Mov.ALOCACAO, then=-F('delta')),
+    default=Value(0),
+    output_field=BigIntegerField(),
+)
+
+
+def _efeito_sala(sala_id):
+    return Case(
+        When(tipo=Mov.ALOCACAO, destino_id=sala_id, then=F('delta')),
+        When(tipo__in=[Mov.DEVOLUCAO, Mov.BAIXA], origem_id=sala_id, then=-F('delta')),
+        default=Value(0),
+        output_field=BigIntegerField(),
+    )
+
+
+def _movimentos_do_local(sala_id):
+    if sala_id is None:
+        return Mov.objects.filter(tipo__in=[Mov.AJUSTE, Mov.ALOCACAO, Mov.DEVOLUCAO]), EFEITO_GERAL
+    return (
+        Mov.objects.filter(Q(destino_id=sala_id) | Q(origem_id=sala_id)),
+        _efeito_sala(sala_id),
+    )
+
+
+def saldo(produto, sala=None, em=None):
+    """
+    Saldo de ``produto`` no geral (``sala=None``) ou na sala, agora ou na
+    data ``em``: busca indexada da última foto + soma da cauda.
+    """
+    produto_id = getattr(produto, 'pk', produto)
+    sala_id = getattr(sala, 'pk', sala)
+    em = em or timezone.now()
+    foto = (
+        SaldoEstoque.objects
+                    .filter(produto_id=produto_id, sala_id=sala_id, data__lte=em)
+                    .order_by('-data', '-ultimo_movimento')
+                    .values_list('quantidade', 'ultimo_movimento')
+                    .first()
+    ) or (0, 0)
+    movimentos, efeito = _movimentos_do_local(sala_id)
+    cauda = movimentos.filter(
+        produto_id=produto_id, pk__gt=foto[1], created_at__lte=em
+    ).aggregate(total=Coalesce(Sum(efeito), Value(0)))['total']
+    return foto[0] + cauda
+
+
+def alocado_por_evento(evento, inicio=None, fim=None):
+    """
+    Quanto de cada produto foi mandado (líquido das devoluções e baixas) às
+    salas de ``evento`` entre ``inicio`` e ``fim``: ``{produto_id: quantidade}``.
+    """
+    qs = Mov.objects.filter(
+        Q(destino__evento=evento) | Q(origem__evento=evento)
+    )
+    if inicio:
+        qs = qs.filter(created_at__gte=inicio)
+    if fim:
+        qs = qs.filter(created_at__lte=fim)
+    efeito = Case(
+        When(tipo=Mov.ALOCACAO, then=F('delta')),
+        When(tipo__in=[Mov.DEVOLUCAO, Mov.BAIXA], then=-F('delta')),
+        default=Value(0),
+        output_field=BigIntegerField(),
+    )
+    return dict(
+        qs.values('produto_id')
+          .annotate(total=Sum(efeito))
+          .order_by()
+          .values_list('produto_id', 'total')
+    )
+
+
+@transaction.atomic
+def compactar():
+    """
+    Grava novas fotos `SaldoEstoque` para todo local que teve movimento desde
+    a última compactação. Retorna quantas fotos foram criadas.
+    """
+    marca = SaldoEstoque.objects.aggregate(m=Max('ultimo_movimento'))['m'] or 0
+    ultimo = Mov.objects.filter(pk__gt=marca).order_by('-pk').values_list('pk', 'created_at').first()
+    if ultimo is None:
+        return 0
+    ultimo_id, data = ultimo
+    janela = Mov.objects.filter(pk__gt=marca, pk__lte=ultimo_id).order_by()
+
+    # caudas agrupadas: uma passada para o geral e uma por lado das salas
+    caudas = {}
+    geral = (
+        janela.filter(tipo__in=[Mov.AJUSTE, Mov.ALOCACAO, Mov.DEVOLUCAO])
+              .values('produto_id').annotate(total=Sum(EFEITO_GERAL))
+    )
+    for linha in geral:
+        caudas[(linha['produto_id'], None)] = linha['total']
+    entradas = janela.filter(tipo=Mov.ALOCACAO, destino__isnull=False) \
+                     .values('produto_id', 'destino_id').annotate(total=Sum('delta'))
+    for linha in entradas:
+        chave = (linha['produto_id'], linha['destino_id'])
+        caudas[chave] = caudas.get(chave, 0) + linha['total']
+    saidas = janela.filter(tipo__in=[Mov.DEVOLUCAO, Mov.BAIXA], origem__isnull=False) \
+                   .values('produto_id', 'origem_id').annotate(total=Sum('delta'))
+    for linha in saidas:
+        chave = (linha['produto_id'], linha['origem_id'])
+        caudas[chave] = caudas.get(chave, 0) - linha['total']
+
+    # última foto de cada local tocado
+    anteriores = {}
+    fotos = (
+        SaldoEstoque.objects
+                    .filter(produto_id__in={p for p, _ in caudas})
+                    .order_by('ultimo_movimento', 'pk')
+                    .values_list('produto_id', 'sala_id', 'quantidade')
+    )
+    for produto_id, sala_id, quantidade in fotos.iterator():
+        anteriores[(produto_id, sala_id)] = quantidade
+
+    novas = [
+        SaldoEstoque(
+            produto_id=produto_id, sala_id=sala_id,
+            quantidade=anteriores.get((produto_id, sala_id), 0) + cauda,
+            ultimo_movimento=ultimo_id, data=data,
+        )
+        for (produto_id, sala_id), cauda in caudas.items()
+    ]
+    SaldoEstoque.objects.bulk_create(novas, batch_size=500)
+    return len(novas)
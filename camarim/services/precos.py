@@ -0,0 +1,188 @@
+# camarim/services/precos.py
+"""
+Reajuste de preços em lote.
+
+Os preços novos vêm de uma tabela (CSV ou XLSX com as colunas ``id`` ou
+``nome`` e ``preco``) ou de um percentual por categoria, e são gravados com
+UPDATEs em conjunto. Opcionalmente os itens das propostas ainda abertas
+passam a usar o preço novo. Com ``simular=True`` tudo roda e é desfeito no
+fim, devolvendo o mesmo resumo.
+"""
+import csv
+import re
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Round
+
+from camarim.models import ItemProposta, Produto, Proposta
+from camarim.services.propostas import recalcular_totais
+
+LOTE = 500
+PRECO = DecimalField(max_digits=14, decimal_places=2)
+
+# diferencas: [(produto_id, nome, preço antes, preço depois)]
+Reajuste = namedtuple('Reajuste', ['diferencas', 'itens', 'propostas'])
+
+
+class TabelaInvalida(ValueError):
+    pass
+
+
+# só pontos separando grupos de três dígitos, sem vírgula decimal
+_MILHAR = re.compile(r'^-?\d{1,3}(\.\d{3})+$')
+# vírgulas separando os milhares, como nas planilhas em inglês: 1,234.56
+_MILHAR_EN = re.compile(r'^-?\d{1,3}(,\d{3})+(\.\d+)?$')
+
+
+def _decimal(valor):
+    if isinstance(valor, (int, float, Decimal)):
+        # célula numérica do XLSX: não há separador a interpretar
+        texto = str(valor)
+    else:
+        texto = str(valor).strip().replace('R$', '').strip()
+        if _MILHAR_EN.match(texto):
+            raise TabelaInvalida(f"Preço fora do formato brasileiro (1.234,56): {valor!r}")
+        if ',' in texto:
+            # formato brasileiro: 1.234,56
+            texto = texto.replace('.', '').replace(',', '.')
+        elif _MILHAR.match(texto):
+            # "1.500" é mil e quinhentos, não 1,50
+            texto = texto.replace('.', '')
+    try:
+        preco = Decimal(texto).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise TabelaInvalida(f"Preço inválido: {valor!r}")
+    if preco < 0:
+        raise TabelaInvalida(f"Preço negativo: {valor!r}")
+    return preco
+
+
+def _linhas_xlsx(caminho):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise TabelaInvalida("Leitura de XLSX requer o pacote openpyxl.")
+    planilha = load_workbook(caminho, read_only=True, data_only=True).active
+    linhas = planilha.iter_rows(values_only=True)
+    cabecalho = [str(c or '').strip().lower() for c in next(linhas, ())]
+    for numero, linha in enumerate(linhas, start=2):
+        yield numero, dict(zip(cabecalho, linha))
+
+
+def _linhas_csv(caminho):
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+        except csv.Error:
+            raise TabelaInvalida("Linha 1: não foi possível identificar o separador do CSV.")
+        leitor = csv.DictReader(arquivo, dialect=dialeto)
+        try:
+            for linha in leitor:
+                yield leitor.line_num, {(k or '').strip().lower(): v for k, v in linha.items()}
+        except csv.Error as erro:
+            raise TabelaInvalida(f"Linha {leitor.line_num}: {erro}")
+
+
+def ler_tabela(caminho):
+    """
+    Lê a tabela de preços e devolve ``({produto_id: preço}, [chaves não
+    encontradas])``. Linhas identificadas por ``id`` têm prioridade sobre
+    as identificadas por ``nome``.
+    """
+    linhas = _linhas_xlsx(caminho) if Path(caminho).suffix.lower() == '.xlsx' else _linhas_csv(caminho)
+    por_id, por_nome = {}, {}
+    for numero, linha in linhas:
+        if linha.get('preco') in (None, ''):
+            continue
+        try:
+            preco = _decimal(linha['preco'])
+        except TabelaInvalida as erro:
+            raise TabelaInvalida(f"Linha {numero}: {erro}")
+        if str(linha.get('id') or '').strip():
+            try:
+                por_id[int(linha['id'])] = preco
+            except ValueError:
+                raise TabelaInvalida(f"Linha {numero}: id inválido: {linha['id']!r}")
+        elif str(linha.get('nome') or '').strip():
+            por_nome[str(linha['nome']).strip()] = preco
+    if not por_id and not por_nome:
+        raise TabelaInvalida("A tabela precisa das colunas 'preco' e 'id' ou 'nome'.")
+
+    precos, ignorados = {}, []
+    existentes = set(Produto.objects.filter(pk__in=por_id).values_list('pk', flat=True))
+    for pk, preco in por_id.items():
+        if pk in existentes:
+            precos[pk] = preco
+        else:
+            ignorados.append(pk)
+    nomes = dict(Produto.objects.filter(nome__in=por_nome).values_list('nome', 'pk'))
+    for nome, preco in por_nome.items():
+        if nome in nomes:
+            precos.setdefault(nomes[nome], preco)
+        else:
+            ignorados.append(nome)
+    return precos, ignorados
+
+
+def _aplicar_tabela(precos):
+    ids = sorted(precos)
+    for inicio in range(0, len(ids), LOTE):
+        lote = ids[inicio:inicio + LOTE]
+        Produto.objects.filter(pk__in=lote).update(preco=Case(
+            *[When(pk=pk, then=Value(precos[pk])) for pk in lote], output_field=PRECO,
+        ))
+    return Produto.objects.filter(pk__in=ids)
+
+
+def _aplicar_percentual(categorias, percentual):
+    produtos = Produto.objects.filter(categoria__in=categorias)
+    fator = 1 + Decimal(percentual) / 100
+    # o django-money só aceita expressão sobre um MoneyField se vier num Cast/Case/Coalesce
+    produtos.update(preco=Cast(Round(F('preco') * Value(fator), 2), output_field=PRECO))
+    return produtos
+
+
+def _propagar(produto_ids):
+    """Itens de propostas abertas passam ao preço atual do produto."""
+    itens = ItemProposta.objects.filter(
+        produto_id__in=produto_ids, proposta__status=Proposta.ABERTA,
+    )
+    preco_atual = Produto.objects.filter(pk=OuterRef('produto_id')).values('preco')[:1]
+    mudam = itens.exclude(preco_unitario=Subquery(preco_atual))
+    propostas = set(mudam.values_list('proposta_id', flat=True))
+    total = mudam.update(preco_unitario=Subquery(preco_atual), versao=F('versao') + 1)
+    recalcular_totais(propostas, versionar=False)
+    return total, len(propostas)
+
+
+def reajustar(precos=None, *, categorias=None, percentual=None, propostas=False, simular=False):
+    """
+    Aplica ``precos`` ({produto_id: preço}) ou ``percentual`` aos produtos das
+    ``categorias``; com ``propostas``, também aos itens de propostas abertas.
+    """
+    if precos is None and percentual is None:
+        raise ValueError("Informe os preços ou o percentual.")
+    with transaction.atomic():
+        if precos is not None:
+            alvo = Produto.objects.filter(pk__in=list(precos))
+        else:
+            alvo = Produto.objects.filter(categoria__in=categorias)
+        antes = {pk: (nome, preco) for pk, nome, preco in alvo.values_list('pk', 'nome', 'preco')}
+        alvo = _aplicar_tabela(precos) if precos is not None else _aplicar_percentual(categorias, percentual)
+        diferencas = [
+            (pk, antes[pk][0], antes[pk][1], depois)
+            for pk, depois in alvo.order_by('nome').values_list('pk', 'preco')
+            if depois != antes[pk][1]
+        ]
+        itens = n_propostas = 0
+        if propostas and diferencas:
+            itens, n_propostas = _propagar([d[0] for d in diferencas])
+        if simular:
+            transaction.set_rollback(True)
+    return Reajuste(diferencas, itens, n_propostas)
@@ -0,0 +1,80 @@
+# camarim/services/propostas.py
+"""
+Totais gravados de `Proposta` (``subtotal`` e ``total``, indexados).
+
+Os sinais de ItemProposta/Proposta chamam ``recalcular_totais`` na mesma
+transação da alteração; operações em massa (bulk_create, UPDATE em lote)
+chamam diretamente com os ids afetados.
+
+``gerar_proposta`` monta uma proposta inteira a partir das alocações
+(EstoqueSala) de um evento.
+"""
+from django.db import transaction
+from django.db.models import Sum
+
+from camarim.models import EstoqueSala, ItemProposta, Proposta
+from camarim.services import estatisticas
+
+LOTE = 500
+
+
+def _soma_totais(ids):
+    return Proposta.objects.filter(pk__in=ids).aggregate(t=Sum('total'))['t'] or 0
+
+
+@transaction.atomic
+def recalcular_totais(proposta_ids, *, versionar=True):
+    """
+    Regrava os totais das propostas a partir dos itens e leva a diferença ao
+    valor total do painel. ``versionar=False`` quando quem chama já subiu a
+    versão da proposta (o formulário de edição).
+    """
+    ids = sorted(set(proposta_ids))
+    for inicio in range(0, len(ids), LOTE):
+        lote = ids[inicio:inicio + LOTE]
+        # trava em ordem de pk para que dois recálculos não se cruzem
+        antes = sum(
+            Proposta.objects.select_for_update().filter(pk__in=lote).order_by('pk')
+                    .values_list('total', flat=True)
+        )
+        Proposta.objects.filter(pk__in=lote).gravar_totais(versionar)
+        estatisticas.somar(valor_total_propostas=_soma_totais(lote) - antes)
+    return len(ids)
+
+
+def recalcular_todas(lote=LOTE):
+    """Backfill: recalcula os totais de todas as propostas, lote a lote."""
+    ids = list(Proposta.objects.order_by('pk').values_list('pk', flat=True))
+    for inicio in range(0, len(ids), lote):
+        recalcular_totais(ids[inicio:inicio + lote], versionar=False)
+    return len(ids)
+
+
+@transaction.atomic
+def gerar_proposta(evento, *, impostos=0):
+    """
+    Cria a proposta do evento com um item por (sala, produto) alocado, ao
+    preço de tabela do produto: uma consulta com junção para ler as
+    alocações e os preços e um bulk_create para os itens.
+    """
+    alocacoes = (
+        EstoqueSala.objects
+                   .filter(sala__evento=evento, quantidade__gt=0)
+                   .order_by('sala__nome', 'produto__nome')
+                   .values_list('sala_id', 'produto_id', 'quantidade', 'produto__preco')
+    )
+    proposta = Proposta.objects.create(evento=evento, impostos=impostos)
+    # bulk_create não dispara os sinais: os totais são gravados no fim
+    ItemProposta.objects.bulk_create(
+        (
+            ItemProposta(
+                proposta=proposta, sala_id=sala_id, produto_id=produto_id,
+                quantidade=quantidade, preco_unitario=preco,
+            )
+            for sala_id, produto_id, quantidade, preco in alocacoes.iterator()
+        ),
+        batch_size=LOTE,
+    )
+    recalcular_totais([proposta.pk], versionar=False)
+    proposta.refresh_from_db(fields=['subtotal', 'total', 'atualizado_em'])
+    return proposta
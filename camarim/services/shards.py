@@ -0,0 +1,108 @@
+# camarim/services/shards.py
+"""
+Parcelas (`EstoqueShard`) do Estoque geral de produtos muito disputados.
+
+Água, copos e toalhas são alocados por várias salas ao mesmo tempo na
+montagem de um evento; com uma única linha de Estoque todas essas escritas
+fazem fila no mesmo lock. Com ``Produto.shards = N`` cada débito/crédito cai
+numa das N parcelas, sorteada, e o saldo geral passa a ser
+``Estoque.quantidade + soma das parcelas``.
+
+Aqui ficam só as operações de baixo nível; ligar, desligar e consolidar as
+parcelas (que mexem também no Estoque e nos contadores) estão em
+services.estoque.
+"""
+import random
+from functools import reduce
+from operator import or_
+
+from django.db.models import BigIntegerField, Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from camarim.models import EstoqueShard, Produto
+
+LOTE = 500
+
+
+def de(produto_ids):
+    """``{produto_id: número de parcelas}`` só dos produtos repartidos."""
+    return dict(
+        Produto.objects.filter(pk__in=produto_ids, shards__gt=0).values_list('pk', 'shards')
+    )
+
+
+def soma(ref='pk'):
+    """Expressão com a soma das parcelas do produto ``OuterRef(ref)`` (0 se não houver)."""
+    parcelas = EstoqueShard.objects.filter(produto=OuterRef(ref)).order_by() \
+                           .values('produto').annotate(t=Sum('quantidade')).values('t')
+    return Coalesce(Subquery(parcelas), Value(0), output_field=BigIntegerField())
+
+
+def somas(produto_ids, travar=False):
+    """``{produto_id: soma das parcelas}``; ``travar`` faz SELECT ... FOR UPDATE."""
+    qs = EstoqueShard.objects.filter(produto_id__in=produto_ids).order_by('produto_id', 'indice')
+    if travar:
+        qs = qs.select_for_update()
+    total = {}
+    for produto_id, quantidade in qs.values_list('produto_id', 'quantidade'):
+        total[produto_id] = total.get(produto_id, 0) + quantidade
+    return total
+
+
+def debitar(produto_id, shards, quantidade):
+    """
+    Debita (ou credita, se negativo) uma parcela sorteada. Retorna ``False``
+    se a parcela não existe (repartição desligada no meio do caminho).
+    """
+    return bool(
+        EstoqueShard.objects.filter(produto_id=produto_id, indice=random.randrange(shards))
+                    .update(quantidade=F('quantidade') - quantidade)
+    )
+
+
+def debitar_em_lote(totais, shards):
+    """
+    Como ``debitar`` para vários produtos, com um UPDATE ... CASE por lote.
+    Retorna o conjunto de produtos que foram de fato debitados.
+    """
+    produto_ids = sorted(pid for pid, qtd in totais.items() if qtd)
+    feitos = set()
+    for inicio in range(0, len(produto_ids), LOTE):
+        lote = produto_ids[inicio:inicio + LOTE]
+        filtro = reduce(or_, (
+            Q(produto_id=pid, indice=random.randrange(shards[pid])) for pid in lote
+        ))
+        delta = Case(
+            *[When(produto_id=pid, then=Value(totais[pid])) for pid in lote],
+            default=Value(0),
+            output_field=BigIntegerField(),
+        )
+        alterados = EstoqueShard.objects.filter(filtro).update(quantidade=F('quantidade') - delta)
+        if alterados == len(lote):
+            feitos.update(lote)
+        else:
+            feitos.update(
+                EstoqueShard.objects.filter(filtro).values_list('produto_id', flat=True)
+            )
+    return feitos
+
+
+def com_saldo(produtos=None):
+    """Ids dos produtos com alguma parcela não zerada."""
+    qs = EstoqueShard.objects.exclude(quantidade=0)
+    if produtos is not None:
+        qs = qs.filter(produto_id__in=[getattr(p, 'pk', p) for p in produtos])
+    return qs.order_by('produto_id').values_list('produto_id', flat=True).distinct()
+
+
+def zerar(produto_ids):
+    EstoqueShard.objects.filter(produto_id__in=produto_ids).exclude(quantidade=0).update(quantidade=0)
+
+
+def recriar(produto_id, shards):
+    """Deixa exatamente as parcelas 0..shards-1 do produto (devem estar zeradas)."""
+    EstoqueShard.objects.filter(produto_id=produto_id, indice__gte=shards).delete()
+    EstoqueShard.objects.bulk_create(
+        [EstoqueShard(produto_id=produto_id, indice=i) for i in range(shards)],
+        ignore_conflicts=True,
+    )
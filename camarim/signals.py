@@ -0,0 +1,154 @@
+# camarim/signals.py
+"""
+Manutenção incremental das estatísticas do painel (services.estatisticas),
+dos totais gravados das propostas (services.propostas) e dos índices de
+busca dos produtos (services.busca e services.autocompletar).
+
+Cada save/delete aplica só o seu delta na linha de `EstatisticasDashboard`.
+No ``pre_save`` de uma alteração guardamos na instância os valores antigos
+que o ``post_save`` precisa para calcular a diferença. Conectado em
+``CamarimConfig.ready``.
+"""
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from camarim.models import Categoria, Evento, ItemProposta, Produto, Proposta, Sala
+from camarim.services import autocompletar, busca, estatisticas, propostas
+
+CONTADORES = {
+    Evento: 'total_eventos',
+    Sala: 'total_salas',
+    Proposta: 'total_propostas',
+    Categoria: 'total_categorias',
+    Produto: 'total_produtos',
+}
+
+
+def _somar_categoria(categoria_id, delta):
+    if categoria_id:
+        Categoria.objects.filter(pk=categoria_id).update(total_produtos=F('total_produtos') + delta)
+
+
+def contar_criacao(sender, instance, created, raw=False, **kwargs):
+    if created:
+        estatisticas.somar(**{CONTADORES[sender]: 1})
+
+
+def contar_exclusao(sender, instance, **kwargs):
+    estatisticas.somar(**{CONTADORES[sender]: -1})
+
+
+for modelo in CONTADORES:
+    post_save.connect(contar_criacao, sender=modelo, dispatch_uid=f'estatisticas_criacao_{modelo.__name__}')
+    post_delete.connect(contar_exclusao, sender=modelo, dispatch_uid=f'estatisticas_exclusao_{modelo.__name__}')
+
+
+# — Produtos por categoria e versão dos nomes (services.autocompletar) —
+
+@receiver(pre_save, sender=Produto)
+def produto_antes(sender, instance, **kwargs):
+    instance._categoria_antes = instance._nome_antes = None
+    if not instance._state.adding:
+        instance._categoria_antes, instance._nome_antes = (
+            Produto.objects.filter(pk=instance.pk).values_list('categoria_id', 'nome').first()
+            or (None, None)
+        )
+
+
+@receiver(post_save, sender=Produto)
+def produto_depois(sender, instance, created, **kwargs):
+    antes = getattr(instance, '_categoria_antes', None)
+    if antes != instance.categoria_id:
+        _somar_categoria(antes, -1)
+        _somar_categoria(instance.categoria_id, 1)
+    if created or getattr(instance, '_nome_antes', None) != instance.nome:
+        autocompletar.invalidar()
+
+
+@receiver(post_delete, sender=Produto)
+def produto_excluido(sender, instance, **kwargs):
+    _somar_categoria(instance.categoria_id, -1)
+    autocompletar.invalidar()
+
+
+# — Índice de busca (services.busca); a exclusão do produto leva a entrada junto —
+
+@receiver(post_save, sender=Produto)
+def produto_indexar(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or busca.CAMPOS & set(update_fields):
+        busca.indexar([instance.pk])
+
+
+@receiver(post_save, sender=Categoria)
+def categoria_indexar(sender, instance, created, **kwargs):
+    # o nome da categoria faz parte do texto indexado dos produtos
+    if not created:
+        busca.indexar(instance.produtos.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Categoria)
+def categoria_antes_de_excluir(sender, instance, **kwargs):
+    instance._produtos_indexados = list(instance.produtos.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Categoria)
+def categoria_excluida(sender, instance, **kwargs):
+    # os produtos ficaram sem categoria (SET_NULL, sem sinais)
+    busca.indexar(getattr(instance, '_produtos_indexados', []))
+
+
+# — Totais gravados das propostas (services.propostas) —
+
+def _apaga_a_proposta(origem):
+    """A exclusão veio da própria proposta (ou do evento dela), não de um item."""
+    modelo = origem.model if isinstance(origem, QuerySet) else type(origem)
+    return modelo in (Proposta, Evento)
+
+
+@receiver(pre_save, sender=Proposta)
+def proposta_antes(sender, instance, **kwargs):
+    instance._impostos_antes = None
+    if not instance._state.adding:
+        instance._impostos_antes = (
+            Proposta.objects.filter(pk=instance.pk).values_list('impostos', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Proposta)
+def proposta_depois(sender, instance, created, **kwargs):
+    antes = getattr(instance, '_impostos_antes', None)
+    if not created and antes is not None and antes != instance.impostos:
+        # a versão é da gravação da própria proposta
+        propostas.recalcular_totais([instance.pk], versionar=False)
+        instance.refresh_from_db(fields=['subtotal', 'total', 'atualizado_em'])
+
+
+@receiver(pre_delete, sender=Proposta)
+def proposta_antes_de_excluir(sender, instance, **kwargs):
+    # o total da instância pode estar velho; o gravado é o que está no painel
+    instance._total_gravado = (
+        Proposta.objects.filter(pk=instance.pk).values_list('total', flat=True).first() or 0
+    )
+
+
+@receiver(post_delete, sender=Proposta)
+def proposta_excluida(sender, instance, **kwargs):
+    # os itens saem antes sem recalcular (ver item_excluido)
+    estatisticas.somar(valor_total_propostas=-getattr(instance, '_total_gravado', instance.total))
+
+
+# Os itens têm versão própria: gravá-los não sobe a versão da proposta (o que
+# derrubaria uma edição aberta dela à toa).
+
+@receiver(post_save, sender=ItemProposta)
+def item_depois(sender, instance, **kwargs):
+    # o formset marca os itens e recalcula uma vez no fim
+    if not getattr(instance, '_totais_adiados', False):
+        propostas.recalcular_totais([instance.proposta_id], versionar=False)
+
+
+@receiver(post_delete, sender=ItemProposta)
+def item_excluido(sender, instance, origin=None, **kwargs):
+    if not _apaga_a_proposta(origin):
+        propostas.recalcular_totais([instance.proposta_id], versionar=False)
@@ -28,6 +28,12 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Responsividade da sidebar
     setupSidebarToggle();
+    
+    // Selects preenchidos por busca (ex.: produto nos itens da proposta)
+    setupAsyncSelects();
+    
+    // Documentos gerados em segundo plano (PDF/XLSX da proposta)
+    setupDocumentLinks();
 });
 
 // Marcar link ativo na sidebar
@@ -85,6 +91,71 @@ function setupTableSearch() {
     }
 }
 
+// Selects assíncronos: o servidor manda só a opção escolhida; um campo de
+// busca antes do select troca as opções pelos resultados de data-busca-url
+function setupAsyncSelects() {
+    document.querySelectorAll('select[data-busca-url]').forEach(select => {
+        const busca = document.createElement('input');
+        busca.type = 'search';
+        busca.placeholder = 'Buscar...';
+        busca.className = 'form-control form-control-sm mb-1';
+        select.parentNode.insertBefore(busca, select);
+        
+        let timer = null;
+        busca.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(() => {
+                const url = select.dataset.buscaUrl + '?q=' + encodeURIComponent(busca.value);
+                fetch(url, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+                    .then(resposta => resposta.json())
+                    .then(dados => {
+                        const atual = select.options[select.selectedIndex];
+                        select.innerHTML = '';
+                        if (atual) select.appendChild(atual);
+                        dados.resultados.forEach(produto => {
+                            if (atual && String(produto.id) === atual.value) return;
+                            const rotulo = produto.estoque === undefined
+                                ? produto.nome : `${produto.nome} (${produto.estoque} disponíveis)`;
+                            select.appendChild(new Option(rotulo, produto.id));
+                        });
+                    });
+            }, 250);
+        });
+    });
+}
+
+// Links de documento: consulta o andamento até o arquivo ficar pronto e
+// então baixa pelo mesmo endereço
+function setupDocumentLinks() {
+    document.querySelectorAll('a[data-documento]').forEach(link => {
+        link.addEventListener('click', function(e) {
+            e.preventDefault();
+            const texto = link.textContent;
+            link.classList.add('disabled');
+            link.textContent = 'Gerando...';
+            
+            const consultar = () => {
+                fetch(link.href, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+                    .then(resposta => resposta.json())
+                    .then(dados => {
+                        if (dados.pronto) {
+                            link.classList.remove('disabled');
+                            link.textContent = texto;
+                            window.location = link.href;
+                        } else if (dados.status === 'erro') {
+                            link.classList.remove('disabled');
+                            link.textContent = texto;
+                            alert('Não foi possível gerar o documento: ' + dados.erro);
+                        } else {
+                            setTimeout(consultar, 1500);
+                        }
+                    });
+            };
+            consultar();
+        });
+    });
+}
+
 // Toggle da sidebar em dispositivos móveis
 function setupSidebarToggle() {
     const sidebarToggle = document.getElementById('sidebar-toggle');
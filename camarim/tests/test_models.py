@@ -12,3 +12,72 @@ def test_sala_relacionada_ao_evento():
     sala = Sala.objects.create(evento=ev, nome="Sala A")
     assert sala.evento == ev
     assert "Sala A" in str(sala)
+
+
+@pytest.mark.django_db
+def test_proposta_totais_gravados_conferem_com_with_totals():
+    from decimal import Decimal
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from camarim.models import Evento, Sala, Produto, Proposta, ItemProposta
+    from camarim.services import estatisticas
+    ev = Evento.objects.create(nome="EV")
+    sala = Sala.objects.create(evento=ev, nome="Sala A")
+    prod = Produto.objects.create(nome="Água", preco=2)
+    for impostos in ("10", "7.5", "0"):
+        prop = Proposta.objects.create(evento=ev, impostos=Decimal(impostos))
+        ItemProposta.objects.create(proposta=prop, sala=sala, produto=prod, quantidade=3, preco_unitario=Decimal("3.35"))
+        ItemProposta.objects.create(proposta=prop, sala=sala, produto=prod, quantidade=1, preco_unitario=Decimal("0.99"))
+    Proposta.objects.create(evento=ev, impostos=5)      # sem itens
+
+    gravados = [(p.subtotal, p.total_impostos, p.total) for p in Proposta.objects.order_by("pk")]
+    assert gravados[0] == (Decimal("11.04"), Decimal("1.10"), Decimal("12.14"))
+    assert gravados[1][1] == Decimal("0.83")            # 0.828 arredonda para cima
+    with CaptureQueriesContext(connection) as consultas:
+        calculados = [(p.valor_subtotal, p.valor_impostos, p.valor_total)
+                      for p in Proposta.objects.with_totals().order_by("pk")]
+    assert calculados == gravados
+    assert len(consultas) == 1
+
+    assert Proposta.objects.filter(total__gte=Decimal("12")).count() == 1
+    prop = Proposta.objects.order_by("pk").first()
+    prop.impostos = 0
+    prop.save()
+    assert prop.total == Decimal("11.04")
+    ItemProposta.objects.filter(proposta=prop).first().delete()
+    prop.delete()
+    assert estatisticas.atual().valor_total_propostas == sum(p.total for p in Proposta.objects.all())
+
+
+@pytest.mark.django_db
+def test_proposta_subtotais_por_sala_e_categoria():
+    from decimal import Decimal
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from camarim.models import Categoria, Produto, Proposta, ItemProposta
+    ev = Evento.objects.create(nome="EV")
+    palco = Sala.objects.create(evento=ev, nome="Palco")
+    camarim = Sala.objects.create(evento=ev, nome="Camarim")
+    bebidas = Categoria.objects.create(nome="Bebidas")
+    agua = Produto.objects.create(nome="Água", preco=2, categoria=bebidas)
+    toalha = Produto.objects.create(nome="Toalha", preco=5)
+    prop = Proposta.objects.create(evento=ev, impostos=Decimal("7.5"))
+    for sala, produto, quantidade, preco in [
+        (palco, agua, 3, "3.35"), (palco, toalha, 1, "0.99"), (camarim, agua, 2, "1.11"),
+    ]:
+        ItemProposta.objects.create(proposta=prop, sala=sala, produto=produto,
+                                    quantidade=quantidade, preco_unitario=Decimal(preco))
+    prop.refresh_from_db()
+
+    with CaptureQueriesContext(connection) as consultas:
+        por_sala = prop.subtotais("sala")
+    assert len(consultas) == 1
+    assert [(l["nome"], l["itens"], l["unidades"], l["subtotal"]) for l in por_sala] == [
+        ("Camarim", 1, 2, Decimal("2.22")), ("Palco", 2, 4, Decimal("11.04")),
+    ]
+    por_categoria = prop.subtotais("categoria")
+    assert [l["nome"] for l in por_categoria] == [None, "Bebidas"]
+    for linhas in (por_sala, por_categoria):
+        assert sum(l["subtotal"] for l in linhas) == prop.subtotal
+        assert sum(l["impostos"] for l in linhas) == prop.total_impostos
+        assert sum(l["percentual"] for l in linhas) == pytest.approx(Decimal(100), abs=Decimal("0.02"))
@@ -0,0 +1,607 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from camarim.models import Evento, Sala, Produto, Estoque, EstoqueSala, Proposta
+from camarim.services.estoque import (
+    EstoqueInsuficiente, transferir, devolver, ajustar_alocacao, desalocar,
+    replicar_salas,
+)
+
+
+@pytest.fixture
+def sala():
+    ev = Evento.objects.create(nome="EV")
+    return Sala.objects.create(evento=ev, nome="Sala A")
+
+
+@pytest.fixture
+def produto():
+    prod = Produto.objects.create(nome="Água", preco=2)
+    Estoque.objects.create(produto=prod, quantidade=10)
+    return prod
+
+
+@pytest.mark.django_db
+def test_transferir_debita_geral_e_credita_sala(sala, produto):
+    saldos = transferir(produto, sala, 4)
+    assert saldos == (6, 4)
+    saldos = transferir(produto, sala, 3)
+    assert saldos == (3, 7)
+    assert EstoqueSala.objects.get(sala=sala, produto=produto).quantidade == 7
+
+
+@pytest.mark.django_db
+def test_transferir_permite_negativo_por_padrao(sala, produto):
+    assert transferir(produto, sala, 15).geral == -5
+
+
+@pytest.mark.django_db
+def test_transferir_bloqueia_negativo(sala, produto):
+    with pytest.raises(EstoqueInsuficiente):
+        transferir(produto, sala, 15, bloquear_negativo=True)
+    assert Estoque.objects.get(produto=produto).quantidade == 10
+    assert not EstoqueSala.objects.filter(sala=sala).exists()
+
+
+@pytest.mark.django_db
+def test_devolver_sem_alocacao_desfaz_tudo(sala, produto):
+    with pytest.raises(EstoqueInsuficiente):
+        devolver(produto, sala, 2)
+    assert Estoque.objects.get(produto=produto).quantidade == 10
+
+
+@pytest.mark.django_db
+def test_ajustar_alocacao_troca_de_produto(sala, produto):
+    outro = Produto.objects.create(nome="Copo", preco=1)
+    Estoque.objects.create(produto=outro, quantidade=5)
+    transferir(produto, sala, 4)
+    ajustar_alocacao(sala, produto.pk, 4, outro, 2)
+    assert Estoque.objects.get(produto=produto).quantidade == 10
+    assert Estoque.objects.get(produto=outro).quantidade == 3
+    assert list(EstoqueSala.objects.values_list('produto_id', 'quantidade')) == [(outro.pk, 2)]
+
+
+@pytest.mark.django_db
+def test_desalocar_devolve_ao_geral(sala, produto):
+    transferir(produto, sala, 4)
+    item = EstoqueSala.objects.get(sala=sala, produto=produto)
+    assert desalocar(item) == (10, 0)
+    assert not EstoqueSala.objects.exists()
+
+
+@pytest.mark.django_db
+def test_replicar_debita_estoque_geral(sala, produto):
+    transferir(produto, sala, 4)
+    destino = Evento.objects.create(nome="EV2")
+    nova = sala.replicar(destino)
+    assert nova.evento == destino
+    assert EstoqueSala.objects.get(sala=nova).quantidade == 4
+    assert Estoque.objects.get(produto=produto).quantidade == 2
+
+
+def _sala_com_itens(evento, quantidade_itens):
+    sala = Sala.objects.create(evento=evento, nome=f"Sala {quantidade_itens}")
+    produtos = Produto.objects.bulk_create(
+        Produto(nome=f"P{i}", preco=1) for i in range(quantidade_itens)
+    )
+    Estoque.objects.bulk_create(Estoque(produto=p, quantidade=100) for p in produtos)
+    EstoqueSala.objects.bulk_create(
+        EstoqueSala(sala=sala, produto=p, quantidade=2) for p in produtos
+    )
+    return sala
+
+
+def _lotes_de_insert(modelo, quantidade):
+    """INSERTs que o bulk_create faz para ``quantidade`` linhas neste banco."""
+    from math import ceil
+    from camarim.services.estoque import LOTE
+    campos = [f for f in modelo._meta.concrete_fields if not f.primary_key]
+    tamanho = min(LOTE, connection.ops.bulk_batch_size(campos, [None] * quantidade))
+    return ceil(quantidade / tamanho)
+
+
+@pytest.mark.django_db
+def test_replicar_numero_de_consultas_independe_dos_itens():
+    """Benchmark: clonar 5 ou 250 itens custa o mesmo número de consultas."""
+    from camarim.models import MovimentoEstoque
+    origem = Evento.objects.create(nome="Origem")
+    destino = Evento.objects.create(nome="Destino")
+    consultas = []
+    for tamanho in (5, 250):
+        sala = _sala_com_itens(origem, tamanho)
+        with CaptureQueriesContext(connection) as ctx:
+            replicar_salas([sala], [destino])
+        consultas.append(len(ctx.captured_queries))
+    # só os INSERTs em massa crescem, e só quando o banco limita os
+    # parâmetros por consulta (SQLite: 999); no MySQL a diferença é zero
+    lotes_extras = sum(_lotes_de_insert(m, 250) - 1 for m in (EstoqueSala, MovimentoEstoque))
+    assert consultas[1] - consultas[0] == lotes_extras
+
+
+@pytest.mark.django_db
+def test_replicar_salas_para_varios_eventos(sala, produto):
+    transferir(produto, sala, 2)
+    outra = Sala.objects.create(evento=sala.evento, nome="Sala B")
+    transferir(produto, outra, 1)
+    destinos = [Evento.objects.create(nome=f"D{i}") for i in range(3)]
+
+    novas = replicar_salas([sala, outra], destinos)
+    assert len(novas) == 6
+    assert EstoqueSala.objects.filter(sala__evento__in=destinos).count() == 6
+    # 10 - 3 alocados na origem - 3 eventos x 3 unidades
+    assert Estoque.objects.get(produto=produto).quantidade == -2
+
+
+@pytest.mark.django_db
+def test_transferencias_gravam_movimentos(sala, produto):
+    from camarim.models import MovimentoEstoque
+    transferir(produto, sala, 4)
+    devolver(produto, sala, 1)
+    tipos = list(MovimentoEstoque.objects.order_by('pk').values_list('tipo', 'delta'))
+    assert tipos == [(MovimentoEstoque.ALOCACAO, 4), (MovimentoEstoque.DEVOLUCAO, 1)]
+
+
+@pytest.mark.django_db
+def test_saldo_por_data_com_compactacao(sala, produto):
+    from datetime import timedelta
+    from django.utils import timezone
+    from camarim.services.estoque import definir_estoque
+    from camarim.services.movimentos import saldo, compactar, alocado_por_evento
+
+    Estoque.objects.filter(produto=produto).delete()
+    definir_estoque(produto, 10)          # sem histórico anterior: ajuste de +10
+    transferir(produto, sala, 4)
+    antes = timezone.now()
+    assert compactar() == 2
+    transferir(produto, sala, 1)
+
+    assert saldo(produto) == 5
+    assert saldo(produto, sala) == 5
+    assert saldo(produto, em=antes) == 6
+    assert saldo(produto, sala, em=antes - timedelta(days=1)) == 0
+    assert alocado_por_evento(sala.evento) == {produto.pk: 5}
+
+
+@pytest.mark.django_db
+def test_contadores_acompanham_transferencias(sala, produto):
+    from camarim.services import contadores
+    from camarim.services.estoque import entrada_estoque
+
+    contadores.reconstruir()
+    entrada_estoque(produto, 5)
+    transferir(produto, sala, 4)
+    produto.refresh_from_db()
+    assert (produto.estoque_disponivel, produto.estoque_alocado, produto.estoque_total) == (11, 4, 15)
+    assert not contadores.divergentes().exists()
+
+    Estoque.objects.filter(produto=produto).update(quantidade=0)
+    assert list(contadores.divergentes().values_list('pk', flat=True)) == [produto.pk]
+    contadores.reconstruir()
+    produto.refresh_from_db()
+    assert produto.estoque_total == 4
+
+
+@pytest.mark.django_db
+def test_disponibilidade_considera_eventos_sobrepostos(produto):
+    from datetime import date
+    from camarim.services import contadores
+    from camarim.services.disponibilidade import disponibilidade, faltas
+
+    def evento_em(nome, ini, fim):
+        ev = Evento.objects.create(nome=nome, data_inicial=ini, data_final=fim)
+        return Sala.objects.create(evento=ev, nome="S")
+
+    contadores.reconstruir()
+    a = evento_em("A", date(2025, 3, 1), date(2025, 3, 5))
+    b = evento_em("B", date(2025, 3, 4), date(2025, 3, 8))
+    c = evento_em("C", date(2025, 3, 6), date(2025, 3, 9))
+    transferir(produto, a, 4)
+    transferir(produto, b, 3)
+    transferir(produto, c, 2)
+
+    assert disponibilidade(date(2025, 3, 1), date(2025, 3, 3))[produto.pk] == 6
+    # A e B juntos nos dias 4 e 5; B e C juntos depois
+    assert disponibilidade(date(2025, 3, 1), date(2025, 3, 9))[produto.pk] == 3
+    assert disponibilidade(date(2025, 3, 10), date(2025, 3, 12))[produto.pk] == 10
+    # nas datas de C (6 a 9) B e C ocupam 5 unidades
+    assert faltas(c.evento, {produto.pk: 5}) == {}
+    assert faltas(c.evento, {produto.pk: 6}) == {produto.pk: (6, 5)}
+
+
+@pytest.mark.django_db
+def test_alocar_em_lote_soma_e_cria_linhas(sala, produto):
+    from camarim.services.estoque import alocar_em_lote
+
+    outro = Produto.objects.create(nome="Copo", preco=1)
+    Estoque.objects.create(produto=outro, quantidade=5)
+    transferir(produto, sala, 1)
+
+    saldos = alocar_em_lote(sala, {produto: 2, outro.pk: 5})
+    assert saldos == {produto.pk: (7, 3), outro.pk: (0, 5)}
+    with pytest.raises(EstoqueInsuficiente):
+        alocar_em_lote(sala, {produto: 1, outro: 1}, bloquear_negativo=True)
+    assert Estoque.objects.get(produto=produto).quantidade == 7
+
+
+@pytest.mark.django_db
+def test_encerrar_evento_devolve_tudo_e_registra_perdas(sala, produto):
+    from camarim.models import MovimentoEstoque
+    from camarim.services import contadores
+
+    contadores.reconstruir()
+    outra = Sala.objects.create(evento=sala.evento, nome="Sala B")
+    transferir(produto, sala, 4)
+    transferir(produto, outra, 3)
+    item = EstoqueSala.objects.get(sala=outra)
+
+    resultado = sala.evento.encerrar({item.pk: 1})
+    assert resultado == (2, 5, 2)
+    assert not EstoqueSala.objects.exists()
+    assert Estoque.objects.get(produto=produto).quantidade == 8
+    assert MovimentoEstoque.objects.filter(tipo=MovimentoEstoque.BAIXA).get().delta == 2
+    assert not contadores.divergentes().exists()
+    sala.evento.refresh_from_db()
+    assert sala.evento.arquivado and sala.evento.encerrado_em
+
+
+@pytest.mark.django_db
+def test_encerrar_evento_trava_o_geral_antes_e_nao_registra_devolucao_zerada(sala, produto, monkeypatch):
+    from camarim.models import MovimentoEstoque
+    from camarim.services import estoque
+
+    outro = Produto.objects.create(nome="Copo", preco=1)
+    Estoque.objects.create(produto=outro, quantidade=5)
+    transferir(outro, sala, 2)
+    transferir(produto, sala, 4)
+    perdido = EstoqueSala.objects.get(produto=outro)
+
+    travados = []
+    travar_geral = estoque._travar_geral
+    monkeypatch.setattr(estoque, "_travar_geral",
+                        lambda ids: travados.append(list(ids)) or travar_geral(ids))
+    assert sala.evento.encerrar({perdido.pk: 0}) == (2, 4, 2)
+    assert travados == [sorted([produto.pk, outro.pk])]
+    assert not MovimentoEstoque.objects.filter(tipo=MovimentoEstoque.DEVOLUCAO, produto=outro).exists()
+    assert MovimentoEstoque.objects.get(tipo=MovimentoEstoque.BAIXA).produto_id == outro.pk
+
+
+@pytest.mark.django_db
+def test_encerrar_evento_numero_de_consultas_independe_das_salas():
+    consultas = []
+    for tamanho in (2, 20):
+        evento = Evento.objects.create(nome=f"E{tamanho}")
+        for i in range(tamanho):
+            _sala_com_itens(evento, 3)
+        with CaptureQueriesContext(connection) as ctx:
+            evento.encerrar()
+        consultas.append(len(ctx.captured_queries))
+    assert consultas[0] == consultas[1]
+
+
+@pytest.mark.django_db
+def test_reconcile_stock_relata_e_corrige(sala, produto, tmp_path):
+    import json
+    from django.core.management import call_command
+    from camarim.services import conciliacao, contadores
+
+    contadores.reconstruir()
+    Estoque.objects.filter(produto=produto).update(quantidade=-3)
+    sem_linha = Produto.objects.create(nome="Copo", preco=1)
+
+    saida = tmp_path / "relatorio.ndjson"
+    call_command('reconcile_stock', formato='ndjson', saida=str(saida), aplicar=True)
+    tipos = {json.loads(l)['tipo'] for l in saida.read_text().splitlines()}
+    assert tipos == {conciliacao.SEM_ESTOQUE, conciliacao.CONTADOR}
+
+    # o saldo geral é mantido; só os contadores passam a refleti-lo
+    assert Estoque.objects.get(produto=produto).quantidade == -3
+    assert Estoque.objects.get(produto=sem_linha).quantidade == 0
+    assert not list(conciliacao.problemas())
+
+
+@pytest.mark.django_db
+def test_reconcile_stock_sem_aplicar_nao_grava(sala, produto, tmp_path):
+    import json
+    from django.core.management import call_command
+    from camarim.models import EstoqueShard
+    from camarim.services import conciliacao, contadores
+    from camarim.services.estoque import ativar_shards
+
+    contadores.reconstruir()
+    ativar_shards(produto, 2)
+    transferir(produto, sala, 12)             # vai para uma parcela: geral -2
+    parcelas = list(EstoqueShard.objects.values_list('indice', 'quantidade'))
+
+    saida = tmp_path / "relatorio.ndjson"
+    call_command('reconcile_stock', formato='ndjson', saida=str(saida))
+    problemas = [json.loads(l) for l in saida.read_text().splitlines()]
+    # o pico aparece somando as parcelas; os contadores atrasados até a
+    # consolidação não são problema
+    assert [(p['tipo'], p['encontrado']) for p in problemas] == [
+        (conciliacao.SOBREALOCADO, 12),
+    ]
+    assert list(EstoqueShard.objects.values_list('indice', 'quantidade')) == parcelas
+    assert Estoque.objects.get(produto=produto).quantidade == 10
+
+
+@pytest.mark.django_db
+def test_reconcile_stock_aceita_geral_negativo_de_eventos_que_nao_se_cruzam(produto, tmp_path):
+    from datetime import date
+    from django.core.management import call_command
+    from camarim.models import MovimentoEstoque
+    from camarim.services import contadores
+
+    janeiro = Evento.objects.create(nome="Janeiro", data_inicial=date(2026, 1, 10),
+                                    data_final=date(2026, 1, 12))
+    fevereiro = Evento.objects.create(nome="Fevereiro", data_inicial=date(2026, 2, 10),
+                                      data_final=date(2026, 2, 12))
+    for evento in (janeiro, fevereiro):
+        transferir(produto, Sala.objects.create(evento=evento, nome="Sala"), 10)
+    contadores.reconstruir()
+    movimentos = MovimentoEstoque.objects.count()
+
+    saida = tmp_path / "relatorio.ndjson"
+    call_command('reconcile_stock', formato='ndjson', saida=str(saida), aplicar=True)
+    assert saida.read_text() == ""
+
+    assert Estoque.objects.get(produto=produto).quantidade == -10
+    assert MovimentoEstoque.objects.count() == movimentos
+    produto.refresh_from_db()
+    assert (produto.estoque_disponivel, produto.estoque_alocado, produto.estoque_total) == (-10, 20, 10)
+
+
+@pytest.mark.django_db
+def test_importacao_do_legado_acerta_contadores_e_movimentos(tmp_path, monkeypatch):
+    import json
+    from django.core.management import call_command
+    from camarim.models import MovimentoEstoque
+    from camarim.services import contadores
+
+    dados = [
+        {"model": "camarim.categoria", "fields": {"nome": "Bebidas"}},
+        {"model": "camarim.produto", "fields": {"nome": "Água", "preco": "2.00",
+                                                "categoria": "Bebidas", "quantidade": 40}},
+    ]
+    (tmp_path / "legacy_data_utf8.json").write_text(json.dumps(dados), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    call_command('import_full_legacy')
+
+    agua = Produto.objects.get(nome="Água")
+    assert Estoque.objects.get(produto=agua).quantidade == 40
+    assert (agua.estoque_disponivel, agua.estoque_total) == (40, 40)
+    assert MovimentoEstoque.objects.get(produto=agua).delta == 40
+    assert not contadores.divergentes().exists()
+
+
+@pytest.mark.django_db
+def test_estoque_unico_por_produto(produto):
+    from django.db import IntegrityError, transaction
+    from camarim.services.estoque import entrada_estoque
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Estoque.objects.create(produto=produto, quantidade=1)
+    entrada_estoque(produto, 5)
+    assert Produto.objects.select_related('estoque').get(pk=produto.pk).estoque.quantidade == 15
+
+
+@pytest.mark.django_db
+def test_shards_repartem_o_geral_e_consolidam(sala, produto):
+    from camarim.models import EstoqueShard
+    from camarim.services import contadores
+    from camarim.services.estoque import (
+        alocar_em_lote, ativar_shards, consolidar_shards, desativar_shards, saldos,
+    )
+
+    contadores.reconstruir()
+    ativar_shards(produto, 4)
+    transferir(produto, sala, 3)
+    alocar_em_lote(sala, {produto: 2})
+    # as escritas foram para as parcelas; a linha de Estoque não foi tocada
+    assert Estoque.objects.get(produto=produto).quantidade == 10
+    assert saldos(produto, sala) == (5, 5)
+    produto.refresh_from_db()
+    assert produto.estoque_disponivel == 10      # acertado só na consolidação
+    with pytest.raises(EstoqueInsuficiente):
+        transferir(produto, sala, 6, bloquear_negativo=True)
+
+    assert consolidar_shards() == 1
+    assert Estoque.objects.get(produto=produto).quantidade == 5
+    assert not contadores.divergentes().exists()
+
+    desativar_shards(produto)
+    assert not EstoqueShard.objects.exists()
+    assert transferir(produto, sala, 1) == (4, 6)
+
+
+@pytest.mark.django_db
+def test_ajustar_alocacao_confere_versao(sala, produto):
+    from camarim.models import ConflitoDeVersao
+
+    transferir(produto, sala, 4)
+    lida = EstoqueSala.objects.get(sala=sala).versao
+    transferir(produto, sala, 1)
+    with pytest.raises(ConflitoDeVersao):
+        ajustar_alocacao(sala, produto, 4, produto, 2, versao=lida)
+    assert EstoqueSala.objects.get(sala=sala).quantidade == 5
+    ajustar_alocacao(sala, produto, 5, produto, 2, versao=lida + 1)
+    assert EstoqueSala.objects.get(sala=sala).quantidade == 2
+
+
+@pytest.mark.django_db
+def test_gerar_proposta_das_alocacoes(produto):
+    from decimal import Decimal
+    from camarim.models import ItemProposta
+    from camarim.services.estatisticas import atual
+
+    def gerar(n_salas):
+        ev = Evento.objects.create(nome=f"EV{n_salas}")
+        for i in range(n_salas):
+            EstoqueSala.objects.create(sala=Sala.objects.create(evento=ev, nome=f"S{i}"),
+                                       produto=produto, quantidade=i + 1)
+        with CaptureQueriesContext(connection) as consultas:
+            proposta = ev.gerar_proposta(impostos=10)
+        return proposta, len(consultas)
+
+    proposta, poucas = gerar(2)
+    assert (proposta.subtotal, proposta.total) == (Decimal("6.00"), Decimal("6.60"))
+    assert [i.quantidade for i in proposta.itens.order_by("sala__nome")] == [1, 2]
+    _, muitas = gerar(30)
+    assert poucas == muitas
+    assert atual().valor_total_propostas == sum(p.total for p in Proposta.objects.all())
+
+    # preço padrão do produto quando o item é criado sem preço
+    item = ItemProposta.objects.create(proposta=proposta, sala=proposta.itens.first().sala,
+                                       produto=produto, quantidade=1, preco_unitario=0)
+    assert item.preco_unitario == Decimal("2.00")
+
+
+@pytest.mark.django_db
+def test_reajuste_de_precos_em_lote(tmp_path, sala, produto):
+    from decimal import Decimal
+    from django.core.management import call_command
+    from camarim.models import Categoria, ItemProposta
+
+    cat = Categoria.objects.create(nome="Bebidas")
+    suco = Produto.objects.create(nome="Suco", preco=5, categoria=cat)
+    aberta = Proposta.objects.create(evento=sala.evento)
+    aprovada = Proposta.objects.create(evento=sala.evento, status=Proposta.APROVADA)
+    for prop in (aberta, aprovada):
+        ItemProposta.objects.create(proposta=prop, sala=sala, produto=produto, quantidade=2, preco_unitario=2)
+    tabela = tmp_path / "precos.csv"
+    tabela.write_text(f"id;nome;preco\n{produto.pk};;3,50\n;Inexistente;1\n", encoding="utf-8")
+
+    call_command("reprecificar", arquivo=str(tabela), propostas=True)      # simulação
+    assert Produto.objects.get(pk=produto.pk).preco.amount == Decimal("2.00")
+
+    call_command("reprecificar", arquivo=str(tabela), propostas=True, aplicar=True)
+    assert Produto.objects.get(pk=produto.pk).preco.amount == Decimal("3.50")
+    assert Proposta.objects.get(pk=aberta.pk).total == Decimal("7.00")
+    assert Proposta.objects.get(pk=aprovada.pk).total == Decimal("4.00")
+
+    call_command("reprecificar", percentual=Decimal("10"), categoria=[cat.pk], aplicar=True)
+    assert Produto.objects.get(pk=suco.pk).preco.amount == Decimal("5.50")
+    assert Produto.objects.get(pk=produto.pk).preco.amount == Decimal("3.50")
+
+
+def test_precos_da_tabela_com_separador_de_milhar():
+    from decimal import Decimal
+    from camarim.services.precos import _decimal
+    assert _decimal("1.500") == Decimal("1500.00")
+    assert _decimal("R$ 1.234.567") == Decimal("1234567.00")
+    assert _decimal("1.500,00") == Decimal("1500.00")
+    assert _decimal("12.50") == Decimal("12.50")
+    assert _decimal("3,5") == Decimal("3.50")
+    # célula numérica do XLSX
+    assert _decimal(Decimal("1.500")) == Decimal("1.50")
+    assert _decimal(1.5) == Decimal("1.50")
+
+
+@pytest.mark.django_db
+def test_tabela_de_precos_invalida_aponta_a_linha(tmp_path):
+    from camarim.services.precos import TabelaInvalida, _decimal, ler_tabela
+    for valor in ("1,234.56", "1,234", "-5", -5):
+        with pytest.raises(TabelaInvalida):
+            _decimal(valor)
+
+    casos = {
+        "id;preco\n1;10\n2;1,234.56\n": "Linha 3: Preço fora do formato",
+        "id;preco\n1;10\nabc;5\n": "Linha 3: id inválido",
+        "id;preco\n1;-2\n": "Linha 2: Preço negativo",
+        "nada\n": "Linha 1:",
+    }
+    for conteudo, mensagem in casos.items():
+        tabela = tmp_path / "precos.csv"
+        tabela.write_text(conteudo, encoding="utf-8")
+        with pytest.raises(TabelaInvalida, match=mensagem):
+            ler_tabela(tabela)
+
+
+@pytest.mark.django_db
+def test_documento_da_proposta_por_revisao(sala, produto):
+    from camarim.models import DocumentoProposta, ItemProposta
+    from camarim.services import documentos
+    prop = Proposta.objects.create(evento=sala.evento)
+    item = ItemProposta.objects.create(proposta=prop, sala=sala, produto=produto, quantidade=2, preco_unitario=3)
+
+    doc = documentos.solicitar(prop, DocumentoProposta.XLSX)
+    assert documentos.solicitar(prop, DocumentoProposta.XLSX).pk == doc.pk
+
+    item.quantidade = 5
+    item.save()
+    prop.refresh_from_db()
+    novo = documentos.solicitar(prop, DocumentoProposta.XLSX)
+    assert novo.pk != doc.pk and novo.status == DocumentoProposta.PENDENTE
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("formato, pacote", [("xlsx", "openpyxl"), ("pdf", "xhtml2pdf")])
+def test_documento_da_proposta_gerado(tmp_path, settings, sala, produto, formato, pacote):
+    pytest.importorskip(pacote)
+    from camarim.models import DocumentoProposta, ItemProposta
+    from camarim.services import documentos
+    settings.MEDIA_ROOT = tmp_path
+    prop = Proposta.objects.create(evento=sala.evento)
+    ItemProposta.objects.create(proposta=prop, sala=sala, produto=produto, quantidade=2, preco_unitario=3)
+
+    doc = documentos.solicitar(prop, formato)
+    documentos.gerar(doc.pk)
+    doc.refresh_from_db()
+    assert doc.status == DocumentoProposta.PRONTO, doc.erro
+    assert doc.arquivo.size > 0
+    assert documentos.solicitar(prop, formato).pk == doc.pk
+
+
+@pytest.mark.django_db
+def test_documento_parado_e_reagendado(sala, produto, django_capture_on_commit_callbacks):
+    from django.utils import timezone
+    from camarim.models import DocumentoProposta
+    from camarim.services import documentos
+    prop = Proposta.objects.create(evento=sala.evento)
+
+    with django_capture_on_commit_callbacks() as agendados:
+        doc = documentos.solicitar(prop, DocumentoProposta.PDF)
+        # ainda dentro do prazo: está em andamento, não reagenda
+        assert documentos.solicitar(prop, DocumentoProposta.PDF).pk == doc.pk
+    assert len(agendados) == 1
+
+    # a thread morreu com o documento gerando
+    antes = timezone.now() - documentos.PRAZO * 2
+    DocumentoProposta.objects.filter(pk=doc.pk).update(
+        status=DocumentoProposta.GERANDO, atualizado_em=antes,
+    )
+    with django_capture_on_commit_callbacks() as agendados:
+        novo = documentos.solicitar(prop, DocumentoProposta.PDF)
+        documentos.solicitar(prop, DocumentoProposta.PDF)
+    assert novo.pk == doc.pk and novo.status == DocumentoProposta.PENDENTE
+    assert len(agendados) == 1
+    assert DocumentoProposta.objects.get(pk=doc.pk).atualizado_em > antes
+
+
+@pytest.mark.django_db
+def test_busca_textual_sem_acentos():
+    from camarim.models import Categoria
+    from camarim.services import busca
+    loucas = Categoria.objects.create(nome="LOUÇAS")
+    xicara = Produto.objects.create(nome="XÍCARA de Chá", preco=5, categoria=loucas)
+    pires = Produto.objects.create(nome="Pires", preco=3, categoria=loucas, descricao="acompanha a xicara")
+    Produto.objects.create(nome="Água Mineral", preco=2)
+
+    assert busca.normalizar("XÍCARA  de-Chá") == "xicara de cha"
+    # casar no nome pesa mais que na descrição; prefixo também casa
+    assert [p.pk for p in busca.buscar("xicara")] == [xicara.pk, pires.pk]
+    assert [p.pk for p in busca.buscar("Xíc chá")] == [xicara.pk]
+    assert set(busca.filtrar(Produto.objects.all(), "loucas").values_list("pk", flat=True)) == {xicara.pk, pires.pk}
+    assert not busca.buscar("   ")
+
+    # mantido pelos sinais: alteração do produto, da categoria e exclusões
+    pires.nome = "Pratinho"
+    pires.descricao = ""
+    pires.save()
+    assert [p.pk for p in busca.buscar("xicara")] == [xicara.pk]
+    loucas.nome = "Porcelana"
+    loucas.save()
+    assert {p.pk for p in busca.buscar("porcelana")} == {xicara.pk, pires.pk}
+    loucas.delete()
+    assert not busca.buscar("porcelana")
+    xicara.delete()
+    assert not busca.buscar("cha")
@@ -11,3 +11,559 @@ def test_evento_list_view(client, django_user_model):
     resp = client.get(url)
     assert resp.status_code == 200
     assert "eventos" in resp.context
+
+@pytest.mark.django_db
+def test_estoque_sala_create_debita_estoque_geral(client, django_user_model):
+    from camarim.models import Evento, Sala, Produto, Estoque, EstoqueSala
+    from camarim.services.estoque import entrada_estoque
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    ev = Evento.objects.create(nome="EV")
+    sala = Sala.objects.create(evento=ev, nome="Sala A")
+    prod = Produto.objects.create(nome="Água", preco=2)
+    entrada_estoque(prod, 10)
+
+    url = reverse("camarim:estoque_sala_create", args=[ev.pk, sala.pk])
+    resp = client.post(url, {"produto": prod.pk, "quantidade": 11})
+    assert resp.status_code == 200      # mais do que o disponível
+    resp = client.post(url, {"produto": prod.pk, "quantidade": 3})
+    assert resp.status_code == 302
+    assert Estoque.objects.get(produto=prod).quantidade == 7
+    assert EstoqueSala.objects.get(sala=sala, produto=prod).quantidade == 3
+
+@pytest.mark.django_db
+def test_estoque_sala_lote_json(client, django_user_model):
+    import json
+    from camarim.models import Evento, Sala, Produto, EstoqueSala
+    from camarim.services.estoque import entrada_estoque
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    ev = Evento.objects.create(nome="EV")
+    sala = Sala.objects.create(evento=ev, nome="Sala A")
+    produtos = [Produto.objects.create(nome=f"P{i}", preco=1) for i in range(3)]
+    for p in produtos:
+        entrada_estoque(p, 10)
+
+    url = reverse("camarim:estoque_sala_lote", args=[ev.pk, sala.pk])
+    itens = [{"produto": p.pk, "quantidade": 4} for p in produtos]
+    resp = client.post(url, json.dumps({"itens": itens}), content_type="application/json")
+    assert resp.status_code == 200
+    assert resp.json()["saldos"][str(produtos[0].pk)] == {"geral": 6, "sala": 4}
+    assert EstoqueSala.objects.filter(sala=sala).count() == 3
+
+    resp = client.post(url, json.dumps({"itens": [{"produto": produtos[0].pk, "quantidade": 7}]}),
+                       content_type="application/json")
+    assert resp.status_code == 409
+
+@pytest.mark.django_db
+def test_evento_encerrar_com_contagem(client, django_user_model):
+    from camarim.models import Evento, Sala, Produto, Estoque, EstoqueSala
+    from camarim.services.estoque import entrada_estoque, transferir
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    ev = Evento.objects.create(nome="EV")
+    sala = Sala.objects.create(evento=ev, nome="Sala A")
+    prod = Produto.objects.create(nome="Água", preco=2)
+    entrada_estoque(prod, 10)
+    transferir(prod, sala, 4)
+    item = EstoqueSala.objects.get(sala=sala)
+
+    url = reverse("camarim:evento_encerrar", args=[ev.pk])
+    assert client.get(url).status_code == 200
+    resp = client.post(url, {f"contagem_{item.pk}": 3})
+    assert resp.status_code == 302
+    assert Estoque.objects.get(produto=prod).quantidade == 9
+    assert Evento.objects.get(pk=ev.pk).arquivado
+
+@pytest.mark.django_db
+def test_estoque_edit_conflito_de_versao(client, django_user_model):
+    from camarim.models import Produto, Estoque
+    from camarim.services.estoque import entrada_estoque
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    prod = Produto.objects.create(nome="Água", preco=2)
+    entrada_estoque(prod, 10)
+    est = Estoque.objects.get(produto=prod)
+    lida = est.versao
+    entrada_estoque(prod, 1)      # outra pessoa mexeu depois que o formulário abriu
+
+    url = reverse("camarim:estoque_edit", args=[est.pk])
+    resp = client.post(url, {"produto": prod.pk, "quantidade": 3, "versao": lida})
+    assert resp.status_code == 200
+    assert resp.context["form"]["quantidade"].value() == 11
+    assert Estoque.objects.get(pk=est.pk).quantidade == 11
+
+    resp = client.post(url, {"produto": prod.pk, "quantidade": 3, "versao": lida + 1})
+    assert resp.status_code == 302
+    assert Estoque.objects.get(pk=est.pk).quantidade == 3
+
+@pytest.mark.django_db
+def test_proposta_edit_conflito_de_versao(client, django_user_model):
+    from camarim.models import Evento, Sala, Produto, Proposta, ItemProposta
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    ev = Evento.objects.create(nome="EV")
+    sala = Sala.objects.create(evento=ev, nome="Sala A")
+    prod = Produto.objects.create(nome="Água", preco=2)
+    prop = Proposta.objects.create(evento=ev, impostos=10)
+    item = ItemProposta.objects.create(proposta=prop, sala=sala, produto=prod,
+                                       quantidade=2, preco_unitario=3)
+    dados = {
+        "versao": 0, "impostos": "5",
+        "itens-TOTAL_FORMS": 1, "itens-INITIAL_FORMS": 1,
+        "itens-0-id": item.pk, "itens-0-versao": 0, "itens-0-sala": sala.pk,
+        "itens-0-produto": prod.pk, "itens-0-quantidade": 4, "itens-0-preco_unitario": "3",
+    }
+    url = reverse("camarim:proposta_detail", args=[prop.pk])
+    assert client.get(url).status_code == 200
+    assert client.post(url, dados).status_code == 302
+    assert ItemProposta.objects.get(pk=item.pk).quantidade == 4
+
+    dados["itens-0-quantidade"] = 9          # segunda gravação com a versão velha
+    assert client.post(url, dados).status_code == 200
+    assert ItemProposta.objects.get(pk=item.pk).quantidade == 4
+    assert Proposta.objects.get(pk=prop.pk).versao == 1
+
+
+@pytest.mark.django_db
+def test_dashboard_estatisticas_incrementais(client, django_user_model):
+    from decimal import Decimal
+    from camarim.models import Categoria, Evento, Sala, Produto, Proposta, ItemProposta
+    from camarim.services import estatisticas
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    assert client.get(reverse("camarim:dashboard")).status_code == 200
+
+    cat = Categoria.objects.create(nome="Bebidas")
+    ev = Evento.objects.create(nome="EV")
+    sala = Sala.objects.create(evento=ev, nome="Sala A")
+    prod = Produto.objects.create(nome="Água", preco=2, categoria=cat)
+    prop = Proposta.objects.create(evento=ev, impostos=10)
+    item = ItemProposta.objects.create(proposta=prop, sala=sala, produto=prod,
+                                       quantidade=2, preco_unitario=3)
+    item.quantidade = 5
+    item.save()
+    prop.impostos = 20
+    prop.save()
+    Sala.objects.create(evento=ev, nome="Sala B").delete()
+
+    stats = estatisticas.atual()
+    assert (stats.total_eventos, stats.total_salas, stats.total_produtos) == (1, 1, 1)
+    assert stats.valor_total_propostas == Decimal("18.00")
+    assert Categoria.objects.get(pk=cat.pk).total_produtos == 1
+    assert estatisticas.reconstruir().valor_total_propostas == Decimal("18.00")
+
+    prop.delete()
+    assert estatisticas.atual().valor_total_propostas == 0
+    assert client.get(reverse("camarim:dashboard")).status_code == 200
+
+
+@pytest.mark.django_db
+def test_proposta_edit_consultas_constantes(client, django_user_model):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from camarim.models import Evento, Sala, Produto, Proposta, ItemProposta
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    ev = Evento.objects.create(nome="EV")
+    outro = Sala.objects.create(evento=Evento.objects.create(nome="Outro"), nome="Fora")
+    salas = [Sala.objects.create(evento=ev, nome=f"Sala {i}") for i in range(3)]
+    produtos = [Produto.objects.create(nome=f"Prod {i}", preco=2) for i in range(40)]
+
+    def medir(n):
+        prop = Proposta.objects.create(evento=ev)
+        itens = [ItemProposta.objects.create(proposta=prop, sala=salas[i % 3], produto=produtos[i],
+                                             quantidade=1, preco_unitario=2) for i in range(n)]
+        dados = {"versao": 0, "impostos": "0", "itens-TOTAL_FORMS": n, "itens-INITIAL_FORMS": n}
+        for i, item in enumerate(sorted(itens, key=lambda it: (it.sala.nome, it.pk))):
+            dados.update({f"itens-{i}-id": item.pk, f"itens-{i}-versao": 0, f"itens-{i}-sala": item.sala_id,
+                          f"itens-{i}-produto": item.produto_id, f"itens-{i}-quantidade": 1,
+                          f"itens-{i}-preco_unitario": "2"})
+        url = reverse("camarim:proposta_detail", args=[prop.pk])
+        with CaptureQueriesContext(connection) as get:
+            pagina = client.get(url).content.decode()
+        dados["impostos"] = "5"                      # muda só a proposta
+        with CaptureQueriesContext(connection) as post:
+            assert client.post(url, dados).status_code == 302
+        return len(get), len(post), pagina
+
+    get_poucos, post_poucos, _ = medir(3)
+    get_muitos, post_muitos, pagina = medir(30)
+    assert (get_poucos, post_poucos) == (get_muitos, post_muitos)
+    assert "Prod 39" not in pagina and "Fora" not in pagina
+
+    dados_invalidos = {"versao": 0, "impostos": "0", "itens-TOTAL_FORMS": 1, "itens-INITIAL_FORMS": 1,
+                       "itens-0-id": ItemProposta.objects.first().pk, "itens-0-versao": 0,
+                       "itens-0-sala": outro.pk, "itens-0-produto": produtos[0].pk,
+                       "itens-0-quantidade": 1, "itens-0-preco_unitario": "2"}
+    prop = ItemProposta.objects.first().proposta
+    resposta = client.post(reverse("camarim:proposta_detail", args=[prop.pk]), dados_invalidos)
+    assert resposta.status_code == 200 and resposta.context["formset"].errors[0]["sala"]
+    busca = client.get(reverse("camarim:produto_busca"), {"q": "prod 3"}).json()["resultados"]
+    assert [p["nome"] for p in busca][:2] == ["Prod 3", "Prod 30"]
+
+
+@pytest.mark.django_db
+def test_proposta_detalhe_e_descritivo_em_cache(client, django_user_model):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from camarim.models import Evento, Sala, Produto, Proposta, ItemProposta
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    ev = Evento.objects.create(nome="EV")
+    sala = Sala.objects.create(evento=ev, nome="Sala A")
+    prod = Produto.objects.create(nome="Água", preco=2)
+    prop = Proposta.objects.create(evento=ev)
+    item = ItemProposta.objects.create(proposta=prop, sala=sala, produto=prod, quantidade=2, preco_unitario=3)
+
+    def mostra(url, quantidade):
+        html = client.get(url).content.decode()
+        return f">{quantidade}<" in html or f'value="{quantidade}"' in html
+
+    for nome in ("camarim:proposta_detail", "camarim:proposta_descritivo"):
+        url = reverse(nome, args=[prop.pk])
+        with CaptureQueriesContext(connection) as primeira:
+            client.get(url)
+        with CaptureQueriesContext(connection) as segunda:
+            assert mostra(url, item.quantidade)
+        assert len(segunda) < len(primeira)
+
+        item.quantidade += 5                  # item alterado fora do formulário
+        item.save()
+        assert mostra(url, item.quantidade)
+
+    # o formulário não vem do cache: a sala nova já aparece no <select>
+    nova = Sala.objects.create(evento=ev, nome="Sala Nova")
+    html = client.get(reverse("camarim:proposta_detail", args=[prop.pk])).content.decode()
+    assert f'<option value="{nova.pk}">Sala Nova</option>' in html
+
+
+@pytest.mark.django_db
+def test_listas_paginadas_por_cursor(client, django_user_model, monkeypatch):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from camarim.all_views.produtoView import ProdutoListView
+    from camarim.models import Produto
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    # nomes repetidos: o id desempata e nenhum produto some ou se repete
+    for nome in ["Copo", "Água", "Copo", "Bala", "Copo", "Vela", "Água"]:
+        Produto.objects.create(nome=nome, preco=1)
+    esperado = list(Produto.objects.order_by("nome", "id").values_list("pk", flat=True))
+    monkeypatch.setattr(ProdutoListView, "paginate_by", 3)
+
+    url = reverse("camarim:produto_list")
+    vistos, cursores, resp = [], [], client.get(url)
+    while True:
+        pagina = resp.context["page_obj"]
+        vistos += [p.pk for p in resp.context["produtos"]]
+        if not pagina.tem_proxima:
+            break
+        cursores.append(pagina.proxima)
+        with CaptureQueriesContext(connection) as consultas:
+            resp = client.get(url, {"cursor": pagina.proxima})
+        assert not any("OFFSET" in c["sql"] for c in consultas.captured_queries)
+    assert vistos == esperado and len(cursores) == 2
+    # voltando da última página chega-se à do meio
+    resp = client.get(url, {"cursor": resp.context["page_obj"].anterior})
+    assert [p.pk for p in resp.context["produtos"]] == esperado[3:6]
+    assert client.get(url, {"cursor": "lixo"}).status_code == 404
+
+
+@pytest.mark.django_db
+def test_autocompletar_produtos_em_memoria(client, django_user_model):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from camarim.models import Produto, Sala, Evento
+    from camarim.services import autocompletar
+    from camarim.services.estoque import entrada_estoque
+    # o índice é do processo e a versão recomeça a cada teste (rollback)
+    autocompletar._indice = None
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    copo = Produto.objects.create(nome="COPO de Vidro", preco=1)
+    Produto.objects.create(nome="Vidraça", preco=1)
+    entrada_estoque(copo, 7)
+    url = reverse("camarim:produto_busca")
+
+    assert client.get(url, {"q": "vid"}).json()["resultados"] == [
+        {"id": Produto.objects.get(nome="Vidraça").pk, "nome": "Vidraça", "estoque": 0},
+        {"id": copo.pk, "nome": "COPO de Vidro", "estoque": 7},
+    ]
+    # índice montado: a busca só lê a versão e o estoque dos encontrados
+    with CaptureQueriesContext(connection) as consultas:
+        assert [r["nome"] for r in client.get(url, {"q": "copo vi"}).json()["resultados"]] == ["COPO de Vidro"]
+    assert len([c for c in consultas.captured_queries if "camarim_" in c["sql"]]) == 2
+
+    copo.nome = "Taça"
+    copo.save()
+    assert [r["nome"] for r in client.get(url, {"q": "tac"}).json()["resultados"]] == ["Taça"]
+    Produto.objects.get(nome="Vidraça").delete()
+    assert client.get(url, {"q": "vidr"}).json()["resultados"] == []
+
+    # o formulário leva só a opção escolhida, não o catálogo inteiro
+    ev = Evento.objects.create(nome="EV")
+    sala = Sala.objects.create(evento=ev, nome="Sala A")
+    for i in range(30):
+        Produto.objects.create(nome=f"Extra {i}", preco=1)
+    pagina = client.get(reverse("camarim:estoque_sala_create", args=[ev.pk, sala.pk])).content.decode()
+    assert "data-busca-url" in pagina and "Extra 1" not in pagina
+
+
+@pytest.mark.django_db
+def test_listas_com_consultas_constantes(client, django_user_model):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from camarim.models import Categoria, Evento, Sala, Produto, EstoqueSala, Proposta
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    categoria = Categoria.objects.create(nome="Bebidas")
+    ev = Evento.objects.create(nome="EV")
+
+    def popular(n):
+        for i in range(n):
+            evento = Evento.objects.create(nome=f"Evento {i}")
+            sala = Sala.objects.create(evento=ev, nome=f"Sala {i}")
+            Sala.objects.create(evento=evento, nome="Palco")
+            Proposta.objects.create(evento=evento)
+            produto = Produto.objects.create(nome=f"Produto {i}", preco=1, categoria=categoria)
+            EstoqueSala.objects.create(sala=sala, produto=produto, quantidade=i + 1)
+
+    urls = [reverse("camarim:evento_list"), reverse("camarim:sala_list", args=[ev.pk]),
+            reverse("camarim:produto_list"), reverse("camarim:dashboard")]
+
+    def contar():
+        contagens = []
+        for url in urls:
+            with CaptureQueriesContext(connection) as consultas:
+                assert client.get(url).status_code == 200
+            contagens.append(len(consultas))
+        return contagens
+
+    popular(1)
+    poucos = contar()
+    popular(6)
+    assert contar() == poucos
+
+    eventos = {e.nome: e for e in Evento.objects.with_stats()}
+    assert (eventos["EV"].num_salas, eventos["EV"].num_propostas, eventos["EV"].unidades_alocadas) == (7, 0, 22)
+    assert (eventos["Evento 0"].num_salas, eventos["Evento 0"].num_propostas) == (1, 1)
+    salas = {s.nome: s for s in Sala.objects.with_stock_totals().filter(evento=ev)}
+    assert (salas["Sala 2"].num_produtos, salas["Sala 2"].unidades) == (1, 3)
+    assert Produto.objects.with_stock().get(nome="Produto 5").num_salas == 1
+
+
+@pytest.mark.django_db
+def test_exportacao_em_fluxo(client, django_user_model, monkeypatch):
+    import csv
+    import io
+    from decimal import Decimal
+    from importlib.util import find_spec
+    from camarim.models import Evento, Sala, Produto, EstoqueSala, Proposta, ItemProposta
+    from camarim.services import exportacao
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    ev, outro = Evento.objects.create(nome="EV"), Evento.objects.create(nome="Outro")
+    palco = Sala.objects.create(evento=ev, nome="Palco")
+    fora = Sala.objects.create(evento=outro, nome="Fora")
+    produtos = [Produto.objects.create(nome=f"Produto {i}", preco=2) for i in range(5)]
+    for i, produto in enumerate(produtos):
+        EstoqueSala.objects.create(sala=palco if i % 2 else fora, produto=produto, quantidade=i + 1)
+    prop = Proposta.objects.create(evento=ev)
+    ItemProposta.objects.create(proposta=prop, sala=palco, produto=produtos[0], quantidade=3, preco_unitario=Decimal("1.50"))
+    Proposta.objects.create(evento=ev)                  # sem itens
+    monkeypatch.setattr(exportacao, "LOTE", 2)          # várias páginas por cursor
+
+    url = reverse("camarim:export_report")
+
+    def ler(**params):
+        resposta = client.get(url, {"format": "csv", **params})
+        assert resposta.streaming and resposta["Content-Type"].startswith("text/csv")
+        texto = b"".join(resposta.streaming_content).decode("utf-8-sig")
+        return list(csv.reader(io.StringIO(texto)))
+
+    linhas = ler(type="produtos")
+    assert [l[1] for l in linhas[1:]] == [p.nome for p in produtos]
+    assert linhas[1][3:5] == ["2.00", "0"]
+    assert [l[1:] for l in ler(type="alocacoes", evento=ev.pk)[1:]] == [
+        ["Palco", str(produtos[1].pk), "Produto 1", "2"], ["Palco", str(produtos[3].pk), "Produto 3", "4"],
+    ]
+    linhas = ler(type="propostas")
+    assert [(l[0], l[5], l[8], l[-1]) for l in linhas[1:]] == [
+        (str(prop.pk), "Produto 0", "4.50", "4.50"), (str(prop.pk + 1), "", "", "0.00"),
+    ]
+    assert client.get(url, {"type": "usuarios"}).status_code == 400
+    assert client.get(url, {"type": "alocacoes", "evento": "x"}).status_code == 400
+
+    resposta = client.get(url, {"type": "alocacoes", "format": "xlsx", "sala": palco.pk})
+    assert resposta.status_code == (200 if find_spec("openpyxl") else 501)
+
+@pytest.mark.django_db
+def test_produto_edit_so_mexe_no_estoque_se_a_quantidade_mudou(client, django_user_model):
+    from camarim.models import Evento, Sala, Produto, Categoria, Estoque, MovimentoEstoque
+    from camarim.services.estoque import entrada_estoque, transferir
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    ev = Evento.objects.create(nome="EV")
+    sala = Sala.objects.create(evento=ev, nome="Sala A")
+    cat = Categoria.objects.create(nome="Bebidas")
+    prod = Produto.objects.create(nome="Água", preco=2, categoria=cat)
+    entrada_estoque(prod, 100)
+    url = reverse("camarim:produto_edit", args=[prod.pk])
+    form = client.get(url).context["form"]
+    dados = {"nome": "Água mineral", "preco_0": "2", "preco_1": "BRL", "categoria": cat.pk,
+             "quantidade": 100, "estoque_lido": form["estoque_lido"].value()}
+    transferir(prod, sala, 30)        # alocação enquanto o formulário estava aberto
+    movimentos = MovimentoEstoque.objects.count()
+
+    # só o nome mudou: o débito da alocação continua lá
+    assert client.post(url, dados).status_code == 302
+    assert Produto.objects.get(pk=prod.pk).nome == "Água mineral"
+    assert Estoque.objects.get(produto=prod).quantidade == 70
+    assert MovimentoEstoque.objects.count() == movimentos
+
+    # quantidade nova sobre o saldo velho: conflito, nada gravado
+    resp = client.post(url, {**dados, "nome": "Outro", "quantidade": 120})
+    assert resp.status_code == 200
+    assert resp.context["form"]["quantidade"].value() == 70
+    assert Produto.objects.get(pk=prod.pk).nome == "Água mineral"
+    assert Estoque.objects.get(produto=prod).quantidade == 70
+
+    resp = client.post(url, {**dados, "quantidade": 120, "estoque_lido": 70})
+    assert resp.status_code == 302
+    assert Estoque.objects.get(produto=prod).quantidade == 120
+
+@pytest.mark.django_db
+def test_produto_edit_soma_as_parcelas_do_estoque(client, django_user_model):
+    from camarim.models import Evento, Sala, Produto, Categoria, Estoque
+    from camarim.services.estoque import ativar_shards, entrada_estoque, saldos, transferir
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    sala = Sala.objects.create(evento=Evento.objects.create(nome="EV"), nome="Sala A")
+    cat = Categoria.objects.create(nome="Bebidas")
+    prod = Produto.objects.create(nome="Água", preco=2, categoria=cat)
+    entrada_estoque(prod, 100)
+    ativar_shards(prod, 4)
+    transferir(prod, sala, 30)        # vai para uma parcela; a linha continua em 100
+    assert Estoque.objects.get(produto=prod).quantidade == 100
+
+    url = reverse("camarim:produto_edit", args=[prod.pk])
+    form = client.get(url).context["form"]
+    assert form["quantidade"].value() == 70
+    dados = {"nome": "Água mineral", "preco_0": "2", "preco_1": "BRL", "categoria": cat.pk,
+             "quantidade": 70, "estoque_lido": form["estoque_lido"].value()}
+    assert client.post(url, dados).status_code == 302
+    assert saldos(prod, sala) == (70, 30)
+
+@pytest.mark.django_db
+def test_estoque_edit_conflito_nas_parcelas(client, django_user_model):
+    from camarim.models import Evento, Sala, Produto, Estoque
+    from camarim.services.estoque import ativar_shards, entrada_estoque, saldos, transferir
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    sala = Sala.objects.create(evento=Evento.objects.create(nome="EV"), nome="Sala A")
+    prod = Produto.objects.create(nome="Água", preco=2)
+    entrada_estoque(prod, 100)
+    ativar_shards(prod, 4)
+    est = Estoque.objects.get(produto=prod)
+
+    url = reverse("camarim:estoque_edit", args=[est.pk])
+    form = client.get(url).context["form"]
+    assert form["quantidade"].value() == 100
+    dados = {"produto": prod.pk, "quantidade": 90, "versao": form["versao"].value(),
+             "estoque_lido": form["estoque_lido"].value()}
+    transferir(prod, sala, 30)        # vai para uma parcela: a versão da linha não muda
+
+    resp = client.post(url, dados)
+    assert resp.status_code == 200
+    assert resp.context["form"]["quantidade"].value() == 70
+    assert saldos(prod, sala) == (70, 30)
+
+    form = resp.context["form"]
+    dados.update(versao=form["versao"].value(), estoque_lido=form["estoque_lido"].value())
+    assert client.post(url, dados).status_code == 302
+    assert saldos(prod, sala) == (90, 30)
+
+@pytest.mark.django_db
+def test_replicar_sala_soma_destinos_no_mesmo_periodo(client, django_user_model):
+    from datetime import date
+    from camarim.models import Evento, Sala, Produto, EstoqueSala
+    from camarim.services.disponibilidade import disponibilidade
+    from camarim.services.estoque import entrada_estoque, transferir
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    dia = date(2025, 5, 10)
+    origem = Evento.objects.create(nome="Origem", data_inicial=date(2025, 1, 1))
+    sala = Sala.objects.create(evento=origem, nome="Camarim")
+    prod = Produto.objects.create(nome="Água", preco=2)
+    entrada_estoque(prod, 10)
+    transferir(prod, sala, 6)
+    destinos = [Evento.objects.create(nome=n, data_inicial=dia) for n in ("A", "B")]
+    outro_dia = Evento.objects.create(nome="C", data_inicial=date(2025, 6, 1))
+
+    url = reverse("camarim:sala_replicar", args=[origem.pk, sala.pk])
+    # 6 + 6 no mesmo dia não cabem em 10, mesmo cabendo em cada destino sozinho
+    resp = client.post(url, {"destinos": [e.pk for e in destinos]})
+    assert resp.status_code == 200
+    assert "destinos" in resp.context["form"].errors
+    assert not Sala.objects.filter(evento__in=destinos).exists()
+
+    # em dias diferentes, cada um usa as suas 6
+    resp = client.post(url, {"destinos": [destinos[0].pk, outro_dia.pk]})
+    assert resp.status_code == 302
+    assert EstoqueSala.objects.filter(sala__evento__in=[destinos[0], outro_dia]).count() == 2
+    assert disponibilidade(dia, dia)[prod.pk] == 4
+
+@pytest.mark.django_db(transaction=True)
+def test_estoque_sala_create_confere_na_transacao_da_gravacao(client, django_user_model, monkeypatch):
+    from django.db import connection
+    from camarim.models import Evento, Sala, Produto, EstoqueSala
+    from camarim.services import disponibilidade
+    from camarim.services.estoque import entrada_estoque
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    ev = Evento.objects.create(nome="EV")
+    sala = Sala.objects.create(evento=ev, nome="Sala A")
+    prod = Produto.objects.create(nome="Água", preco=2)
+    entrada_estoque(prod, 10)
+    travas = []
+    travar = disponibilidade._travar
+    monkeypatch.setattr(disponibilidade, "_travar",
+                        lambda ids: travas.append(connection.in_atomic_block) or travar(ids))
+
+    url = reverse("camarim:estoque_sala_create", args=[ev.pk, sala.pk])
+    assert client.post(url, {"produto": prod.pk, "quantidade": 3}).status_code == 302
+    assert travas == [True]
+    assert EstoqueSala.objects.get(sala=sala, produto=prod).quantidade == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_estoque_sala_lote_repete_conferencia_e_gravacao_no_deadlock(client, django_user_model, monkeypatch):
+    import json
+    from django.db import OperationalError
+    from camarim.models import Evento, Sala, Produto, EstoqueSala
+    from camarim.services import disponibilidade, estoque
+    from camarim.services.estoque import entrada_estoque
+    django_user_model.objects.create_user("u", "u@u.com", "pwd")
+    client.login(username="u", password="pwd")
+    ev = Evento.objects.create(nome="EV")
+    sala = Sala.objects.create(evento=ev, nome="Sala A")
+    prod = Produto.objects.create(nome="Água", preco=2)
+    entrada_estoque(prod, 10)
+    monkeypatch.setattr(estoque, "ESPERA_BASE", 0)
+    travas = []
+    travar = disponibilidade._travar
+
+    def travar_com_deadlock(ids):
+        travas.append(ids)
+        if len(travas) == 1:
+            raise OperationalError(1213, "Deadlock found when trying to get lock")
+        travar(ids)
+    monkeypatch.setattr(disponibilidade, "_travar", travar_com_deadlock)
+
+    url = reverse("camarim:estoque_sala_lote", args=[ev.pk, sala.pk])
+    resp = client.post(url, json.dumps({"itens": [{"produto": prod.pk, "quantidade": 3}]}),
+                       content_type="application/json")
+    assert resp.status_code == 200
+    assert len(travas) == 2
+    assert EstoqueSala.objects.get(sala=sala, produto=prod).quantidade == 3
@@ -5,16 +5,16 @@ from .views import (
     HomeRedirectView, DashboardView,
 
     EstoqueListView,EstoqueCreateView,EstoqueUpdateView,EstoqueDeleteView,
-    EstoqueSalaListView,EstoqueSalaCreateView,EstoqueSalaUpdateView,EstoqueSalaDeleteView,
+    EstoqueSalaListView,EstoqueSalaCreateView,EstoqueSalaUpdateView,EstoqueSalaDeleteView,EstoqueSalaLoteView,
     RegisterView, CustomLoginView, LogoutGetView
 )
 
 from .all_views.produtoView import (
-    ProdutoListView, ProdutoCreateView, ProdutoUpdateView, ProdutoDeleteView
+    ProdutoListView, ProdutoCreateView, ProdutoUpdateView, ProdutoDeleteView, ProdutoBuscaView, ProdutoPesquisaView
 )
 
 from .all_views.eventoView import (
-    EventoListView, EventoCreateView, EventoUpdateView, EventoDeleteView   
+    EventoListView, EventoCreateView, EventoUpdateView, EventoDeleteView, EventoEncerrarView
 )
 
 from .all_views.salasView import (
@@ -22,7 +22,8 @@ from .all_views.salasView import (
 )
 
 from .all_views.propostaView import (
-    PropostaListView, PropostaCreateView, PropostaDetailView, PropostaDeleteView, PropostaUpdateView, DescritivoView
+    PropostaListView, PropostaCreateView, PropostaDetailView, PropostaDeleteView, PropostaUpdateView, PropostaGerarView, DescritivoView,
+    PropostaDocumentoView
 )
 
 # from .ai_views import (
@@ -30,6 +31,7 @@ from .all_views.propostaView import (
 #     chat_faq, get_context_help
 # )
 # from .reports_views import ReportsView, generate_automation_text, export_report
+from .reports_views import export_report
 # from .reports_views import ReportsView
 
 
@@ -50,6 +52,7 @@ urlpatterns = [
     path('painel/eventos/criar/', EventoCreateView.as_view(), name='evento_create'),
     path('painel/eventos/<int:pk>/editar/', EventoUpdateView.as_view(), name='evento_edit'),
     path('painel/eventos/<int:pk>/excluir/',EventoDeleteView.as_view(),name='evento_delete'),
+    path('painel/eventos/<int:pk>/encerrar/',EventoEncerrarView.as_view(),name='evento_encerrar'),
 
     # salas
     path('painel/eventos/<int:evento_pk>/salas/',     SalaListView.as_view(),   name='sala_list'),
@@ -60,6 +63,8 @@ urlpatterns = [
     # produtos
     path('painel/produtos/',     ProdutoListView.as_view(),   name='produto_list'),
     path('painel/produtos/criar/', ProdutoCreateView.as_view(), name='produto_create'),
+    path('painel/produtos/buscar/', ProdutoBuscaView.as_view(), name='produto_busca'),
+    path('painel/produtos/pesquisa/', ProdutoPesquisaView.as_view(), name='produto_pesquisa'),
     path('painel/produtos/<int:pk>/editar/', ProdutoUpdateView.as_view(), name='produto_edit'),
     path('painel/produtos/<int:pk>/excluir/',ProdutoDeleteView.as_view(),name='produto_delete'),
     # path('painel/produtos/<int:pk>/', ProdutoDetailView.as_view(), name='produto_detail'),
@@ -73,6 +78,7 @@ urlpatterns = [
     # estoque em sala
     path('painel/eventos/<int:evento_pk>/salas/<int:sala_pk>/estoque/',         EstoqueSalaListView.as_view(),   name='estoque_sala_list'),
     path('painel/eventos/<int:evento_pk>/salas/<int:sala_pk>/estoque/criar/',   EstoqueSalaCreateView.as_view(), name='estoque_sala_create'),
+    path('painel/eventos/<int:evento_pk>/salas/<int:sala_pk>/estoque/lote/',    EstoqueSalaLoteView.as_view(),   name='estoque_sala_lote'),
     path('painel/eventos/<int:evento_pk>/salas/<int:sala_pk>/estoque/<int:pk>/editar/',EstoqueSalaUpdateView.as_view(),name='estoque_sala_edit'),
     path('painel/eventos/<int:evento_pk>/salas/<int:sala_pk>/estoque/<int:pk>/excluir/',EstoqueSalaDeleteView.as_view(),name='estoque_sala_delete'),
     path('painel/eventos/<int:evento_pk>/salas/<int:sala_pk>/replicar/', SalaReplicateView.as_view(), name='sala_replicar'),
@@ -81,6 +87,7 @@ urlpatterns = [
     # propostas
     path('painel/propostas/', PropostaListView.as_view(), name='proposta_list'),
     path('painel/propostas/criar/', PropostaCreateView.as_view(), name='proposta_create'),
+    path('painel/eventos/<int:pk>/gerar-proposta/', PropostaGerarView.as_view(), name='proposta_gerar'),
     path('painel/propostas/<int:pk>/', PropostaDetailView.as_view(), name='proposta_detail'),
     path('painel/propostas/<int:pk>/deletar/', PropostaDeleteView.as_view(), name='proposta_delete'),
     
@@ -94,10 +101,11 @@ urlpatterns = [
     # Reports endpoints
     # path('painel/relatorios/', ReportsView.as_view(), name='reports'),
     # path('api/reports/automation-text/', generate_automation_text, name='generate_automation_text'),
-    # path('api/reports/export/', export_report, name='export_report'),
+    path('api/reports/export/', export_report, name='export_report'),
 
     path('propostas/<int:pk>/', PropostaUpdateView.as_view(), name='proposta_detail'),
     path('propostas/<int:pk>/descritivo/', DescritivoView.as_view(), name='proposta_descritivo'),
+    path('propostas/<int:pk>/documento/<str:formato>/', PropostaDocumentoView.as_view(), name='proposta_documento'),
 
         # rota da Central de Ajuda
     # path('ajuda/', HelpView.as_view(), name='help'),
@@ -1,27 +1,28 @@
-import os
-from django.conf import settings
+import json
 from django.shortcuts import render, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import logout
 from django.shortcuts import redirect
 from django.views import View
-from django.http import HttpResponse
 # from .ai_client import get_ai_client
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db import transaction, IntegrityError
 from django.views.generic import (
-    ListView, CreateView, UpdateView, DeleteView, DetailView, RedirectView, TemplateView, CreateView, FormView
+    ListView, CreateView, UpdateView, DeleteView, RedirectView, TemplateView, CreateView
 )
 from django.contrib.auth.views import LoginView
-from django.db.models import Count, Sum , Value
-from .models import Evento,Sala,Produto,Estoque,EstoqueSala, Proposta, Categoria
-from .forms  import EventoForm, SalaForm, ProdutoForm, EstoqueForm, EstoqueSalaForm, PropostaForm, ItemPropostaFormSet, SalaReplicateForm
+from django.db.models import F
+from .models import Evento,Sala,Produto,Estoque,EstoqueSala, Proposta, Categoria, ConflitoDeVersao
+from .forms  import EstoqueForm, EntradaEstoqueForm, EstoqueSalaForm, EstoqueSalaLoteFormSet
+from .services.estoque import (
+    EstoqueInsuficiente, ajustar_alocacao, desalocar,
+    entrada_estoque, editar_estoque, remover_estoque,
+)
+from .services import estatisticas, shards
+from .all_views.mixins import ConflitoVersaoMixin, PaginacaoCursorMixin
+from .services.disponibilidade import alocar_nas_datas, descrever_faltas
 from django.contrib.auth.forms import UserCreationForm
-from django.db.models.functions import Coalesce
 from django.http import JsonResponse
-from django.utils.decorators import method_decorator
-from django.views.decorators.csrf import csrf_exempt
 # from dotenv import load_dotenv
 # load_dotenv()
 # import json
@@ -133,15 +134,19 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Estatísticas gerais
-        context['total_eventos']     = Evento.objects.count()
-        context['total_produtos']    = Produto.objects.count()
-        context['total_salas']       = Sala.objects.count()
-        context['total_propostas']   = Proposta.objects.count()
-        context['total_categorias']  = Categoria.objects.count()
+        # Estatísticas gerais: uma linha mantida pelos sinais (services.estatisticas)
+        stats = estatisticas.atual()
+        context['total_eventos']     = stats.total_eventos
+        context['total_produtos']    = stats.total_produtos
+        context['total_salas']       = stats.total_salas
+        context['total_propostas']   = stats.total_propostas
+        context['total_categorias']  = stats.total_categorias
+        context['valor_total_propostas'] = stats.valor_total_propostas
         
         # Eventos recentes
-        context['eventos_recentes'] = Evento.objects.order_by('-id')[:5]
+        context['eventos_recentes'] = (
+            Evento.objects.with_stats().order_by('-id')[:5]
+        )
         
         # Propostas recentes (usa created_at, não data_criacao)
         context['propostas_recentes'] = (
@@ -150,22 +155,16 @@ class DashboardView(LoginRequiredMixin, TemplateView):
                    .order_by('-created_at')[:5]
         )
         
-        # Produtos com baixo estoque (menos de 10 unidades)
+        # Produtos com baixo estoque (menos de 10 unidades disponíveis)
         context['produtos_baixo_estoque'] = (
             Produto.objects
-                   .filter(estoques__quantidade__lt=10)
-                   .distinct()[:5]
+                   .with_stock()
+                   .filter(estoque_disponivel__lt=10)
+                   .order_by('estoque_disponivel')[:5]
         )
         
-        # Valor total de todas as propostas (somando a propriedade .total em Python)
-        context['valor_total_propostas'] = sum(p.total for p in Proposta.objects.all())
-        
-        # Estatísticas por categoria (número de produtos por categoria)
-        context['stats_categorias'] = (
-            Categoria.objects
-                     .annotate(total_produtos=Count('produtos'))
-                     .order_by('-total_produtos')[:5]
-        )
+        # Categorias com mais produtos (contador mantido pelos sinais de Produto)
+        context['stats_categorias'] = Categoria.objects.order_by('-total_produtos')[:5]
         
         return context
 
@@ -284,28 +283,53 @@ class DashboardView(LoginRequiredMixin, TemplateView):
 #     success_url=reverse_lazy('camarim:produto_list')
 
 # — Estoque Geral —
-class EstoqueListView(LoginRequiredMixin, ListView):
+class EstoqueListView(LoginRequiredMixin, PaginacaoCursorMixin, ListView):
     model=Estoque; template_name='camarim/estoque_list.html'; context_object_name='estoque_items'
+    queryset=(Estoque.objects.select_related('produto')
+                             .annotate(total=F('quantidade') + shards.soma('produto_id')))
+    ordering=('produto__nome', 'id')
 class EstoqueCreateView(LoginRequiredMixin, CreateView):
-    model=Estoque; form_class=EstoqueForm; template_name='camarim/estoque_form.html'
+    model=Estoque; form_class=EntradaEstoqueForm; template_name='camarim/estoque_form.html'
     success_url=reverse_lazy('camarim:estoque_list')
-class EstoqueUpdateView(LoginRequiredMixin, UpdateView):
+
+    def form_valid(self, form):
+        # um novo lançamento soma ao estoque geral do produto
+        entrada_estoque(form.cleaned_data['produto'], form.cleaned_data['quantidade'],
+                        usuario=self.request.user)
+        return redirect(self.success_url)
+
+class EstoqueUpdateView(LoginRequiredMixin, ConflitoVersaoMixin, UpdateView):
     model=Estoque; form_class=EstoqueForm; template_name='camarim/estoque_form.html'
     success_url=reverse_lazy('camarim:estoque_list')
+
+    def form_valid(self, form):
+        try:
+            editar_estoque(self.object.pk, form.cleaned_data['produto'], form.cleaned_data['quantidade'],
+                           versao=form.versao_lida(), esperado=form.estoque_lido(),
+                           usuario=self.request.user)
+        except ConflitoDeVersao:
+            return self.conflito()
+        return redirect(self.success_url)
+
 class EstoqueDeleteView(LoginRequiredMixin, DeleteView):
     model=Estoque; template_name='camarim/estoque_confirm_delete.html'
     success_url=reverse_lazy('camarim:estoque_list')
 
+    def form_valid(self, form):
+        remover_estoque(self.object.pk, usuario=self.request.user)
+        return redirect(self.success_url)
+
 # — Estoque por Sala —
-class EstoqueSalaListView(LoginRequiredMixin, ListView):
+class EstoqueSalaListView(LoginRequiredMixin, PaginacaoCursorMixin, ListView):
     model = EstoqueSala
     template_name = 'camarim/estoque_sala_list.html'
     context_object_name = 'itens'
+    ordering = ('produto__nome', 'id')
 
     def get_queryset(self):
         return EstoqueSala.objects.filter(
             sala_id=self.kwargs['sala_pk']
-        )
+        ).select_related('produto')
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -330,26 +354,23 @@ class EstoqueSalaCreateView(LoginRequiredMixin, CreateView):
         ctx['sala']   = self.sala
         return ctx
 
-    @transaction.atomic
     def form_valid(self, form):
         produto       = form.cleaned_data['produto']
         qtd_para_sala = form.cleaned_data['quantidade']
 
-        # 1) Reduz o estoque geral SEM checar limite
-        estoque_geral = get_object_or_404(Estoque, produto=produto)
-        estoque_geral.quantidade -= qtd_para_sala
-        estoque_geral.save()
+        # Confere o que está livre nas datas do evento (outros eventos
+        # que acontecem ao mesmo tempo já ocupam parte do estoque) e
+        # debita o geral e soma na sala na mesma transação
+        try:
+            faltando, _ = alocar_nas_datas(self.evento, self.sala, {produto.pk: qtd_para_sala},
+                                           usuario=self.request.user)
+        except Estoque.DoesNotExist:
+            form.add_error('produto', "Este produto não possui estoque geral cadastrado.")
+            return self.form_invalid(form)
+        if faltando:
+            form.add_error('quantidade', descrever_faltas(self.evento, faltando))
+            return self.form_invalid(form)
 
-        # 2) Soma no estoque da sala
-        sala_item, created = EstoqueSala.objects.get_or_create(
-            sala=   self.sala,
-            produto=produto,
-            defaults={'quantidade': 0}
-        )
-        sala_item.quantidade += qtd_para_sala
-        sala_item.save()
-
-        # 3) Redireciona
         return redirect(self.get_success_url())
 
     def get_success_url(self):
@@ -358,18 +379,118 @@ class EstoqueSalaCreateView(LoginRequiredMixin, CreateView):
             args=[self.evento.id, self.sala.id]
         )
 
-class EstoqueSalaUpdateView(LoginRequiredMixin, UpdateView):
+class EstoqueSalaUpdateView(LoginRequiredMixin, ConflitoVersaoMixin, UpdateView):
     model=EstoqueSala; form_class=EstoqueSalaForm; template_name='camarim/estoque_sala_form.html'
+
+    def form_valid(self, form):
+        # form.initial guarda os valores de antes da edição
+        try:
+            ajustar_alocacao(
+                self.object.sala_id,
+                form.initial['produto'], form.initial['quantidade'],
+                form.cleaned_data['produto'], form.cleaned_data['quantidade'],
+                versao=form.versao_lida(), usuario=self.request.user,
+            )
+        except ConflitoDeVersao:
+            return self.conflito()
+        except (Estoque.DoesNotExist, EstoqueInsuficiente) as exc:
+            form.add_error(None, str(exc))
+            return self.form_invalid(form)
+        return redirect(self.get_success_url())
+
+    def get_context_data(self, **ctx):
+        ctx = super().get_context_data(**ctx)
+        ctx['evento'] = get_object_or_404(Evento, pk=self.kwargs['evento_pk'])
+        ctx['sala']   = self.object.sala
+        return ctx
+
     def get_success_url(self):
         return reverse_lazy('camarim:estoque_sala_list',
                             args=[self.kwargs['evento_pk'],self.kwargs['sala_pk']])
 
 class EstoqueSalaDeleteView(LoginRequiredMixin, DeleteView):
     model=EstoqueSala; template_name='camarim/estoque_sala_confirm_delete.html'
+
+    def form_valid(self, form):
+        # devolve a quantidade da sala ao estoque geral antes de apagar
+        desalocar(self.object, usuario=self.request.user)
+        return redirect(self.get_success_url())
+
     def get_success_url(self):
         return reverse_lazy('camarim:estoque_sala_list',
                             args=[self.kwargs['evento_pk'],self.kwargs['sala_pk']])
 
+class EstoqueSalaLoteView(LoginRequiredMixin, View):
+    """
+    Aloca vários produtos na sala num único envio. Aceita o formulário em
+    lote (HTML) ou JSON: ``{"itens": [{"produto": 1, "quantidade": 5}, ...]}``.
+    """
+    template_name = 'camarim/estoque_sala_lote.html'
+
+    def dispatch(self, request, *args, **kwargs):
+        self.evento = get_object_or_404(Evento, pk=kwargs['evento_pk'])
+        self.sala   = get_object_or_404(Sala,   pk=kwargs['sala_pk'], evento=self.evento)
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        return self.render_formset(EstoqueSalaLoteFormSet())
+
+    def post(self, request, *args, **kwargs):
+        if request.content_type == 'application/json':
+            return self.post_json(request)
+        formset = EstoqueSalaLoteFormSet(request.POST)
+        if not formset.is_valid():
+            return self.render_formset(formset)
+        erro = self.alocar(formset.pedidos())
+        if erro:
+            messages.error(request, erro)
+            return self.render_formset(formset)
+        messages.success(request, f"{len(formset.pedidos())} produto(s) alocado(s) em “{self.sala.nome}”.")
+        return redirect('camarim:estoque_sala_list', self.evento.pk, self.sala.pk)
+
+    def post_json(self, request):
+        try:
+            itens = json.loads(request.body)['itens']
+            pedidos = {}
+            for item in itens:
+                produto_id, quantidade = int(item['produto']), int(item['quantidade'])
+                if quantidade < 1:
+                    raise ValueError
+                pedidos[produto_id] = pedidos.get(produto_id, 0) + quantidade
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse(
+                {'error': 'Envie {"itens": [{"produto": id, "quantidade": n}, ...]} com quantidades positivas.'},
+                status=400,
+            )
+        saldos = {}
+        erro = self.alocar(pedidos, saldos)
+        if erro:
+            return JsonResponse({'error': erro}, status=409)
+        return JsonResponse({
+            'saldos': {
+                str(pid): {'geral': saldo.geral, 'sala': saldo.sala}
+                for pid, saldo in saldos.items()
+            }
+        })
+
+    def alocar(self, pedidos, saldos=None):
+        """Valida nas datas do evento e aloca; devolve a mensagem de erro, se houver."""
+        try:
+            faltando, resultado = alocar_nas_datas(self.evento, self.sala, pedidos,
+                                                   usuario=self.request.user)
+        except (Estoque.DoesNotExist, EstoqueInsuficiente) as exc:
+            return str(exc)
+        if faltando:
+            return descrever_faltas(self.evento, faltando)
+        if saldos is not None:
+            saldos.update(resultado)
+        return None
+
+    def render_formset(self, formset):
+        return render(self.request, self.template_name, {
+            'formset': formset, 'evento': self.evento, 'sala': self.sala,
+        })
+
 # — Propostas —
 # class PropostaListView(LoginRequiredMixin, ListView):
 #     model=Proposta; template_name='camarim/proposta_list.html'; context_object_name='propostas'